@@ -1,17 +1,18 @@
-from dash import Dash, html, dcc, Input, Output, callback_context
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
-from datetime import datetime, timedelta
+from dash import Dash, html, dcc, Input, Output, State, callback_context, no_update
+import logging
 import os
 from config import Config
-from metrics import calculate_metrics
-from pymongo import MongoClient
+from dates import shift_day, today
+from metrics import (cache_ttl, calculate_metrics, is_cacheable, refresh_metrics, refresh_rollups_if_due,
+                     refresh_user_index_if_due)
+from figures import bar_figure, comparison_figure, hourly_figure, latency_figure, retention_figure
+from live import start_live_watcher
+from responses import install as install_responses
+from store import create_result_store, parse_result_key, result_key
+from telemetry import install as install_telemetry, span
+from warmup import start_warmer
 
-# Inicializar MongoDB client
-client = MongoClient(Config.MONGO_URI)
-db = client['RemindMe-test']
-collection = db['reminders']
+logging.basicConfig(level=Config.LOG_LEVEL, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
 
 # Inicialización de la aplicación Dash
 app = Dash(__name__, meta_tags=[{"name": "viewport", "content": "width=device-width, initial-scale=1"}])
@@ -19,133 +20,196 @@ app = Dash(__name__, meta_tags=[{"name": "viewport", "content": "width=device-wi
 # Esto es lo que Gunicorn necesita:
 server = app.server
 
-# Establecer el diseño de la aplicación
-app.layout = html.Div([
-    html.H1("Dashboard de Recordatorios", style={'textAlign': 'center', 'margin': '20px 0'}),
+# /metrics (Prometheus) y log por callback con el desglose de etapas
+install_telemetry(server)
+
+# JSON con orjson, ETag/304 y compresión br/gzip de las respuestas (después de la telemetría)
+install_responses(server)
+
+# Resultados calculados, compartidos entre callbacks (y entre workers con backend file/redis)
+result_store = create_result_store()
+
+# Contadores de hoy en memoria, actualizados con los cambios de la colección (None si LIVE_ENABLED está desactivado)
+live_watcher = start_live_watcher()
+
+
+def live_panel():
+    """Panel "Hoy": el navegador pide los contadores en memoria cada LIVE_REFRESH_INTERVAL segundos."""
+    if live_watcher is None:
+        return []
+    return [html.Div([
+        html.H3("Hoy (en vivo)", style={'textAlign': 'center'}),
+        dcc.Interval(id='live-interval', interval=Config.LIVE_REFRESH_INTERVAL * 1000),
+        html.Div([
+            html.Div([html.H3("Creados Hoy"), html.H2(id='live-created', children='-')], className='metric-card'),
+            html.Div([html.H3("Enviados Hoy"), html.H2(id='live-sent', children='-')], className='metric-card'),
+            html.Div([html.H3("Usuarios Hoy"), html.H2(id='live-users', children='-')], className='metric-card'),
+            html.Div([html.H3("Demora p50 / p90"), html.H2(id='live-latency', children='-')], className='metric-card'),
+        ], style={'display': 'flex', 'flexWrap': 'wrap', 'justifyContent': 'space-around', 'gap': '15px'}),
+        dcc.Graph(id='live-graph')
+    ], style={'margin': '20px 30px', 'border': '1px solid #ddd', 'borderRadius': '5px', 'padding': '10px'})]
+
+
+def serve_layout():
+    """Diseño de la aplicación; se arma en cada carga de página para que las fechas por defecto sean las de hoy."""
+    return html.Div([
+        html.H1("Dashboard de Recordatorios", style={'textAlign': 'center', 'margin': '20px 0'}),
+
+        # Clave del resultado ya calculado en result_store; los gráficos se redibujan a partir de él
+        dcc.Store(id='metrics-key'),
     
-    # Selector de fechas
-    html.Div([
+        # Selector de fechas
         html.Div([
-            html.Label("Fecha de inicio:"),
-            dcc.DatePickerSingle(
-                id='start-date-picker',
-                date=datetime.now() - timedelta(days=30),
-                display_format='YYYY-MM-DD',
-                style={'marginBottom': '10px'}
-            ),
-        ], style={'margin': '10px', 'flex': '1'}),
+            html.Div([
+                html.Label("Fecha de inicio:"),
+                dcc.DatePickerSingle(
+                    id='start-date-picker',
+                    date=shift_day(today(), -30),
+                    display_format='YYYY-MM-DD',
+                    style={'marginBottom': '10px'}
+                ),
+            ], style={'margin': '10px', 'flex': '1'}),
         
-        html.Div([
-            html.Label("Fecha de fin:"),
-            dcc.DatePickerSingle(
-                id='end-date-picker',
-                date=datetime.now(),
-                display_format='YYYY-MM-DD',
-                style={'marginBottom': '10px'}
-            ),
-        ], style={'margin': '10px', 'flex': '1'}),
+            html.Div([
+                html.Label("Fecha de fin:"),
+                dcc.DatePickerSingle(
+                    id='end-date-picker',
+                    date=today(),
+                    display_format='YYYY-MM-DD',
+                    style={'marginBottom': '10px'}
+                ),
+            ], style={'margin': '10px', 'flex': '1'}),
         
-        html.Div([
-            html.Label("Vista:"),
-            dcc.RadioItems(
-                id='view-selector',
-                options=[
-                    {'label': 'Diario', 'value': 'daily'},
-                    {'label': 'Mensual', 'value': 'monthly'}
-                ],
-                value='daily',
-                style={'display': 'flex', 'gap': '10px'}
-            ),
-        ], style={'margin': '10px', 'flex': '1'})
-    ], style={'display': 'flex', 'justifyContent': 'space-between', 'margin': '20px'}),
+            html.Div([
+                html.Label("Vista:"),
+                dcc.RadioItems(
+                    id='view-selector',
+                    options=[
+                        {'label': 'Diario', 'value': 'daily'},
+                        {'label': 'Mensual', 'value': 'monthly'}
+                    ],
+                    value='daily',
+                    style={'display': 'flex', 'gap': '10px'}
+                ),
+            ], style={'margin': '10px', 'flex': '1'})
+        ], style={'display': 'flex', 'justifyContent': 'space-between', 'margin': '20px'}),
+
+        *live_panel(),
     
-    # Tarjetas de métricas principales
-    html.Div([
+        # Tarjetas de métricas principales
         html.Div([
-            html.H3("Total Usuarios"),
-            html.H2(id='total-users', children='0'),
-        ], className='metric-card'),
+            html.Div([
+                html.H3("Total Usuarios"),
+                html.H2(id='total-users', children='0'),
+            ], className='metric-card'),
         
-        html.Div([
-            html.H3("Total Recordatorios Creados"),
-            html.H2(id='total-reminds-created', children='0'),
-        ], className='metric-card'),
+            html.Div([
+                html.H3("Usuarios Nuevos"),
+                html.H2(id='new-users', children='0'),
+            ], className='metric-card'),
+
+            html.Div([
+                html.H3("Usuarios Recurrentes"),
+                html.H2(id='returning-users', children='0'),
+            ], className='metric-card'),
         
-        html.Div([
-            html.H3("Total Recordatorios Enviados"),
-            html.H2(id='total-reminds-sent', children='0'),
-        ], className='metric-card'),
+            html.Div([
+                html.H3("Total Recordatorios Creados"),
+                html.H2(id='total-reminds-created', children='0'),
+            ], className='metric-card'),
         
-        html.Div([
-            html.H3("Recordatorios Creados por Usuario"),
-            html.H2(id='per-user-reminds-created', children='0'),
-        ], className='metric-card'),
+            html.Div([
+                html.H3("Total Recordatorios Enviados"),
+                html.H2(id='total-reminds-sent', children='0'),
+            ], className='metric-card'),
         
-        html.Div([
-            html.H3("Recordatorios Enviados por Usuario"),
-            html.H2(id='per-user-reminds-sent', children='0'),
-        ], className='metric-card'),
-    ], style={'display': 'flex', 'flexWrap': 'wrap', 'justifyContent': 'space-around', 'gap': '15px', 'margin': '20px'}),
+            html.Div([
+                html.H3("Recordatorios Creados por Usuario"),
+                html.H2(id='per-user-reminds-created', children='0'),
+            ], className='metric-card'),
+        
+            html.Div([
+                html.H3("Recordatorios Enviados por Usuario"),
+                html.H2(id='per-user-reminds-sent', children='0'),
+            ], className='metric-card'),
+        ], style={'display': 'flex', 'flexWrap': 'wrap', 'justifyContent': 'space-around', 'gap': '15px', 'margin': '20px'}),
     
-    # Gráficos
-    html.Div([
+        # Gráficos
         html.Div([
-            html.H3("Usuarios Activos", style={'textAlign': 'center'}),
-            dcc.Graph(id='users-graph')
-        ], style={'flex': '1', 'minWidth': '45%', 'margin': '10px', 'border': '1px solid #ddd', 'borderRadius': '5px', 'padding': '10px'}),
+            html.Div([
+                html.H3("Usuarios Activos", style={'textAlign': 'center'}),
+                dcc.Graph(id='users-graph')
+            ], style={'flex': '1', 'minWidth': '45%', 'margin': '10px', 'border': '1px solid #ddd', 'borderRadius': '5px', 'padding': '10px'}),
         
-        html.Div([
-            html.H3("Recordatorios Creados", style={'textAlign': 'center'}),
-            dcc.Graph(id='reminds-created-graph')
-        ], style={'flex': '1', 'minWidth': '45%', 'margin': '10px', 'border': '1px solid #ddd', 'borderRadius': '5px', 'padding': '10px'}),
+            html.Div([
+                html.H3("Recordatorios Creados", style={'textAlign': 'center'}),
+                dcc.Graph(id='reminds-created-graph')
+            ], style={'flex': '1', 'minWidth': '45%', 'margin': '10px', 'border': '1px solid #ddd', 'borderRadius': '5px', 'padding': '10px'}),
         
-        html.Div([
-            html.H3("Recordatorios Enviados", style={'textAlign': 'center'}),
-            dcc.Graph(id='reminds-sent-graph')
-        ], style={'flex': '1', 'minWidth': '45%', 'margin': '10px', 'border': '1px solid #ddd', 'borderRadius': '5px', 'padding': '10px'}),
+            html.Div([
+                html.H3("Recordatorios Enviados", style={'textAlign': 'center'}),
+                dcc.Graph(id='reminds-sent-graph')
+            ], style={'flex': '1', 'minWidth': '45%', 'margin': '10px', 'border': '1px solid #ddd', 'borderRadius': '5px', 'padding': '10px'}),
         
+            html.Div([
+                html.H3("Comparación Creados vs Enviados", style={'textAlign': 'center'}),
+                dcc.Graph(id='comparison-graph')
+            ], style={'flex': '1', 'minWidth': '45%', 'margin': '10px', 'border': '1px solid #ddd', 'borderRadius': '5px', 'padding': '10px'})
+        ], style={'display': 'flex', 'flexWrap': 'wrap', 'justifyContent': 'space-around', 'margin': '20px'}),
+
+        # Cuantiles de la demora entre la hora programada y el envío
+        html.Div([
+            html.H3("Demora de Envío", style={'textAlign': 'center'}),
+            html.P(id='latency-quantiles', children='p50: - · p90: - · p99: -', style={'textAlign': 'center'}),
+            dcc.Graph(id='latency-graph')
+        ], style={'margin': '20px 30px', 'border': '1px solid #ddd', 'borderRadius': '5px', 'padding': '10px'}),
+
+        # Retención de las cohortes (mes del primer recordatorio) que empiezan en el rango
         html.Div([
-            html.H3("Comparación Creados vs Enviados", style={'textAlign': 'center'}),
-            dcc.Graph(id='comparison-graph')
-        ], style={'flex': '1', 'minWidth': '45%', 'margin': '10px', 'border': '1px solid #ddd', 'borderRadius': '5px', 'padding': '10px'})
-    ], style={'display': 'flex', 'flexWrap': 'wrap', 'justifyContent': 'space-around', 'margin': '20px'}),
+            html.H3("Retención de Usuarios por Cohorte", style={'textAlign': 'center'}),
+            dcc.Graph(id='retention-graph')
+        ], style={'margin': '20px 30px', 'border': '1px solid #ddd', 'borderRadius': '5px', 'padding': '10px'}),
     
-    # Estadísticas adicionales
-    html.Div([
-        html.H3("Estadísticas Adicionales", style={'textAlign': 'center'}),
-        
-        # Primera fila de métricas
+        # Estadísticas adicionales
         html.Div([
+            html.H3("Estadísticas Adicionales", style={'textAlign': 'center'}),
+        
+            # Primera fila de métricas
             html.Div([
-                html.H4("Promedio Diario"),
                 html.Div([
-                    html.P(id='avg-daily-users', children='Usuarios: 0'),
-                    html.P(id='avg-daily-reminds-created', children='Recordatorios Creados: 0'),
-                    html.P(id='avg-daily-reminds-sent', children='Recordatorios Enviados: 0')
-                ])
-            ], style={'flex': '1', 'minWidth': '30%', 'margin': '10px', 'padding': '15px', 'border': '1px solid #ddd', 'borderRadius': '5px'}),
+                    html.H4("Promedio Diario"),
+                    html.Div([
+                        html.P(id='avg-daily-users', children='Usuarios: 0'),
+                        html.P(id='avg-daily-reminds-created', children='Recordatorios Creados: 0'),
+                        html.P(id='avg-daily-reminds-sent', children='Recordatorios Enviados: 0')
+                    ])
+                ], style={'flex': '1', 'minWidth': '30%', 'margin': '10px', 'padding': '15px', 'border': '1px solid #ddd', 'borderRadius': '5px'}),
             
-            html.Div([
-                html.H4("Promedio Mensual"),
                 html.Div([
-                    html.P(id='avg-monthly-users', children='Usuarios: 0'),
-                    html.P(id='avg-monthly-reminds-created', children='Recordatorios Creados: 0'),
-                    html.P(id='avg-monthly-reminds-sent', children='Recordatorios Enviados: 0')
-                ])
-            ], style={'flex': '1', 'minWidth': '30%', 'margin': '10px', 'padding': '15px', 'border': '1px solid #ddd', 'borderRadius': '5px'}),
+                    html.H4("Promedio Mensual"),
+                    html.Div([
+                        html.P(id='avg-monthly-users', children='Usuarios: 0'),
+                        html.P(id='avg-monthly-reminds-created', children='Recordatorios Creados: 0'),
+                        html.P(id='avg-monthly-reminds-sent', children='Recordatorios Enviados: 0')
+                    ])
+                ], style={'flex': '1', 'minWidth': '30%', 'margin': '10px', 'padding': '15px', 'border': '1px solid #ddd', 'borderRadius': '5px'}),
             
-            html.Div([
-                html.H4("Promedio por Usuario"),
                 html.Div([
-                    html.P(id='avg-per-user-daily-reminds-created', children='Recordatorios Creados Diarios: 0'),
-                    html.P(id='avg-per-user-daily-reminds-sent', children='Recordatorios Enviados Diarios: 0'),
-                    html.P(id='avg-per-user-monthly-reminds-created', children='Recordatorios Creados Mensuales: 0'),
-                    html.P(id='avg-per-user-monthly-reminds-sent', children='Recordatorios Enviados Mensuales: 0')
-                ])
-            ], style={'flex': '1', 'minWidth': '30%', 'margin': '10px', 'padding': '15px', 'border': '1px solid #ddd', 'borderRadius': '5px'})
-        ], style={'display': 'flex', 'flexWrap': 'wrap', 'justifyContent': 'space-around'})
-    ], style={'margin': '20px'})
-], style={'fontFamily': 'Arial, sans-serif', 'margin': '0 auto', 'maxWidth': '1400px', 'padding': '20px'})
+                    html.H4("Promedio por Usuario"),
+                    html.Div([
+                        html.P(id='avg-per-user-daily-reminds-created', children='Recordatorios Creados Diarios: 0'),
+                        html.P(id='avg-per-user-daily-reminds-sent', children='Recordatorios Enviados Diarios: 0'),
+                        html.P(id='avg-per-user-monthly-reminds-created', children='Recordatorios Creados Mensuales: 0'),
+                        html.P(id='avg-per-user-monthly-reminds-sent', children='Recordatorios Enviados Mensuales: 0')
+                    ])
+                ], style={'flex': '1', 'minWidth': '30%', 'margin': '10px', 'padding': '15px', 'border': '1px solid #ddd', 'borderRadius': '5px'})
+            ], style={'display': 'flex', 'flexWrap': 'wrap', 'justifyContent': 'space-around'})
+        ], style={'margin': '20px'})
+    ], style={'fontFamily': 'Arial, sans-serif', 'margin': '0 auto', 'maxWidth': '1400px', 'padding': '20px'})
+
+
+# Establecer el diseño de la aplicación (Dash llama a la función en cada carga de página)
+app.layout = serve_layout
 
 # Estilos CSS adicionales
 app.index_string = '''
@@ -200,202 +264,98 @@ app.index_string = '''
 </html>
 '''
 
+def warm_range(start_date, end_date):
+    """Recalcula un rango y lo deja listo en result_store (lo llama el warmer en segundo plano)."""
+    metrics = refresh_metrics(start_date, end_date)
+    if is_cacheable(metrics):
+        result_store.set(result_key(start_date, end_date), metrics, ttl=cache_ttl(end_date))
+
+
+# Los rangos más pedidos quedan calculados desde que arranca el worker; los rollups y el
+# índice de usuarios se actualizan antes en el mismo hilo, fuera de los requests
+warmer = start_warmer(warm_range, tasks=[refresh_rollups_if_due, refresh_user_index_if_due])
+
+
 # Callbacks
-@app.callback(
-    [
-        Output('total-users', 'children'),
-        Output('total-reminds-created', 'children'),
-        Output('total-reminds-sent', 'children'),
-        Output('per-user-reminds-created', 'children'),
-        Output('per-user-reminds-sent', 'children'),
-        Output('users-graph', 'figure'),
-        Output('reminds-created-graph', 'figure'),
-        Output('reminds-sent-graph', 'figure'),
-        Output('comparison-graph', 'figure'),
-        Output('avg-daily-users', 'children'),
-        Output('avg-daily-reminds-created', 'children'),
-        Output('avg-daily-reminds-sent', 'children'),
-        Output('avg-monthly-users', 'children'),
-        Output('avg-monthly-reminds-created', 'children'),
-        Output('avg-monthly-reminds-sent', 'children'),
-        Output('avg-per-user-daily-reminds-created', 'children'),
-        Output('avg-per-user-daily-reminds-sent', 'children'),
-        Output('avg-per-user-monthly-reminds-created', 'children'),
-        Output('avg-per-user-monthly-reminds-sent', 'children')
-    ],
-    [
-        Input('start-date-picker', 'date'),
-        Input('end-date-picker', 'date'),
-        Input('view-selector', 'value')
-    ]
-)
-def update_metrics(start_date, end_date, view):
+def parse_date_range(start_date, end_date):
+    """Normaliza las fechas de los selectores a yyyy-mm-dd (últimos 30 días si faltan)."""
     # Verificar que las fechas sean válidas
     if not start_date or not end_date:
-        start_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-        end_date = datetime.now().strftime('%Y-%m-%d')
+        start_date = shift_day(today(), -30)
+        end_date = today()
     
-    start_date = start_date[:10] if start_date else (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-    end_date = end_date[:10] if end_date else datetime.now().strftime('%Y-%m-%d')
+    start_date = start_date[:10] if start_date else shift_day(today(), -30)
+    end_date = end_date[:10] if end_date else today()
+    return start_date, end_date
 
-    # Calcular métricas
-    metrics = calculate_metrics(start_date, end_date)
-    
+
+def build_figures(metrics, view):
+    """Los cuatro gráficos de la vista seleccionada ('daily' o 'monthly')."""
+    # Todas las series comparten el eje completo del rango (metrics['days'] / metrics['months'])
+    if view == 'daily':
+        labels = metrics['days']
+        users, created, sent = metrics['daily_users'], metrics['daily_reminds_created'], metrics['daily_reminds_sent']
+    else:  # view == 'monthly'
+        labels = metrics['months']
+        users, created, sent = (metrics['monthly_users'], metrics['monthly_reminds_created'],
+                                metrics['monthly_reminds_sent'])
+
+    users_fig = bar_figure(view, 'users', labels, users)
+    created_fig = bar_figure(view, 'created', labels, created)
+    sent_fig = bar_figure(view, 'sent', labels, sent)
+    comparison_fig = comparison_figure(view, labels, created, sent)
+    return users_fig, created_fig, sent_fig, comparison_fig
+
+
+STAT_OUTPUTS = [
+    'total-users',
+    'new-users',
+    'returning-users',
+    'total-reminds-created',
+    'total-reminds-sent',
+    'per-user-reminds-created',
+    'per-user-reminds-sent',
+    'avg-daily-users',
+    'avg-daily-reminds-created',
+    'avg-daily-reminds-sent',
+    'avg-monthly-users',
+    'avg-monthly-reminds-created',
+    'avg-monthly-reminds-sent',
+    'avg-per-user-daily-reminds-created',
+    'avg-per-user-daily-reminds-sent',
+    'avg-per-user-monthly-reminds-created',
+    'avg-per-user-monthly-reminds-sent',
+    'latency-quantiles'
+]
+
+
+def format_duration(seconds):
+    """Demora legible (segundos, minutos u horas); '-' si no hubo envíos."""
+    if seconds != seconds:  # NaN
+        return '-'
+    if seconds < 60:
+        return f"{seconds:.0f} s"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def format_count(value):
+    """Entero con separador de miles; '-' si todavía no hay valor (cohortes sin índice de usuarios)."""
+    return '-' if value is None else f"{value:,}"
+
+
+def format_stats(metrics):
+    """Textos de las tarjetas y estadísticas, en el orden de STAT_OUTPUTS."""
     # Formatear números para mostrar
     total_users = f"{metrics['total_users']:,}"
+    new_users = format_count(metrics['new_users'])
+    returning_users = format_count(metrics['returning_users'])
     total_reminds_created = f"{metrics['total_reminds_created']:,}"
     total_reminds_sent = f"{metrics['total_reminds_sent']:,}"
     per_user_reminds_created = f"{metrics['per_user_reminds_created']:.2f}"
     per_user_reminds_sent = f"{metrics['per_user_reminds_sent']:.2f}"
     
-    # Crear gráficos según la vista seleccionada
-    if view == 'daily':
-        # Gráfico de usuarios diarios
-        users_df = metrics['daily_users']
-        users_fig = px.bar(
-            users_df,
-            x='date_time',
-            y='count',
-            title='Usuarios Activos por Día',
-            labels={'date_time': 'Fecha', 'count': 'Número de Usuarios'},
-            color_discrete_sequence=['#3366CC']
-        )
-        
-        # Gráfico de recordatorios creados por día
-        created_df = metrics['daily_reminds_created']
-        created_fig = px.bar(
-            created_df,
-            x='date_time',
-            y='count',
-            title='Recordatorios Creados por Día',
-            labels={'date_time': 'Fecha', 'count': 'Número de Recordatorios'},
-            color_discrete_sequence=['#FF9900']
-        )
-        
-        # Gráfico de recordatorios enviados por día
-        sent_df = metrics['daily_reminds_sent']
-        sent_fig = px.bar(
-            sent_df,
-            x='date_time',
-            y='count',
-            title='Recordatorios Enviados por Día',
-            labels={'date_time': 'Fecha', 'count': 'Número de Recordatorios'},
-            color_discrete_sequence=['#109618']
-        )
-        
-        # Gráfico de comparación
-        if not metrics['daily_reminds_created'].empty or not metrics['daily_reminds_sent'].empty:
-            # Crear un dataframe combinado para la comparación
-            df_created = metrics['daily_reminds_created'].rename(columns={'count': 'Creados'})
-            df_sent = metrics['daily_reminds_sent'].rename(columns={'count': 'Enviados'})
-            
-            # Combinar dataframes
-            df_comparison = pd.merge(df_created, df_sent, on='date_time', how='outer').fillna(0)
-            
-            # Crear figura de comparación
-            comparison_fig = go.Figure()
-            comparison_fig.add_trace(go.Bar(
-                x=df_comparison['date_time'],
-                y=df_comparison['Creados'],
-                name='Creados',
-                marker_color='#FF9900'
-            ))
-            comparison_fig.add_trace(go.Bar(
-                x=df_comparison['date_time'],
-                y=df_comparison['Enviados'],
-                name='Enviados',
-                marker_color='#109618'
-            ))
-            
-            comparison_fig.update_layout(
-                title='Comparación: Recordatorios Creados vs Enviados por Día',
-                xaxis_title='Fecha',
-                yaxis_title='Número de Recordatorios',
-                barmode='group'
-            )
-        else:
-            comparison_fig = go.Figure()
-            comparison_fig.update_layout(
-                title='No hay datos para mostrar en el período seleccionado',
-                xaxis_title='Fecha',
-                yaxis_title='Número de Recordatorios'
-            )
-    else:  # view == 'monthly'
-        # Gráfico de usuarios mensuales
-        users_df = metrics['monthly_users']
-        users_fig = px.bar(
-            users_df,
-            x='mes',
-            y='count',
-            title='Usuarios Activos por Mes',
-            labels={'mes': 'Mes', 'count': 'Número de Usuarios'},
-            color_discrete_sequence=['#3366CC']
-        )
-        users_fig.update_xaxes(type='category')
-
-        # Gráfico de recordatorios creados por mes
-        created_df = metrics['monthly_reminds_created']
-        created_fig = px.bar(
-            created_df,
-            x='month',
-            y='count',
-            title='Recordatorios Creados por Mes',
-            labels={'month': 'Mes', 'count': 'Número de Recordatorios'},
-            color_discrete_sequence=['#FF9900']
-        )
-        created_fig.update_xaxes(type='category')
-
-        # Gráfico de recordatorios enviados por mes
-        sent_df = metrics['monthly_reminds_sent']
-        sent_fig = px.bar(
-            sent_df,
-            x='month',
-            y='count',
-            title='Recordatorios Enviados por Mes',
-            labels={'month': 'Mes', 'count': 'Número de Recordatorios'},
-            color_discrete_sequence=['#109618']
-        )
-        sent_fig.update_xaxes(type='category')
-        
-        # Gráfico de comparación
-        if not metrics['monthly_reminds_created'].empty or not metrics['monthly_reminds_sent'].empty:
-            # Crear un dataframe combinado para la comparación
-            df_created = metrics['monthly_reminds_created'].rename(columns={'count': 'Creados'})
-            df_sent = metrics['monthly_reminds_sent'].rename(columns={'count': 'Enviados'})
-            
-            # Combinar dataframes
-            df_comparison = pd.merge(df_created, df_sent, on='month', how='outer').fillna(0)
-            
-            # Crear figura de comparación
-            comparison_fig = go.Figure()
-            comparison_fig.add_trace(go.Bar(
-                x=df_comparison['month'],
-                y=df_comparison['Creados'],
-                name='Creados',
-                marker_color='#FF9900'
-            ))
-            comparison_fig.add_trace(go.Bar(
-                x=df_comparison['month'],
-                y=df_comparison['Enviados'],
-                name='Enviados',
-                marker_color='#109618'
-            ))
-            comparison_fig.update_xaxes(type='category')
-
-            comparison_fig.update_layout(
-                title='Comparación: Recordatorios Creados vs Enviados por Mes',
-                xaxis_title='Mes',
-                yaxis_title='Número de Recordatorios',
-                barmode='group'
-            )
-        else:
-            comparison_fig = go.Figure()
-            comparison_fig.update_layout(
-                title='No hay datos para mostrar en el período seleccionado',
-                xaxis_title='Mes',
-                yaxis_title='Número de Recordatorios'
-            )
-
     # Formatear estadísticas adicionales
     avg_daily_users = f"Usuarios: {metrics['average_daily_users']:.2f}"
     avg_daily_reminds_created = f"Recordatorios Creados: {metrics['average_daily_reminds_created']:.2f}"
@@ -409,17 +369,18 @@ def update_metrics(start_date, end_date, view):
     avg_per_user_daily_reminds_sent = f"Recordatorios Enviados Diarios: {metrics['average_per_user_daily_reminds_sent']:.2f}"
     avg_per_user_monthly_reminds_created = f"Recordatorios Creados Mensuales: {metrics['average_per_user_monthly_reminds_created']:.2f}"
     avg_per_user_monthly_reminds_sent = f"Recordatorios Enviados Mensuales: {metrics['average_per_user_monthly_reminds_sent']:.2f}"
+
+    latency_quantiles = ' · '.join(f"{name}: {format_duration(metrics[f'latency_{name}'])}"
+                                   for name in ('p50', 'p90', 'p99'))
     
-    return (
+    return [
         total_users,
+        new_users,
+        returning_users,
         total_reminds_created,
         total_reminds_sent,
         per_user_reminds_created,
         per_user_reminds_sent,
-        users_fig,
-        created_fig,
-        sent_fig,
-        comparison_fig,
         avg_daily_users,
         avg_daily_reminds_created,
         avg_daily_reminds_sent,
@@ -429,8 +390,108 @@ def update_metrics(start_date, end_date, view):
         avg_per_user_daily_reminds_created,
         avg_per_user_daily_reminds_sent,
         avg_per_user_monthly_reminds_created,
-        avg_per_user_monthly_reminds_sent
+        avg_per_user_monthly_reminds_sent,
+        latency_quantiles
+    ]
+
+
+def load_result(key):
+    """Métricas guardadas bajo key; si expiraron se recalculan y se vuelven a guardar."""
+    with span('result_store'):
+        metrics = result_store.get(key)
+    if metrics is None:
+        start_date, end_date = parse_result_key(key)
+        metrics = calculate_metrics(start_date, end_date)
+        # Los gráficos lo leen de result_store; sin cohortes solo por el TTL corto
+        ttl = cache_ttl(end_date) if is_cacheable(metrics) else Config.METRICS_CACHE_TTL
+        with span('result_store'):
+            result_store.set(key, metrics, ttl=ttl)
+    return metrics
+
+
+# El rango de fechas dispara la consulta y actualiza las tarjetas; el selector de
+# vista no pasa por acá
+@app.callback(
+    [Output('metrics-key', 'data')] + [Output(output_id, 'children') for output_id in STAT_OUTPUTS],
+    [
+        Input('start-date-picker', 'date'),
+        Input('end-date-picker', 'date')
+    ],
+    State('metrics-key', 'data')
+)
+def update_stats(start_date, end_date, current_key):
+    start_date, end_date = parse_date_range(start_date, end_date)
+    key = result_key(start_date, end_date)
+    if key == current_key:
+        # Misma fecha con otra hora: no hay nada que recalcular
+        return [no_update] * (len(STAT_OUTPUTS) + 1)
+
+    # Calcular métricas y dejarlas en el store para los gráficos
+    metrics = load_result(key)
+    return [key] + format_stats(metrics)
+
+
+# Los gráficos se redibujan a partir de las series ya calculadas para el rango
+@app.callback(
+    [
+        Output('users-graph', 'figure'),
+        Output('reminds-created-graph', 'figure'),
+        Output('reminds-sent-graph', 'figure'),
+        Output('comparison-graph', 'figure')
+    ],
+    [
+        Input('metrics-key', 'data'),
+        Input('view-selector', 'value')
+    ]
+)
+def update_graphs(key, view):
+    if not key:
+        return [no_update] * 4
+    metrics = load_result(key)
+    with span('figures'):
+        return build_figures(metrics, view)
+
+
+# La retención no depende de la vista diaria/mensual
+@app.callback(Output('retention-graph', 'figure'), Input('metrics-key', 'data'))
+def update_retention(key):
+    if not key:
+        return no_update
+    metrics = load_result(key)
+    with span('figures'):
+        return retention_figure(metrics['cohort_months'], metrics['cohort_sizes'], metrics['cohort_retention'])
+
+
+# Demora de envío en la vista seleccionada
+@app.callback(Output('latency-graph', 'figure'), [Input('metrics-key', 'data'), Input('view-selector', 'value')])
+def update_latency(key, view):
+    if not key:
+        return no_update
+    metrics = load_result(key)
+    with span('figures'):
+        return latency_figure(view, metrics['days'] if view == 'daily' else metrics['months'],
+                              *(metrics[f'{view}_latency_{name}'] for name in ('p50', 'p90', 'p99')))
+
+
+if live_watcher is not None:
+    # Solo lee los contadores en memoria: no consulta Mongo ni pasa por result_store
+    @app.callback(
+        [Output(output_id, 'children') for output_id in ('live-created', 'live-sent', 'live-users', 'live-latency')]
+        + [Output('live-graph', 'figure')],
+        Input('live-interval', 'n_intervals')
     )
+    def update_live(_):
+        counters = live_watcher.snapshot()
+        if counters is None:
+            return [no_update] * 5
+        with span('figures'):
+            return [
+                f"{counters['created']:,}",
+                f"{counters['sent']:,}",
+                f"{counters['users']:,}",
+                f"{format_duration(counters['latency_p50'])} / {format_duration(counters['latency_p90'])}",
+                hourly_figure(counters['hourly_created'], counters['hourly_sent'])
+            ]
 
 if __name__ == '__main__':
     app.run_server(debug=True, host='0.0.0.0', port=8050)
@@ -0,0 +1,76 @@
+"""
+Perfil de memoria de compute_series sobre un frame normalizado grande.
+
+Verifica que el cálculo no modifica el frame de entrada y que la memoria extra
+reservada queda por debajo de dos veces el tamaño del frame (con una copia por
+métrica serían seis o más). Termina con código 1 si alguna condición no se cumple:
+    python benchmarks/allocations.py --rows 5000000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from latency import NO_LATENCY  # noqa: E402
+from metrics import build_metrics, compute_series, date_axis, day_labels, day_to_month  # noqa: E402
+
+
+def synthetic_frame(rows, users, days, seed):
+    """Frame con el mismo esquema y garantías que load_reminders_frame."""
+    rng = np.random.default_rng(seed)
+    day = (19723 + rng.integers(0, days, rows)).astype(np.int32)
+    is_sent = rng.random(rows) < 0.7
+    columns = {
+        "day": day,
+        "month": day_to_month(day),
+        "is_sent": is_sent,
+        # Buckets de demora de 1 s a ~1 h con la precisión por defecto (1%)
+        "latency": np.where(is_sent, rng.integers(0, 410, rows), NO_LATENCY).astype(np.int32)
+    }
+    for values in columns.values():
+        values.flags.writeable = False
+    codes = np.minimum(rng.zipf(1.3, rows) - 1, users - 1).astype(np.int32)
+    user_ids = pd.Categorical.from_codes(codes, categories=[f"+569{i:08d}" for i in range(users)])
+    return pd.DataFrame({"user_id": user_ids, **columns}, copy=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    frame = synthetic_frame(args.rows, args.users, args.days, args.seed)
+    frame_bytes = int(frame.memory_usage(deep=False).sum())
+    columns_before = list(frame.columns)
+    checksum_before = pd.util.hash_pandas_object(frame, index=False).sum()
+
+    days = frame['day'].to_numpy()
+    axis = date_axis(day_labels([days.min()])[0], day_labels([days.max()])[0])
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    build_metrics(compute_series(frame, axis), axis)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    unchanged = (list(frame.columns) == columns_before
+                 and pd.util.hash_pandas_object(frame, index=False).sum() == checksum_before)
+    print(f"filas={args.rows:,}  frame={frame_bytes / 2**20:.1f} MiB  "
+          f"pico extra={peak / 2**20:.1f} MiB ({peak / frame_bytes:.2f}x)  tiempo={elapsed:.2f}s  "
+          f"frame intacto={'sí' if unchanged else 'NO'}")
+    if not unchanged or peak >= 2 * frame_bytes:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Prueba de carga del coalescing de calculate_metrics: N pedidos concurrentes del mismo
+rango deben hacer una sola consulta a Mongo. Usa mongomock (pip install mongomock)
+con una latencia artificial por consulta:
+    python benchmarks/coalescing.py --viewers 20 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import mongomock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import metrics  # noqa: E402
+from config import Config  # noqa: E402
+import mongomock_compat  # noqa: E402,F401
+from synthetic import load_reminders  # noqa: E402
+
+
+class CountingCollection:
+    """Delega en la colección real contando las llamadas a aggregate y agregando latencia."""
+
+    def __init__(self, collection, latency):
+        self._collection = collection
+        self.latency = latency
+        self.aggregates = 0
+        self._lock = threading.Lock()
+
+    def aggregate(self, *args, **kwargs):
+        with self._lock:
+            self.aggregates += 1
+        time.sleep(self.latency)
+        return self._collection.aggregate(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+class CountingClient:
+    def __init__(self, client, collection):
+        self._client = client
+        self._collection = collection
+
+    def __getitem__(self, db_name):
+        client = self
+
+        class Database:
+            def __getitem__(self, name):
+                if name == Config.MONGO_COLLECTION:
+                    return client._collection
+                return client._client[db_name][name]
+
+        return Database()
+
+
+def run_threads(viewers, fn):
+    barrier = threading.Barrier(viewers)
+    results = []
+
+    def viewer():
+        barrier.wait()
+        results.append(fn())
+
+    threads = [threading.Thread(target=viewer) for _ in range(viewers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, results
+
+
+async def run_async(viewers, start_date, end_date):
+    started = time.perf_counter()
+    results = await asyncio.gather(*(metrics.calculate_metrics_async(start_date, end_date) for _ in range(viewers)))
+    return time.perf_counter() - started, results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--viewers', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.5, help='segundos agregados a cada consulta')
+    parser.add_argument('--docs', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    client = mongomock.MongoClient()
+    collection = CountingCollection(client[Config.MONGO_DB_NAME][Config.MONGO_COLLECTION], args.latency)
+    load_reminders(collection, args.docs, users=500, days=args.days, seed=args.seed)
+    database.set_client(CountingClient(client, collection))
+    start_date, end_date = "2024-01-01", (datetime(2024, 1, 1) + timedelta(days=args.days - 1)).strftime('%Y-%m-%d')
+
+    scenarios = [
+        ('sin coalescing', lambda: run_threads(args.viewers, lambda: metrics._compute_metrics(start_date, end_date))),
+        ('calculate_metrics', lambda: run_threads(args.viewers, lambda: metrics.calculate_metrics(start_date, end_date))),
+        ('calculate_metrics_async', lambda: asyncio.run(run_async(args.viewers, start_date, end_date))),
+    ]
+    print(f"{args.viewers} pedidos concurrentes, {args.latency:.2f}s de latencia por consulta")
+    failed = False
+    for name, scenario in scenarios:
+        metrics.metrics_cache.invalidate()
+        collection.aggregates = 0
+        elapsed, results = scenario()
+        shared = all(result is results[0] for result in results)
+        print(f"  {name:<24} consultas={collection.aggregates:>4}  tiempo={elapsed:6.2f}s  "
+              f"mismo resultado={'sí' if shared else 'no'}")
+        if name != 'sin coalescing' and collection.aggregates != 1:
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
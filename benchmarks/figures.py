@@ -0,0 +1,66 @@
+"""
+Tiempo de construcción de los cuatro gráficos (app.build_figures) y tamaño del
+JSON que viaja al navegador, para series sintéticas de distintos largos:
+    python benchmarks/figures.py --days 30 365 1000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import plotly.io as pio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import build_figures  # noqa: E402
+from metrics import build_metrics, date_axis  # noqa: E402
+
+
+def synthetic_series(n_days, seed=42):
+    rng = np.random.default_rng(seed)
+    axis = date_axis("2024-01-01", (date(2024, 1, 1) + timedelta(days=n_days - 1)).isoformat())
+    created = rng.integers(50, 500, n_days)
+    sent = (created * rng.uniform(0.5, 0.9, n_days)).astype(np.int64)
+    users = (created * 0.4).astype(np.int64)
+
+    def monthly(values):
+        return np.bincount(axis['month_of_day'], weights=values).astype(np.int64)
+
+    return build_metrics({
+        "daily_users": users,
+        "monthly_users": monthly(users),
+        "daily_reminds_created": created,
+        "monthly_reminds_created": monthly(created),
+        "daily_reminds_sent": sent,
+        "monthly_reminds_sent": monthly(sent),
+        "total_users": int(users.sum()),
+        "total_reminds_created": int(created.sum()),
+        "total_reminds_sent": int(sent.sum())
+    }, axis)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 365, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for n_days in args.days:
+        metrics = synthetic_series(n_days)
+        for view in ("daily", "monthly"):
+            build_figures(metrics, view)  # calentamiento
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                figures = build_figures(metrics, view)
+            build_ms = (time.perf_counter() - started) / args.repeat * 1000
+            started = time.perf_counter()
+            payload = sum(len(pio.to_json(figure, validate=False)) for figure in figures)
+            json_ms = (time.perf_counter() - started) * 1000
+            print(f"días={n_days:>5}  vista={view:<8} construcción={build_ms:7.2f} ms  "
+                  f"serialización={json_ms:7.2f} ms  JSON={payload / 1024:8.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Compara memoria pico y tiempo de get_reminders_data (lista de dicts -> DataFrame)
+contra load_reminders_frame (lectura por lotes a columnas tipadas).
+
+Por defecto usa un cursor sintético en memoria (sin Mongo) para medir solo el costo
+del lado de la aplicación (los tiempos incluyen el costo de tracemalloc
+y de generar los documentos):
+    python benchmarks/loader_memory.py --docs 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import get_reminders_data, load_reminders_frame  # noqa: E402
+
+
+class SyntheticCollection:
+    """Imita collection.aggregate devolviendo documentos ya proyectados, generados al vuelo."""
+
+    def __init__(self, docs, users, days, seed):
+        self.docs = docs
+        self.users = users
+        self.days = days
+        self.seed = seed
+
+    def aggregate(self, pipeline, **kwargs):
+        project = pipeline[-1]["$project"]
+        compact = "day" in project
+        rng = random.Random(self.seed)
+        start = datetime(2024, 1, 1)
+        day_strings = [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(self.days)]
+        for _ in range(self.docs):
+            user_id = f"+569{int(rng.paretovariate(1.2) * 1000) % self.users:08d}"
+            day = day_strings[rng.randrange(self.days)]
+            sent = rng.random() < 0.7
+            if compact:
+                yield {"user_id": user_id, "day": day, "sent": sent}
+            else:
+                yield {"user_id": user_id, "date_time": day, "sentAt": day if sent else None,
+                       "status": "sent" if sent else "not_sent"}
+
+
+def measure(label, loader, collection):
+    tracemalloc.start()
+    started = time.perf_counter()
+    frame = loader(collection, "2024-01-01", "2024-12-31")
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    final = frame.memory_usage(deep=True).sum()
+    print(f"{label:<22} filas={len(frame):>9,}  tiempo={elapsed:7.2f}s  "
+          f"pico={peak / 2**20:8.1f} MiB  frame={final / 2**20:8.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    collection = SyntheticCollection(args.docs, args.users, args.days, args.seed)
+    measure("get_reminders_data", get_reminders_data, collection)
+    measure("load_reminders_frame",
+            lambda c, s, e: load_reminders_frame(c, s, e, batch_size=args.batch_size), collection)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Operadores de Mongo que usan los pipelines y que mongomock no implementa: $toDate y
+$convert a fecha (con onError / onNull) con strings ISO (con su offset), y $dateToString
+con timezone / onNull. Solo para correr los
+benchmarks sin servidor; importar este módulo antes de consultar:
+    import mongomock_compat  # noqa: F401
+"""
+import os
+import sys
+from datetime import datetime, timezone
+
+from mongomock import aggregate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dates import parse_timezone  # noqa: E402
+
+_Parser = aggregate._Parser
+_convert = _Parser._handle_type_convertion_operator
+_date_operator = _Parser._handle_date_operator
+
+
+def _to_date(value):
+    """Igual que Mongo: instante UTC (naive, como los retorna pymongo)."""
+    if value is None or isinstance(value, datetime):
+        return value
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        return parsed
+    return parsed.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _handle_type_convertion_operator(self, operator, values):
+    if operator == '$toDate':
+        try:
+            return _to_date(self.parse(values))
+        except KeyError:
+            return None
+    if operator == '$convert' and isinstance(values, dict) and values.get('to') == 'date':
+        try:
+            value = self.parse(values['input'])
+        except KeyError:
+            value = None
+        if value is None:
+            return values.get('onNull')
+        try:
+            return _to_date(value)
+        except (AttributeError, ValueError):
+            if 'onError' not in values:
+                raise
+            return values['onError']
+    return _convert(self, operator, values)
+
+
+def _handle_date_operator(self, operator, values):
+    if operator == '$dateToString' and isinstance(values, dict):
+        try:
+            value = self.parse(values['date'])
+        except KeyError:
+            value = None
+        if value is None:
+            return values.get('onNull')
+        if values.get('timezone'):
+            value = value.replace(tzinfo=timezone.utc).astimezone(parse_timezone(values['timezone']))
+        return value.strftime(values['format'])
+    return _date_operator(self, operator, values)
+
+
+_Parser._handle_type_convertion_operator = _handle_type_convertion_operator
+_Parser._handle_date_operator = _handle_date_operator
+if '$toDate' not in aggregate.type_convertion_operators:
+    aggregate.type_convertion_operators.append('$toDate')
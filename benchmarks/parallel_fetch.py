@@ -0,0 +1,83 @@
+"""
+Compara get_reminders_summary (una sola agregación) contra get_chunked_summary
+(tramos de FETCH_CHUNK_DAYS días consultados en paralelo) sobre un Mongo local con
+datos sintéticos. Carga los documentos en una base aparte y verifica que ambos
+caminos den el mismo resumen:
+    python benchmarks/parallel_fetch.py --uri mongodb://localhost:27017 --docs 2000000
+    python benchmarks/parallel_fetch.py --mongomock --docs 20000   # sin servidor, solo para probar el script
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from metrics import chunk_cache, get_chunked_summary, get_reminders_summary  # noqa: E402
+from synthetic import load_reminders  # noqa: E402
+
+
+def comparable(summary):
+    # El total de $facet trae _id: None
+    totals = {key: value for key, value in summary['totals'].items() if key != '_id'}
+    return summary['daily'], summary['monthly'], totals
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        chunk_cache.invalidate()
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=Config.MONGO_URI)
+    parser.add_argument("--mongomock", action="store_true", help="usar mongomock en vez de un servidor")
+    parser.add_argument("--db", default="RemindMe-bench")
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--ranges", type=int, nargs="+", default=[90, 180, 365])
+    parser.add_argument("--chunk-days", type=int, nargs="+", default=[Config.FETCH_CHUNK_DAYS])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-load", action="store_true", help="reutilizar los datos ya cargados")
+    args = parser.parse_args()
+
+    if args.mongomock:
+        import mongomock
+        import mongomock_compat  # noqa: F401
+        client = mongomock.MongoClient()
+    else:
+        client = MongoClient(args.uri)
+    collection = client[args.db]["reminders"]
+    if not args.skip_load:
+        started = time.perf_counter()
+        load_reminders(collection, args.docs, args.users, args.days, args.seed)
+        print(f"{args.docs:,} documentos cargados en {time.perf_counter() - started:.1f}s")
+
+    print(f"FETCH_CONCURRENCY={Config.FETCH_CONCURRENCY}")
+    for length in args.ranges:
+        start_date = "2024-01-01"
+        end_date = (datetime(2024, 1, 1) + timedelta(days=length - 1)).strftime('%Y-%m-%d')
+        single, expected = timed(lambda: get_reminders_summary(collection, start_date, end_date), args.repeat)
+        print(f"{length:>4} días  una consulta       {single:7.2f}s")
+        for chunk_days in args.chunk_days:
+            Config.FETCH_CHUNK_DAYS = chunk_days
+            chunked, result = timed(lambda: get_chunked_summary(collection, start_date, end_date), args.repeat)
+            if comparable(result) != comparable(expected):
+                sys.exit(f"El resumen por tramos de {chunk_days} días no coincide con el de una consulta")
+            print(f"{length:>4} días  tramos de {chunk_days:>3} días {chunked:7.2f}s  ({single / chunked:4.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+Bytes y tiempos de las respuestas de los callbacks del dashboard (update_stats y
+update_graphs en las dos vistas), antes y después de responses.py: serialización con
+json vs orjson y cuerpo sin comprimir vs gzip/br; además la revalidación con ETag (304)
+del layout, que es un GET.
+Hace los pedidos contra la app Flask real (test client) con datos sintéticos:
+    python benchmarks/responses.py --uri mongodb://localhost:27017 --docs 200000
+    python benchmarks/responses.py --mongomock --docs 20000 --output responses.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault('WARMUP_ENABLED', 'false')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import plotly.io as pio  # noqa: E402
+from plotly.io.json import to_json_plotly  # noqa: E402
+from pymongo import MongoClient  # noqa: E402
+
+import database  # noqa: E402
+from app import server  # noqa: E402
+from config import Config  # noqa: E402
+from responses import orjson  # noqa: E402
+from synthetic import START_DAY, load_reminders  # noqa: E402
+
+ENGINES = ('json', 'orjson') if orjson is not None else ('json',)
+# (variante, motor JSON, Accept-Encoding); la primera es como respondía el dashboard antes
+VARIANTS = [('antes: json sin comprimir', 'json', 'identity')]
+if orjson is not None:
+    VARIANTS.append(('orjson sin comprimir', 'orjson', 'identity'))
+VARIANTS += [(f'{ENGINES[-1]} {encoding}', ENGINES[-1], encoding) for encoding in ('gzip', 'br')]
+
+
+def measure(fn, repeat):
+    """Ejecuta fn repeat veces; retorna (tiempos, último resultado)."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return times, result
+
+
+def summary(times):
+    return {"best_s": round(min(times), 6), "median_s": round(statistics.median(times), 6), "runs": len(times)}
+
+
+def callback_body(dependency, values):
+    """Cuerpo del POST a _dash-update-component que manda el navegador para el callback."""
+    outputs = [{"id": output_id, "property": prop} for output_id, prop in
+               (output.rsplit('.', 1) for output in dependency['output'].strip('.').split('...'))]
+    changed = dependency['inputs'][0]
+    return {
+        "output": dependency['output'],
+        # Los callbacks de varios outputs tienen la forma '..a.prop...b.prop..'
+        "outputs": outputs if dependency['output'].startswith('..') else outputs[0],
+        "inputs": [dict(item, value=value) for item, value in zip(dependency['inputs'], values)],
+        "changedPropIds": [f"{changed['id']}.{changed['property']}"],
+        "state": [dict(item, value=None) for item in dependency.get('state', [])]
+    }
+
+
+def bench_callback(client, name, body, repeat):
+    rows = []
+    engine = pio.json.config.default_engine
+    post = lambda encoding, headers=None: client.post(  # noqa: E731
+        '/_dash-update-component', json=body, headers={'Accept-Encoding': encoding, **(headers or {})})
+    payload = post('identity').get_json()
+    for variant_engine in ENGINES:
+        # Lo que hace Dash con lo que retorna el callback
+        times, data = measure(lambda: to_json_plotly(payload, engine=variant_engine), repeat)
+        rows.append({"callback": name, "variant": f"serializar[{variant_engine}]", "bytes": len(data), **summary(times)})
+    for variant, variant_engine, encoding in VARIANTS:
+        pio.json.config.default_engine = variant_engine
+        times, response = measure(lambda: post(encoding), repeat)
+        rows.append({"callback": name, "variant": variant, "bytes": len(response.data), **summary(times)})
+    pio.json.config.default_engine = engine
+    return rows
+
+
+def bench_layout(client, repeat):
+    """Layout completo vs revalidación con el ETag de la respuesta anterior (304)."""
+    get = lambda headers=None: client.get('/_dash-layout', headers={'Accept-Encoding': 'br', **(headers or {})})  # noqa: E731
+    times, response = measure(get, repeat)
+    rows = [{"callback": "layout", "variant": "br", "bytes": len(response.data), **summary(times)}]
+    times, revalidated = measure(lambda: get({'If-None-Match': response.headers['ETag']}), repeat)
+    if revalidated.status_code != 304:
+        sys.exit(f"layout: se esperaba 304 al revalidar y llegó {revalidated.status_code}")
+    rows.append({"callback": "layout", "variant": "revalidación (304)", "bytes": len(revalidated.data),
+                 **summary(times)})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=Config.MONGO_URI)
+    parser.add_argument("--mongomock", action="store_true", help="usar mongomock en vez de un servidor")
+    parser.add_argument("--db", default="RemindMe-bench")
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--ranges", type=int, nargs="+", default=[30, 365])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-load", action="store_true", help="reutilizar los datos ya cargados")
+    parser.add_argument("--output", help="guardar los resultados en JSON")
+    args = parser.parse_args()
+
+    if not Config.COMPRESS_ENABLED:
+        sys.exit("COMPRESS_ENABLED está desactivado: no hay nada que comparar")
+    if args.mongomock:
+        import mongomock
+        import mongomock_compat  # noqa: F401
+        client = mongomock.MongoClient()
+    else:
+        client = MongoClient(args.uri)
+    Config.MONGO_DB_NAME = args.db
+    database.set_client(client)
+    if not args.skip_load:
+        started = time.perf_counter()
+        load_reminders(database.get_reminders_collection(), args.docs, args.users, args.days, args.seed)
+        print(f"{args.docs:,} documentos cargados en {time.perf_counter() - started:.1f}s")
+
+    http = server.test_client()
+    dependencies = http.get('/_dash-dependencies').get_json()
+    stats = next(dependency for dependency in dependencies if dependency['output'].startswith('..metrics-key.data'))
+    graphs = next(dependency for dependency in dependencies if 'users-graph.figure' in dependency['output'])
+
+    first_day = str(START_DAY.astype('datetime64[D]'))
+    results = []
+    for range_days in args.ranges:
+        start_date = first_day
+        end_date = (datetime.strptime(first_day, '%Y-%m-%d') + timedelta(days=min(range_days, args.days) - 1)
+                    ).strftime('%Y-%m-%d')
+        stats_body = callback_body(stats, [start_date, end_date])
+        # update_stats deja el resultado en result_store y retorna su clave
+        key = http.post('/_dash-update-component', json=stats_body).get_json()['response']['metrics-key']['data']
+        callbacks = [('update_stats', stats_body)]
+        callbacks += [(f'update_graphs[{view}]', callback_body(graphs, [key, view])) for view in ('daily', 'monthly')]
+        print(f"\n{range_days} días ({start_date} a {end_date})")
+        for name, body in callbacks:
+            rows = bench_callback(http, name, body, args.repeat)
+            before = rows[len(ENGINES)]
+            for row in rows:
+                row.update(range_days=range_days)
+                ratio = f"{row['bytes'] / before['bytes'] * 100:5.1f}%" if 'serializar' not in row['variant'] else ''
+                print(f"  {name:<24} {row['variant']:<28} {row['bytes']:>9,} B {ratio:>6} "
+                      f"{row['best_s'] * 1000:8.2f} ms")
+            results += rows
+
+    print()
+    for row in bench_layout(http, args.repeat):
+        print(f"  {row['callback']:<24} {row['variant']:<28} {row['bytes']:>9,} B        {row['best_s'] * 1000:8.2f} ms")
+        results.append(row)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print(f"Resultados en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+Benchmark reproducible del camino completo del dashboard: carga documentos sintéticos
+(benchmarks/synthetic.py) en un mongod local o en mongomock y mide cada etapa
+(lectura de Mongo, armado del frame, métricas, tarjetas y gráficos) para varios
+largos de rango. Los resultados quedan en JSON para comparar entre commits:
+    python benchmarks/run.py --docs 10000 100000 1000000 --output bench-$(git rev-parse --short HEAD).json
+    python benchmarks/run.py --mongomock --docs 10000 --ranges 7 30
+    python benchmarks/run.py --docs 100000 --baseline bench-anterior.json   # muestra la variación por etapa
+
+Usa la base --db (RemindMe-bench por defecto), que se borra y se vuelve a cargar.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault('WARMUP_ENABLED', 'false')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plotly.io.json import to_json_plotly  # noqa: E402
+from pymongo import MongoClient  # noqa: E402
+
+import database  # noqa: E402
+import metrics  # noqa: E402
+from app import build_figures, format_stats  # noqa: E402
+from config import Config  # noqa: E402
+from cohorts import refresh_user_index  # noqa: E402
+from rollups import refresh_rollups  # noqa: E402
+import snapshot  # noqa: E402
+from synthetic import START_DAY, load_reminders  # noqa: E402
+
+AGGREGATIONS = ('server', 'pandas', 'rollup')
+if snapshot.pa is not None:
+    AGGREGATIONS += ('snapshot',)
+
+
+def measure(fn, repeat):
+    """Ejecuta fn repeat veces; retorna (tiempos, último resultado)."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return times, result
+
+
+def summary(times):
+    return {"best_s": round(min(times), 6), "median_s": round(statistics.median(times), 6), "runs": len(times)}
+
+
+def compute_uncached(aggregation, start_date, end_date):
+    Config.METRICS_AGGREGATION = aggregation
+    metrics.chunk_cache.invalidate()
+    return metrics._compute_metrics(start_date, end_date)
+
+
+def serialize_figures(result, view):
+    # Lo mismo que hace Dash con la respuesta de update_graphs
+    return to_json_plotly(list(build_figures(result, view)))
+
+
+def bench_range(collection, range_days, last_day, repeat):
+    end_date = last_day
+    start_date = (datetime.strptime(last_day, '%Y-%m-%d') - timedelta(days=range_days - 1)).strftime('%Y-%m-%d')
+    stages = {
+        "get_reminders_data": lambda: metrics.get_reminders_data(collection, start_date, end_date),
+        "load_reminders_frame": lambda: metrics.load_reminders_frame(collection, start_date, end_date),
+        "get_reminders_summary": lambda: metrics.get_reminders_summary(collection, start_date, end_date),
+        "get_chunked_summary": lambda: (metrics.chunk_cache.invalidate(),
+                                        metrics.get_chunked_summary(collection, start_date, end_date))[1],
+    }
+    for aggregation in AGGREGATIONS:
+        stages[f"calculate_metrics[{aggregation}]"] = (
+            lambda aggregation=aggregation: compute_uncached(aggregation, start_date, end_date))
+
+    rows = []
+    results = {}
+    for stage, fn in stages.items():
+        times, results[stage] = measure(fn, repeat)
+        rows.append({"stage": stage, **summary(times)})
+
+    frame = results["load_reminders_frame"]
+    axis = metrics.date_axis(start_date, end_date)
+    times, _ = measure(lambda: metrics.build_metrics(metrics.compute_series(frame, axis), axis), repeat)
+    rows.append({"stage": "compute_series+build_metrics", **summary(times)})
+
+    result = results["calculate_metrics[server]"]
+    times, _ = measure(lambda: format_stats(result), repeat)
+    rows.append({"stage": "update_stats", **summary(times)})
+    for view in ('daily', 'monthly'):
+        times, payload = measure(lambda: serialize_figures(result, view), repeat)
+        rows.append({"stage": f"update_graphs[{view}]", **summary(times), "payload_bytes": len(payload)})
+
+    for row in rows:
+        row.update(range_days=range_days, start_date=start_date, end_date=end_date)
+    return rows
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(report, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(row['docs'], row['range_days'], row['stage']): row['best_s'] for row in baseline['results']}
+    print(f"\nComparación con {baseline_path} ({(baseline['meta'].get('commit') or '?')[:10]}):")
+    for row in report['results']:
+        before = previous.get((row['docs'], row['range_days'], row['stage']))
+        if before:
+            change = (row['best_s'] - before) / before * 100
+            print(f"  {row['docs']:>10,} {row['range_days'] or '-':>4}d {row['stage']:<34} "
+                  f"{before:9.4f}s -> {row['best_s']:9.4f}s  {change:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=Config.MONGO_URI)
+    parser.add_argument("--mongomock", action="store_true", help="usar mongomock en vez de un servidor")
+    parser.add_argument("--db", default="RemindMe-bench")
+    parser.add_argument("--docs", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--days", type=int, default=365, help="días cubiertos por los datos generados")
+    parser.add_argument("--ranges", type=int, nargs="+", default=[7, 30, 90, 365])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="JSON de una corrida anterior para comparar")
+    args = parser.parse_args()
+
+    if args.mongomock:
+        import mongomock
+        import mongomock_compat  # noqa: F401
+        client = mongomock.MongoClient()
+    else:
+        client = MongoClient(args.uri)
+    Config.MONGO_DB_NAME = args.db
+    database.set_client(client)
+    collection = database.get_reminders_collection()
+    last_day = str(START_DAY.astype('datetime64[D]') + args.days - 1)
+    aggregation = Config.METRICS_AGGREGATION
+    # refresh_rollups y refresh_user_index se miden aparte; calculate_metrics solo lee
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": "mongomock" if args.mongomock else "mongod",
+            "args": vars(args)
+        },
+        "results": []
+    }
+    for docs in args.docs:
+        started = time.perf_counter()
+        load_reminders(collection, docs, args.users, args.days, args.seed)
+        print(f"{docs:,} documentos cargados en {time.perf_counter() - started:.1f}s")
+        for name in (Config.ROLLUP_COLLECTION, Config.ROLLUP_STATE_COLLECTION, Config.USERS_COLLECTION,
+                     Config.COHORTS_COLLECTION):
+            database.get_collection(name).drop()
+        times, _ = measure(lambda: refresh_rollups(collection, database.get_rollup_collection(),
+                                                   database.get_rollup_state_collection()), 1)
+        report["results"].append({"docs": docs, "range_days": None, "stage": "refresh_rollups[full]",
+                                  **summary(times)})
+        print(f"       refresh_rollups[full]                 {min(times):9.4f}s")
+        times, _ = measure(lambda: refresh_user_index(collection, database.get_users_collection(),
+                                                      database.get_cohorts_collection(),
+                                                      database.get_rollup_state_collection()), 1)
+        report["results"].append({"docs": docs, "range_days": None, "stage": "refresh_user_index[full]",
+                                  **summary(times)})
+        print(f"       refresh_user_index[full]              {min(times):9.4f}s")
+        if 'snapshot' in AGGREGATIONS:
+            Config.SNAPSHOT_PATH = tempfile.mkdtemp(prefix='remindme-bench-snapshot-')
+            times, _ = measure(lambda: snapshot.export_snapshot(collection, Config.SNAPSHOT_PATH), 1)
+            report["results"].append({"docs": docs, "range_days": None, "stage": "export_snapshot[full]",
+                                      **summary(times)})
+            print(f"       export_snapshot[full]                 {min(times):9.4f}s")
+
+        for range_days in args.ranges:
+            for row in bench_range(collection, min(range_days, args.days), last_day, args.repeat):
+                report["results"].append({"docs": docs, **row})
+                print(f"  {row['range_days']:>4}d {row['stage']:<34} {row['best_s']:9.4f}s")
+    Config.METRICS_AGGREGATION = aggregation
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados en {args.output}")
+    if args.baseline:
+        print_comparison(report, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
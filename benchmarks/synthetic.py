@@ -0,0 +1,64 @@
+"""
+Generador reproducible de documentos de la colección reminders para los benchmarks.
+
+Los documentos imitan a los reales: user_id con distribución sesgada (pocos usuarios
+con muchos recordatorios), status sent / not_sent (y algunos sin status), date_time y
+sentAt como strings ISO con offset -04:00. La misma semilla genera siempre los mismos
+documentos, en lotes para que 10M no tengan que estar en memoria a la vez.
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexes import ensure_indexes  # noqa: E402
+
+START_DAY = np.datetime64('2024-01-01T00:00')
+OFFSET = '-04:00'
+
+
+def _iso(values):
+    """datetime64 -> '2024-01-01T09:30:00.000-04:00' (el formato de la colección)."""
+    return np.char.add(np.datetime_as_string(values, unit='ms'), OFFSET)
+
+
+def generate_reminders(docs, users=50_000, days=365, seed=42, sent_ratio=0.7, missing_status_ratio=0.05,
+                       batch_size=100_000):
+    """Genera lotes (listas de dicts) con docs recordatorios en total, repartidos en days días."""
+    rng = np.random.default_rng(seed)
+    generated = 0
+    while generated < docs:
+        size = min(batch_size, docs - generated)
+        # Zipf: unos pocos usuarios concentran buena parte de los recordatorios
+        user_codes = (rng.zipf(1.3, size) - 1) % users
+        minutes = rng.integers(0, days * 24 * 60, size)
+        date_time = START_DAY + minutes.astype('timedelta64[m]')
+        # Envío entre unos segundos y un par de horas después de la hora programada
+        delay = rng.gamma(1.5, 600.0, size).astype(np.int64)
+        sent_at = _iso(date_time.astype('datetime64[s]') + delay.astype('timedelta64[s]'))
+        date_time = _iso(date_time)
+        roll = rng.random(size)
+
+        batch = []
+        for i in range(size):
+            doc = {"user_id": f"+569{user_codes[i]:08d}", "date_time": str(date_time[i])}
+            if roll[i] < sent_ratio:
+                doc["status"] = "sent"
+                doc["sentAt"] = str(sent_at[i])
+            elif roll[i] < 1 - missing_status_ratio:
+                doc["status"] = "not_sent"
+            batch.append(doc)
+        generated += size
+        yield batch
+
+
+def load_reminders(collection, docs, users=50_000, days=365, seed=42, drop=True, **kwargs):
+    """Carga los documentos generados en la colección (Mongo o mongomock) y crea los índices."""
+    if drop:
+        collection.drop()
+    for batch in generate_reminders(docs, users, days, seed, **kwargs):
+        collection.insert_many(batch, ordered=False)
+    ensure_indexes(collection)
+    return docs
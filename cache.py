@@ -0,0 +1,152 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def estimate_size(value):
+    """Tamaño aproximado en bytes de un resultado (dicts, arreglos, DataFrames y escalares)."""
+    if isinstance(value, np.ndarray):
+        return sys.getsizeof(value) + (value.nbytes if value.base is not None else 0)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class TTLCache:
+    """
+    Cache LRU acotado por cantidad de entradas y bytes, con expiración por entrada.
+    Es seguro entre hilos; los valores guardados no deben modificarse después de leerlos.
+    """
+
+    def __init__(self, ttl, max_entries, max_bytes=0, sizeof=estimate_size, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        self._data = OrderedDict()  # key -> (expires_at, size, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        return self._lookup(key, default, count=True)
+
+    def peek(self, key, default=None):
+        """Como get, pero sin contar el acierto o el fallo en las estadísticas."""
+        return self._lookup(key, default, count=False)
+
+    def _lookup(self, key, default, count):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += count
+                return default
+            expires_at, _, value = entry
+            if expires_at <= self.clock():
+                self._pop(key)
+                self.misses += count
+                return default
+            self._data.move_to_end(key)
+            self.hits += count
+            return value
+
+    def set(self, key, value, ttl=None):
+        size = self.sizeof(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            # No entra nunca: no vale la pena desalojar todo lo demás
+            return
+        expires_at = self.clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (expires_at, size, value)
+            self.total_bytes += size
+            while len(self._data) > self.max_entries or (self.max_bytes and self.total_bytes > self.max_bytes):
+                self._pop(next(iter(self._data)))
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        """Elimina una entrada, o todas si no se indica clave."""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+                self.total_bytes = 0
+            elif key in self._data:
+                self._pop(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._data),
+                "bytes": self.total_bytes
+            }
+
+    def _pop(self, key):
+        _, size, _ = self._data.pop(key)
+        self.total_bytes -= size
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SingleFlight:
+    """
+    Coalesce llamadas concurrentes con la misma clave: la primera ejecuta la función
+    y las demás esperan y reciben el mismo resultado (o la misma excepción).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
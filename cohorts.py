@@ -0,0 +1,188 @@
+from datetime import datetime
+from itertools import islice
+
+import numpy as np
+from pymongo import DeleteOne, ReplaceOne, UpdateOne
+
+from database import (get_cohorts_collection, get_reminders_collection, get_rollup_state_collection,
+                      get_users_collection)
+from dates import day_bucket, timestamp_stage, today
+from rollups import inserted_since, latest_id
+
+# Documento de estado (watermark) en la colección de estado de los rollups
+USERS_STATE_ID = 'users'
+# Usuarios por consulta $in al leer el índice
+LOOKUP_BATCH = 10_000
+
+
+def first_seen_pipeline(match):
+    """Primer y último día (en la zona de reporte) de cada usuario en los recordatorios de match."""
+    return [
+        {"$match": match},
+        timestamp_stage(),
+        {"$group": {"_id": "$user_id", "first_day": {"$min": day_bucket()}, "last_day": {"$max": day_bucket()}}}
+    ]
+
+
+def _batches(values, size):
+    values = iter(values)
+    while batch := list(islice(values, size)):
+        yield batch
+
+
+def refresh_user_index(collection, users_collection, cohorts_collection, state_collection):
+    """
+    Actualiza el índice de usuarios (primer y último día visto de cada uno) con los
+    recordatorios insertados desde el watermark de _id de la corrida anterior (date_time
+    es la hora programada: un recordatorio nuevo puede tener una anterior), y recalcula solo
+    las cohortes de los usuarios que cambiaron. Las actualizaciones son $min/$max:
+    repetirlas (o correrlas en dos procesos a la vez) no cambia el resultado.
+    Retorna la lista de cohortes (yyyy-mm) recalculadas.
+    """
+    state = state_collection.find_one({"_id": USERS_STATE_ID})
+    # Igual que refresh_rollups: el watermark se lee antes de consultar
+    last_id = latest_id(collection)
+    if last_id is None:
+        return []
+
+    # Un estado sin last_id (formato anterior) relee todo: las actualizaciones son $min/$max
+    if state is not None and state.get('last_id') is None:
+        state = None
+    match = {} if state is None else inserted_since(state['last_id'])
+    seen = {doc['_id']: doc for doc in collection.aggregate(first_seen_pipeline(match), allowDiskUse=True)
+            if doc['_id'] is not None and doc['first_day'] is not None}
+
+    if state is None:
+        users_collection.create_index('first_month')
+        months = None
+    else:
+        # Cohorte anterior y nueva de cada usuario (la primera cambia si llegan datos atrasados)
+        months = set()
+        for ids in _batches(seen, LOOKUP_BATCH):
+            for doc in users_collection.find({"_id": {"$in": ids}}, {"first_day": 1}):
+                months.add(doc['first_day'][:7])
+                seen[doc['_id']]['first_day'] = min(seen[doc['_id']]['first_day'], doc['first_day'])
+        months.update(doc['first_day'][:7] for doc in seen.values())
+
+    requests = [UpdateOne(
+        {"_id": user_id},
+        # El mes es prefijo del día: $min/$max dan el mismo resultado sobre ambos
+        {"$min": {"first_day": doc['first_day'], "first_month": doc['first_day'][:7]},
+         "$max": {"last_day": doc['last_day'], "last_month": doc['last_day'][:7]}},
+        upsert=True
+    ) for user_id, doc in seen.items()]
+    if requests:
+        users_collection.bulk_write(requests, ordered=False)
+
+    rebuilt = rebuild_cohorts(users_collection, cohorts_collection, months)
+    state_collection.replace_one(
+        {"_id": USERS_STATE_ID},
+        {"_id": USERS_STATE_ID, "last_id": last_id, "updated_at": datetime.utcnow()},
+        upsert=True
+    )
+    return rebuilt
+
+
+def rebuild_cohorts(users_collection, cohorts_collection, months=None):
+    """
+    Recalcula desde el índice de usuarios las cohortes (mes del primer día visto) dadas,
+    o todas si months es None. Cada cohorte guarda sus usuarios nuevos por día y cuántos
+    de ellos se vieron por última vez en cada mes. Retorna las cohortes recalculadas.
+    """
+    if months is not None and not months:
+        return []
+    match = {} if months is None else {"first_month": {"$in": sorted(months)}}
+    cohorts = {}
+    for doc in users_collection.aggregate([
+        {"$match": match},
+        {"$group": {"_id": {"first_day": "$first_day", "last_month": "$last_month"}, "users": {"$sum": 1}}}
+    ], allowDiskUse=True):
+        first_day, last_month = doc['_id']['first_day'], doc['_id']['last_month']
+        cohort = cohorts.setdefault(first_day[:7], {"_id": first_day[:7], "users": 0, "new": {}, "last_seen": {}})
+        cohort['users'] += doc['users']
+        cohort['new'][first_day] = cohort['new'].get(first_day, 0) + doc['users']
+        cohort['last_seen'][last_month] = cohort['last_seen'].get(last_month, 0) + doc['users']
+
+    requests = [ReplaceOne({"_id": month}, cohort, upsert=True) for month, cohort in cohorts.items()]
+    # Cohortes que quedaron sin usuarios
+    requests += [DeleteOne({"_id": month}) for month in (months or ()) if month not in cohorts]
+    if requests:
+        cohorts_collection.bulk_write(requests, ordered=False)
+    return sorted(set(cohorts) | set(months or ()))
+
+
+def _month_number(month):
+    year, month = month.split('-')
+    return int(year) * 12 + int(month) - 1
+
+
+def retention_matrix(cohorts, current_month):
+    """
+    Retención de cada cohorte (ordenadas por mes): fracción de sus usuarios que se
+    siguen viendo k meses después de su primer mes, es decir, con último día visto en
+    el mes k o en uno posterior. Las celdas posteriores a current_month son NaN.
+    Retorna (tamaños, matriz cohortes x meses).
+    """
+    if not cohorts:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 0))
+    current = _month_number(current_month)
+    starts = [_month_number(cohort['_id']) for cohort in cohorts]
+    width = max(current - min(starts), 0) + 1
+    sizes = np.array([cohort['users'] for cohort in cohorts], dtype=np.int64)
+    # Usuarios por (cohorte, meses desde el primero hasta el último visto)
+    last_seen = np.zeros((len(cohorts), width + 1), dtype=np.int64)
+    for row, (start, cohort) in enumerate(zip(starts, cohorts)):
+        for month, users in cohort['last_seen'].items():
+            last_seen[row, min(max(_month_number(month) - start, 0), width)] += users
+    # Vistos en el mes k o después: suma acumulada desde la derecha
+    retained = np.cumsum(last_seen[:, ::-1], axis=1)[:, ::-1][:, :width]
+    retention = retained / np.maximum(sizes, 1)[:, None]
+    observable = np.arange(width)[None, :] <= (current - np.array(starts))[:, None]
+    return sizes, np.where(observable, retention, np.nan)
+
+
+def get_cohort_metrics(cohorts_collection, start_date, end_date, total_users):
+    """
+    Usuarios nuevos (primer día visto dentro del rango) y recurrentes (activos en el
+    rango que ya se habían visto antes) y la retención de las cohortes que empiezan en
+    el rango. Solo lee los documentos de cohorte de los meses del rango.
+    """
+    cohorts = list(cohorts_collection.find({"_id": {"$gte": start_date[:7], "$lte": end_date[:7]}}).sort("_id", 1))
+    new_users = sum(users for cohort in cohorts for day, users in cohort['new'].items()
+                    if start_date <= day <= end_date)
+    sizes, retention = retention_matrix(cohorts, min(end_date, today())[:7])
+    return {
+        "new_users": new_users,
+        # total_users puede ser aproximado (UNIQUE_USERS_MODE=approx)
+        "returning_users": max(total_users - new_users, 0),
+        "cohort_months": [cohort['_id'] for cohort in cohorts],
+        "cohort_sizes": sizes,
+        "cohort_retention": retention
+    }
+
+
+def empty_cohort_metrics():
+    return {
+        "new_users": 0,
+        "returning_users": 0,
+        "cohort_months": [],
+        "cohort_sizes": np.zeros(0, dtype=np.int64),
+        "cohort_retention": np.zeros((0, 0))
+    }
+
+
+def user_index_ready(state_collection):
+    """Si refresh_user_index ya armó el índice de usuarios (antes, todos parecerían recurrentes)."""
+    return state_collection.find_one({"_id": USERS_STATE_ID}, {"_id": 1}) is not None
+
+
+def pending_cohort_metrics():
+    """Métricas de cohortes mientras no hay índice de usuarios: nuevos y recurrentes sin valor (None)."""
+    return dict(empty_cohort_metrics(), new_users=None, returning_users=None)
+
+
+if __name__ == '__main__':
+    # Pensado para correr periódicamente (cron / scheduler), igual que rollups.py
+    refreshed = refresh_user_index(get_reminders_collection(), get_users_collection(), get_cohorts_collection(),
+                                   get_rollup_state_collection())
+    print(f"Índice de usuarios actualizado: {len(refreshed)} cohortes recalculadas")
@@ -1,8 +1,120 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
 class Config:
     MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-    DEBUG = os.getenv("DEBUG", "False").lower() == "true"
\ No newline at end of file
+    DEBUG = os.getenv("DEBUG", "False").lower() == "true"
+
+    # Zona horaria de los días y meses del dashboard: nombre IANA (America/Santiago, con
+    # cambios de horario) u offset fijo (-04:00)
+    REPORT_TIMEZONE = os.getenv("REPORT_TIMEZONE", "-04:00")
+
+    # Conexión a Mongo (ver database.py)
+    MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "RemindMe-test")
+    MONGO_COLLECTION = os.getenv("MONGO_COLLECTION", "reminders")
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "20"))
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000"))
+    # primary, primaryPreferred, secondary, secondaryPreferred o nearest
+    MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primaryPreferred")
+    # Documentos por lote al leer cursores
+    MONGO_BATCH_SIZE = int(os.getenv("MONGO_BATCH_SIZE", "10000"))
+    # 'server': agrega en Mongo ($facet); 'pandas': trae los documentos y agrega en Python;
+    # 'rollup': lee rollups diarios precalculados y consulta en vivo solo desde hoy;
+    # 'snapshot': lee el snapshot columnar (ver snapshot.py) y consulta en vivo los días posteriores
+    METRICS_AGGREGATION = os.getenv("METRICS_AGGREGATION", "server").lower()
+    # Directorio del snapshot (particiones Arrow IPC por mes, memory-mapped al leer)
+    SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "snapshot")
+
+    # Cache de resultados de calculate_metrics por rango (segundos / entradas / bytes, 0 = sin límite de bytes)
+    METRICS_CACHE_ENABLED = os.getenv("METRICS_CACHE_ENABLED", "True").lower() == "true"
+    METRICS_CACHE_TTL = int(os.getenv("METRICS_CACHE_TTL", "300"))
+    # Rangos que terminan antes de hoy ya no cambian: se guardan por más tiempo
+    METRICS_CACHE_HISTORICAL_TTL = int(os.getenv("METRICS_CACHE_HISTORICAL_TTL", "86400"))
+    METRICS_CACHE_MAX_ENTRIES = int(os.getenv("METRICS_CACHE_MAX_ENTRIES", "64"))
+    METRICS_CACHE_MAX_BYTES = int(os.getenv("METRICS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    # Hilos para calcular métricas fuera del hilo que atiende el request
+    FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "4"))
+    # Rangos de al menos FETCH_PARALLEL_MIN_DAYS días (0 = nunca) se consultan en tramos de
+    # FETCH_CHUNK_DAYS días, con hasta FETCH_CONCURRENCY consultas a la vez. Desactivado por
+    # defecto: cada tramo trae las listas de usuarios por día (más pesado que el $facet de
+    # conteos) y falta medirlo contra un mongod real (benchmarks/parallel_fetch.py)
+    FETCH_PARALLEL_MIN_DAYS = int(os.getenv("FETCH_PARALLEL_MIN_DAYS", "0"))
+    FETCH_CHUNK_DAYS = int(os.getenv("FETCH_CHUNK_DAYS", "7"))
+    FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "4"))
+    # Tramos anteriores a hoy guardados en cache (se reutilizan entre rangos)
+    FETCH_CHUNK_CACHE_ENTRIES = int(os.getenv("FETCH_CHUNK_CACHE_ENTRIES", "512"))
+
+    # Rollups diarios (ver rollups.py)
+    ROLLUP_COLLECTION = os.getenv("ROLLUP_COLLECTION", "reminders_daily")
+    ROLLUP_STATE_COLLECTION = os.getenv("ROLLUP_STATE_COLLECTION", "rollup_state")
+    # Cada cuántos segundos el warmer actualiza los rollups en segundo plano (0, o WARMUP_ENABLED=false:
+    # solo externamente, con python rollups.py); los requests solo leen los rollups
+    ROLLUP_REFRESH_INTERVAL = int(os.getenv("ROLLUP_REFRESH_INTERVAL", "300"))
+
+    # Índice de usuarios (primer y último día visto) y cohortes mensuales (ver cohorts.py)
+    COHORTS_ENABLED = os.getenv("COHORTS_ENABLED", "True").lower() == "true"
+    USERS_COLLECTION = os.getenv("USERS_COLLECTION", "reminders_users")
+    COHORTS_COLLECTION = os.getenv("COHORTS_COLLECTION", "reminders_cohorts")
+    # Cada cuántos segundos el warmer actualiza el índice en segundo plano (0, o WARMUP_ENABLED=false:
+    # solo externamente, con python cohorts.py); los requests solo leen las cohortes
+    COHORTS_REFRESH_INTERVAL = int(os.getenv("COHORTS_REFRESH_INTERVAL", "300"))
+
+    # Usuarios distintos en modo rollup: 'exact' (listas de usuarios) o 'approx' (sketches HyperLogLog)
+    UNIQUE_USERS_MODE = os.getenv("UNIQUE_USERS_MODE", "exact").lower()
+    # Error estándar relativo de los sketches (0.02 ~ 4 KB por día)
+    HLL_ERROR = float(os.getenv("HLL_ERROR", "0.02"))
+    # Error relativo de los sketches de cuantiles de la demora de envío (p50/p90/p99)
+    LATENCY_SKETCH_ACCURACY = float(os.getenv("LATENCY_SKETCH_ACCURACY", "0.01"))
+
+    # Resultados compartidos entre callbacks: 'memory' (por proceso), 'file' (por máquina) o 'redis'
+    RESULT_STORE = os.getenv("RESULT_STORE", "memory").lower()
+    RESULT_STORE_PATH = os.getenv("RESULT_STORE_PATH", os.path.join(tempfile.gettempdir(), "remindme-dash-results"))
+    RESULT_STORE_URL = os.getenv("RESULT_STORE_URL", "redis://localhost:6379/0")
+    RESULT_STORE_TTL = int(os.getenv("RESULT_STORE_TTL", "300"))
+
+    # Precálculo en segundo plano de rangos comunes (ver warmup.py): last_30_days, this_month,
+    # last_month, ytd. El intervalo conviene que sea menor que METRICS_CACHE_TTL
+    WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "True").lower() == "true"
+    WARMUP_RANGES = [name.strip() for name in os.getenv("WARMUP_RANGES", "last_30_days,this_month,last_month,ytd").split(",")
+                     if name.strip()]
+    WARMUP_INTERVAL = int(os.getenv("WARMUP_INTERVAL", "240"))
+
+    # Panel "Hoy" en vivo: contadores en memoria actualizados por un hilo que sigue los cambios
+    LIVE_ENABLED = os.getenv("LIVE_ENABLED", "False").lower() == "true"
+    # Fuente de los cambios: 'change_stream' (replica set), 'poll' (consultas periódicas) o 'auto'
+    LIVE_SOURCE = os.getenv("LIVE_SOURCE", "auto").lower()
+    # Segundos entre consultas (poll) o de espera máxima de cada getMore del change stream
+    LIVE_POLL_INTERVAL = float(os.getenv("LIVE_POLL_INTERVAL", "2"))
+    # Cada cuántos segundos se guarda el resume token
+    LIVE_TOKEN_SAVE_INTERVAL = int(os.getenv("LIVE_TOKEN_SAVE_INTERVAL", "10"))
+    # Cada cuántos segundos el navegador pide los contadores
+    LIVE_REFRESH_INTERVAL = int(os.getenv("LIVE_REFRESH_INTERVAL", "5"))
+
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    # Tiempos por etapa, endpoint de Prometheus y una línea de log por callback (ver telemetry.py)
+    TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "True").lower() == "true"
+    TELEMETRY_PATH = os.getenv("TELEMETRY_PATH", "/metrics")
+
+    # Respuestas de Dash (ver responses.py). Motor JSON de plotly/Dash: 'auto' (orjson si está
+    # instalado), 'orjson' o 'json'
+    JSON_ENGINE = os.getenv("JSON_ENGINE", "auto").lower()
+    # Compresión de las respuestas con Flask-Compress: algoritmos en orden de preferencia
+    # (br, gzip, deflate, zstd), niveles y tamaño mínimo en bytes
+    COMPRESS_ENABLED = os.getenv("COMPRESS_ENABLED", "True").lower() == "true"
+    COMPRESS_ALGORITHMS = [name.strip() for name in os.getenv("COMPRESS_ALGORITHMS", "br,gzip").split(",")
+                           if name.strip()]
+    COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+    COMPRESS_BR_LEVEL = int(os.getenv("COMPRESS_BR_LEVEL", "4"))
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "500"))
+    # Cuerpos ya comprimidos guardados por ETag (entradas / bytes)
+    COMPRESS_CACHE_ENTRIES = int(os.getenv("COMPRESS_CACHE_ENTRIES", "256"))
+    COMPRESS_CACHE_MAX_BYTES = int(os.getenv("COMPRESS_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+    # Datos numéricos de los gráficos como typed arrays base64 (requiere plotly.js >= 2.28)
+    FIGURE_TYPED_ARRAYS = os.getenv("FIGURE_TYPED_ARRAYS", "True").lower() == "true"
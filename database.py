@@ -0,0 +1,82 @@
+import os
+import threading
+from pymongo import MongoClient
+from config import Config
+
+# Un cliente por proceso: se crea la primera vez que se usa (después del fork de gunicorn)
+_client = None
+_client_pid = None
+_lock = threading.Lock()
+
+
+def _create_client():
+    return MongoClient(
+        Config.MONGO_URI,
+        maxPoolSize=Config.MONGO_MAX_POOL_SIZE,
+        minPoolSize=Config.MONGO_MIN_POOL_SIZE,
+        connectTimeoutMS=Config.MONGO_CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=Config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        socketTimeoutMS=Config.MONGO_SOCKET_TIMEOUT_MS,
+        readPreference=Config.MONGO_READ_PREFERENCE,
+        connect=False
+    )
+
+
+def get_client():
+    """Cliente de Mongo del proceso actual; si el proceso viene de un fork se crea uno nuevo."""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _lock:
+            if _client is None or _client_pid != pid:
+                _client = _create_client()
+                _client_pid = pid
+    return _client
+
+
+def set_client(client):
+    """Reemplaza el cliente del proceso (por ejemplo por uno de mongomock en pruebas)."""
+    global _client, _client_pid
+    with _lock:
+        _client = client
+        _client_pid = os.getpid()
+
+
+def _reset_after_fork():
+    # El cliente heredado del padre no debe usarse en el hijo
+    global _client, _client_pid, _lock
+    _client = None
+    _client_pid = None
+    _lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_database():
+    return get_client()[Config.MONGO_DB_NAME]
+
+
+def get_collection(name):
+    return get_database()[name]
+
+
+def get_reminders_collection():
+    return get_collection(Config.MONGO_COLLECTION)
+
+
+def get_rollup_collection():
+    return get_collection(Config.ROLLUP_COLLECTION)
+
+
+def get_rollup_state_collection():
+    return get_collection(Config.ROLLUP_STATE_COLLECTION)
+
+
+def get_users_collection():
+    return get_collection(Config.USERS_COLLECTION)
+
+
+def get_cohorts_collection():
+    return get_collection(Config.COHORTS_COLLECTION)
@@ -0,0 +1,164 @@
+import re
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+from config import Config
+
+# Offsets UTC posibles en los strings guardados (de -12:00 a +14:00): margen del prefiltro por índice
+MIN_UTC_OFFSET = timedelta(hours=-12)
+MAX_UTC_OFFSET = timedelta(hours=14)
+# Hora local sin offset, para comparar contra date_time/sentAt guardados como string ISO
+LOCAL_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+# date_time convertido a fecha BSON (una sola vez por documento, ver timestamp_stage)
+TIMESTAMP_FIELD = 'date_ts'
+
+_OFFSET = re.compile(r'^([+-])(\d{2}):?(\d{2})?$')
+
+
+@lru_cache(maxsize=None)
+def parse_timezone(name):
+    """tzinfo de una zona como las acepta Mongo: nombre IANA (America/Santiago) u offset (-04:00)."""
+    match = _OFFSET.match(name)
+    if match:
+        sign, hours, minutes = match.groups()
+        offset = timedelta(hours=int(hours), minutes=int(minutes or 0))
+        return timezone(-offset if sign == '-' else offset)
+    return ZoneInfo(name)
+
+
+def report_timezone():
+    """Zona horaria en la que se definen los días y meses del dashboard (Config.REPORT_TIMEZONE)."""
+    return parse_timezone(Config.REPORT_TIMEZONE)
+
+
+def now():
+    return datetime.now(report_timezone())
+
+
+def today():
+    return now().strftime('%Y-%m-%d')
+
+
+def shift_day(day, days):
+    """Suma (o resta) días a una fecha yyyy-mm-dd."""
+    return (datetime.strptime(day, '%Y-%m-%d') + timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+def day_start(day):
+    """
+    Instante UTC (naive, como los maneja pymongo) en que empieza el día yyyy-mm-dd en la
+    zona de reporte. Si la medianoche no existe por un cambio de horario, es el primer
+    instante del día.
+    """
+    local = datetime.combine(date.fromisoformat(day), time(0), tzinfo=report_timezone())
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def range_bounds(start_date, end_date):
+    """Límites [inicio, fin) en UTC del rango de días [start_date, end_date] inclusive."""
+    return day_start(start_date), day_start(shift_day(end_date, 1))
+
+
+def date_range_filter(start_date, end_date):
+    """
+    Prefiltro sobre date_time que puede usar el índice: límites exactos para fechas BSON
+    y, para strings ISO, la hora local con un margen que cubre cualquier offset.
+    Es un superconjunto del rango; range_stages agrega el filtro exacto.
+    """
+    start, end = range_bounds(start_date, end_date)
+    return {"$or": [
+        {"date_time": {"$gte": start, "$lt": end}},
+        {"date_time": {"$gte": (start + MIN_UTC_OFFSET).strftime(LOCAL_TIME_FORMAT),
+                       "$lt": (end + MAX_UTC_OFFSET).strftime(LOCAL_TIME_FORMAT)}}
+    ]}
+
+
+def to_date(expression):
+    """
+    Expresión de Mongo: expression como fecha BSON, sea string ISO (con su offset) o ya
+    fecha; null si falta o no es una fecha válida ($toDate abortaría toda la agregación).
+    """
+    return {"$convert": {"input": expression, "to": "date", "onError": None, "onNull": None}}
+
+
+def timestamp_stage():
+    """Agrega date_ts: date_time como fecha BSON (null si no es una fecha, ver to_date)."""
+    return {"$addFields": {TIMESTAMP_FIELD: to_date("$date_time")}}
+
+
+def range_stages(spans):
+    """
+    Etapas iniciales de los pipelines para los tramos de días [(inicio, fin), ...]:
+    el prefiltro por índice, date_ts y el filtro exacto por los límites UTC de los días,
+    calculados una sola vez acá.
+    """
+    prefilters = [date_range_filter(start, end) for start, end in spans]
+    exact = [{"$and": [{"$gte": [f"${TIMESTAMP_FIELD}", start]}, {"$lt": [f"${TIMESTAMP_FIELD}", end]}]}
+             for start, end in (range_bounds(start, end) for start, end in spans)]
+    return [
+        {"$match": prefilters[0] if len(prefilters) == 1 else {"$or": prefilters}},
+        timestamp_stage(),
+        {"$match": {"$expr": exact[0] if len(exact) == 1 else {"$or": exact}}}
+    ]
+
+
+def local_datetime(value):
+    """
+    date_time/sentAt de un documento (string ISO o fecha de pymongo) en la zona de reporte,
+    como lo interpreta to_date: sin offset es UTC. None si no es una fecha.
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(report_timezone())
+
+
+def local_date(date_expression, format='%Y-%m-%d'):
+    """Expresión de Mongo: la fecha (o el mes, con '%Y-%m') en la zona de reporte; null si no hay fecha."""
+    return {"$dateToString": {"format": format, "date": date_expression, "timezone": Config.REPORT_TIMEZONE}}
+
+
+def day_bucket():
+    """Día yyyy-mm-dd de date_time en la zona de reporte (requiere date_ts)."""
+    return local_date(f"${TIMESTAMP_FIELD}")
+
+
+def month_bucket():
+    """Mes yyyy-mm de date_time en la zona de reporte (requiere date_ts)."""
+    return local_date(f"${TIMESTAMP_FIELD}", '%Y-%m')
+
+
+def day_spans(days):
+    """Agrupa días yyyy-mm-dd en tramos contiguos [(inicio, fin), ...]."""
+    spans = []
+    for day in sorted(set(days)):
+        if spans and shift_day(spans[-1][1], 1) == day:
+            spans[-1] = (spans[-1][0], day)
+        else:
+            spans.append((day, day))
+    return spans
+
+
+def chunk_spans(start_date, end_date, size):
+    """
+    Divide [start_date, end_date] en tramos de size días alineados a un calendario fijo
+    (con size=7, semanas de lunes a domingo): rangos distintos comparten los tramos
+    interiores y solo cambian los de los bordes.
+    """
+    start = datetime.strptime(start_date, '%Y-%m-%d').toordinal()
+    end = datetime.strptime(end_date, '%Y-%m-%d').toordinal()
+    spans = []
+    while start <= end:
+        # El ordinal 1 (0001-01-01) es lunes
+        last = min(start + size - 1 - (start - 1) % size, end)
+        spans.append((datetime.fromordinal(start).strftime('%Y-%m-%d'),
+                      datetime.fromordinal(last).strftime('%Y-%m-%d')))
+        start = last + 1
+    return spans
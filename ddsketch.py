@@ -0,0 +1,112 @@
+import math
+import struct
+
+import numpy as np
+
+# Cabecera de to_bytes: error relativo, valor mínimo, clave del primer bucket y bytes por conteo
+_HEADER = struct.Struct('<ddiB')
+_COUNT_TYPES = {1: np.uint8, 2: np.uint16, 4: np.uint32, 8: np.uint64}
+
+
+class DDSketch:
+    """
+    Sketch de cuantiles con error relativo acotado (estilo DDSketch): cada valor cae en
+    el bucket ceil(log_gamma(valor)), con gamma = (1 + a) / (1 - a), y el cuantil que se
+    estima está a menos de a (relative_accuracy) del valor real.
+    Los valores menores a min_value cuentan como min_value (para demoras: menos de un
+    segundo es "a tiempo"). Los sketches con los mismos parámetros se unen (merge)
+    sumando conteos, igual que si se hubieran agregado todos los valores en uno solo.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1.0, offset=0, counts=None):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy debe estar entre 0 y 1")
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        # Conteos densos de los buckets offset, offset + 1, ...
+        self.offset = offset
+        self.counts = np.zeros(0, dtype=np.uint64) if counts is None else counts.astype(np.uint64)
+
+    @classmethod
+    def from_values(cls, values, relative_accuracy=0.01, min_value=1.0):
+        sketch = cls(relative_accuracy, min_value)
+        sketch.update(values)
+        return sketch
+
+    @classmethod
+    def from_buckets(cls, keys, counts, relative_accuracy=0.01, min_value=1.0):
+        """Sketch a partir de buckets ya calculados (por ejemplo en Mongo con key_expression)."""
+        sketch = cls(relative_accuracy, min_value)
+        sketch._add_buckets(np.asarray(keys, dtype=np.int64), np.asarray(counts, dtype=np.uint64))
+        return sketch
+
+    @classmethod
+    def from_bytes(cls, data):
+        relative_accuracy, min_value, offset, itemsize = _HEADER.unpack_from(data)
+        counts = np.frombuffer(data, dtype=_COUNT_TYPES[itemsize], offset=_HEADER.size)
+        return cls(relative_accuracy, min_value, offset, counts)
+
+    def to_bytes(self):
+        # Conteos con el entero más chico que alcance: un día suele entrar en 16 bits
+        high = int(self.counts.max()) if len(self.counts) else 0
+        itemsize = next(size for size, dtype in _COUNT_TYPES.items() if high <= np.iinfo(dtype).max)
+        header = _HEADER.pack(self.relative_accuracy, self.min_value, self.offset, itemsize)
+        return header + self.counts.astype(_COUNT_TYPES[itemsize]).tobytes()
+
+    def keys(self, values):
+        """Bucket de cada valor."""
+        values = np.maximum(np.asarray(values, dtype=np.float64), self.min_value)
+        return np.ceil(np.log(values) / self.log_gamma).astype(np.int64)
+
+    def key_expression(self, value_expression):
+        """Expresión de Mongo que calcula el bucket de value_expression (igual que keys)."""
+        return {"$ceil": {"$divide": [{"$ln": {"$max": [value_expression, self.min_value]}}, self.log_gamma]}}
+
+    def _add_buckets(self, keys, counts):
+        if not len(keys):
+            return
+        low = int(keys.min())
+        high = int(keys.max())
+        if len(self.counts):
+            low = min(low, self.offset)
+            high = max(high, self.offset + len(self.counts) - 1)
+        merged = np.zeros(high - low + 1, dtype=np.uint64)
+        merged[self.offset - low:self.offset - low + len(self.counts)] = self.counts
+        np.add.at(merged, keys - low, counts)
+        self.offset, self.counts = low, merged
+
+    def add(self, value):
+        self.update([value])
+
+    def update(self, values):
+        keys = self.keys(values)
+        self._add_buckets(keys, np.ones(len(keys), dtype=np.uint64))
+
+    def merge(self, other):
+        """Une otro sketch en este (in place) y retorna self."""
+        if (other.relative_accuracy, other.min_value) != (self.relative_accuracy, self.min_value):
+            raise ValueError("Solo se pueden unir sketches con el mismo error relativo y valor mínimo")
+        if len(other.counts):
+            self._add_buckets(np.arange(other.offset, other.offset + len(other.counts)), other.counts)
+        return self
+
+    def count(self):
+        return int(self.counts.sum())
+
+    def quantiles(self, qs):
+        """Valores estimados de los cuantiles qs (entre 0 y 1); NaN si el sketch está vacío."""
+        total = self.count()
+        if not total:
+            return np.full(len(qs), np.nan)
+        cumulative = np.cumsum(self.counts)
+        # Posición (0-indexada) del valor con rango q * (n - 1), como numpy.quantile con 'lower'
+        ranks = np.floor(np.asarray(qs, dtype=np.float64) * (total - 1))
+        buckets = np.searchsorted(cumulative, ranks, side='right')
+        # Punto medio del bucket (gamma^(k-1), gamma^k] en escala relativa
+        values = 2 * self.gamma ** (self.offset + buckets) / (self.gamma + 1)
+        return np.maximum(values, self.min_value)
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
@@ -0,0 +1,198 @@
+import base64
+
+import numpy as np
+import plotly.graph_objects as go
+
+from config import Config
+
+# Colores de cada serie
+USERS_COLOR = '#3366CC'
+CREATED_COLOR = '#FF9900'
+SENT_COLOR = '#109618'
+# p50, p90 y p99 de la demora de envío
+LATENCY_COLORS = ('#109618', '#FF9900', '#DC3912')
+# Eje de las cohortes en el gráfico de retención
+COHORT_TITLE = 'Cohorte (mes del primer recordatorio)'
+# Lo visible del tema 'plotly' (fondo, grilla, fuente): el tema completo pesa ~7 KB por
+# figura y viajaría en cada respuesta
+AXIS_STYLE = {'gridcolor': 'white', 'linecolor': 'white', 'zerolinecolor': 'white', 'ticks': '', 'automargin': True}
+LAYOUT_TEMPLATE = {'layout': {
+    'font': {'color': '#2a3f5f'},
+    'paper_bgcolor': 'white',
+    'plot_bgcolor': '#E5ECF6',
+    'xaxis': AXIS_STYLE,
+    'yaxis': AXIS_STYLE,
+    'hoverlabel': {'align': 'left'},
+    'title': {'x': 0.05}
+}}
+
+
+def _bar_template(title, x_title, y_title, color, category_axis=False):
+    """Figura de barras de una serie, validada una sola vez y guardada como dict (sin datos)."""
+    fig = go.Figure(go.Bar(
+        marker_color=color,
+        hovertemplate=f'{x_title}=%{{x}}<br>{y_title}=%{{y}}<extra></extra>',
+        showlegend=False
+    ), layout={'template': LAYOUT_TEMPLATE})
+    fig.update_layout(title=title, xaxis_title=x_title, yaxis_title=y_title, barmode='relative')
+    fig.update_xaxes(type='category' if category_axis else 'date')
+    return fig.to_plotly_json()
+
+
+def _comparison_template(title, x_title, category_axis=False):
+    fig = go.Figure([
+        go.Bar(name='Creados', marker_color=CREATED_COLOR),
+        go.Bar(name='Enviados', marker_color=SENT_COLOR)
+    ], layout={'template': LAYOUT_TEMPLATE})
+    fig.update_layout(title=title, xaxis_title=x_title, yaxis_title='Número de Recordatorios', barmode='group')
+    fig.update_xaxes(type='category' if category_axis else 'date')
+    return fig.to_plotly_json()
+
+
+def _latency_template(title, x_title, category_axis=False):
+    fig = go.Figure([
+        go.Scatter(name=name, mode='lines+markers', line_color=color,
+                   hovertemplate=f'{x_title}=%{{x}}<br>{name}=%{{y:.1f}} min<extra></extra>')
+        for name, color in zip(('p50', 'p90', 'p99'), LATENCY_COLORS)
+    ], layout={'template': LAYOUT_TEMPLATE})
+    fig.update_layout(title=title, xaxis_title=x_title, yaxis_title='Demora de Envío (minutos)')
+    fig.update_xaxes(type='category' if category_axis else 'date')
+    return fig.to_plotly_json()
+
+
+def _empty_template(x_title, y_title='Número de Recordatorios'):
+    fig = go.Figure(layout={'template': LAYOUT_TEMPLATE})
+    fig.update_layout(
+        title='No hay datos para mostrar en el período seleccionado',
+        xaxis_title=x_title,
+        yaxis_title=y_title
+    )
+    return fig.to_plotly_json()
+
+
+def _retention_template():
+    fig = go.Figure(go.Heatmap(
+        colorscale='Blues',
+        zmin=0,
+        zmax=1,
+        texttemplate='%{z:.0%}',
+        hovertemplate='Cohorte %{y}, mes %{x}: %{z:.1%}<extra></extra>',
+        colorbar={'tickformat': '.0%'}
+    ), layout={'template': LAYOUT_TEMPLATE})
+    fig.update_layout(title='Retención por Cohorte (vistos en el mes o después)',
+                      xaxis_title='Meses desde el primer recordatorio', yaxis_title=COHORT_TITLE)
+    fig.update_xaxes(type='category', side='top')
+    fig.update_yaxes(type='category', autorange='reversed')
+    return fig.to_plotly_json()
+
+
+# Plantillas armadas al importar el módulo; por request solo se cambian los datos
+TEMPLATES = {
+    'daily': {
+        'users': _bar_template('Usuarios Activos por Día', 'Fecha', 'Número de Usuarios', USERS_COLOR),
+        'created': _bar_template('Recordatorios Creados por Día', 'Fecha', 'Número de Recordatorios', CREATED_COLOR),
+        'sent': _bar_template('Recordatorios Enviados por Día', 'Fecha', 'Número de Recordatorios', SENT_COLOR),
+        'comparison': _comparison_template('Comparación: Recordatorios Creados vs Enviados por Día', 'Fecha'),
+        'latency': _latency_template('Demora de Envío por Día (p50 / p90 / p99)', 'Fecha'),
+        'empty': _empty_template('Fecha')
+    },
+    'monthly': {
+        'users': _bar_template('Usuarios Activos por Mes', 'Mes', 'Número de Usuarios', USERS_COLOR, True),
+        'created': _bar_template('Recordatorios Creados por Mes', 'Mes', 'Número de Recordatorios', CREATED_COLOR,
+                                 True),
+        'sent': _bar_template('Recordatorios Enviados por Mes', 'Mes', 'Número de Recordatorios', SENT_COLOR, True),
+        'comparison': _comparison_template('Comparación: Recordatorios Creados vs Enviados por Mes', 'Mes', True),
+        'latency': _latency_template('Demora de Envío por Mes (p50 / p90 / p99)', 'Mes', True),
+        'empty': _empty_template('Mes')
+    }
+}
+
+
+HOURLY_TEMPLATE = _comparison_template('Hoy: Recordatorios Creados vs Enviados por Hora', 'Hora', True)
+RETENTION_TEMPLATE = _retention_template()
+EMPTY_RETENTION_TEMPLATE = _empty_template('Meses desde el primer recordatorio', COHORT_TITLE)
+
+
+# Tipos enteros de los typed arrays de plotly.js, de menor a mayor
+INT_TYPES = [(code, np.iinfo(code)) for code in ('u1', 'u2', 'i4')]
+
+
+def encode_values(values):
+    """
+    Arreglo numérico para plotly.js: como typed array en base64 (más compacto y rápido
+    de serializar que una lista JSON) o como lista si FIGURE_TYPED_ARRAYS está desactivado.
+    """
+    values = np.asarray(values)
+    if not Config.FIGURE_TYPED_ARRAYS:
+        return values.tolist()
+    if values.dtype.kind in 'iub':
+        # El tipo entero más chico que alcance (los conteos suelen entrar en 16 bits)
+        high = int(values.max()) if len(values) else 0
+        low = int(values.min()) if len(values) else 0
+        dtype = next((code for code, limits in INT_TYPES if limits.min <= low and high <= limits.max), 'f8')
+    else:
+        dtype = 'f8'
+    values = values.astype(np.dtype(dtype).newbyteorder('<'))
+    return {'dtype': dtype, 'bdata': base64.b64encode(values.tobytes()).decode('ascii')}
+
+
+# Un día en milisegundos (paso del eje de fechas de plotly.js)
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def axis_data(view, labels):
+    """
+    Coordenadas x de las trazas para el eje completo (sin huecos) de la vista: en la
+    vista diaria basta con el primer día y el paso, sin mandar todas las fechas.
+    """
+    if view == 'daily' and len(labels):
+        return {'x0': str(labels[0]), 'dx': DAY_MS}
+    return {'x': np.asarray(labels).tolist()}
+
+
+def fill_template(template, x, values):
+    """
+    Nueva figura (dict) con las coordenadas x (de axis_data) y un arreglo de valores por traza.
+    El layout de la plantilla se comparte: las figuras no deben modificarse.
+    """
+    data = [dict(trace, **x, y=encode_values(y)) for trace, y in zip(template['data'], values)]
+    return {'data': data, 'layout': template['layout']}
+
+
+def bar_figure(view, name, labels, values):
+    return fill_template(TEMPLATES[view][name], axis_data(view, labels), [values])
+
+
+def comparison_figure(view, labels, created, sent):
+    """Creados vs enviados, sobre el mismo eje."""
+    if not np.any(created) and not np.any(sent):
+        return TEMPLATES[view]['empty']
+    return fill_template(TEMPLATES[view]['comparison'], axis_data(view, labels), [created, sent])
+
+
+def retention_figure(months, sizes, retention):
+    """Heatmap cohortes x meses desde el primero; las celdas sin observar (NaN) quedan vacías."""
+    if not len(months):
+        return EMPTY_RETENTION_TEMPLATE
+    labels = [f'{month} ({size:,})' for month, size in zip(months, sizes)]
+    # Lista de listas: los NaN se serializan como null y plotly.js deja la celda vacía
+    z = [[None if np.isnan(value) else float(value) for value in row] for row in retention]
+    trace = dict(RETENTION_TEMPLATE['data'][0], x=list(range(retention.shape[1])), y=labels, z=z)
+    return {'data': [trace], 'layout': RETENTION_TEMPLATE['layout']}
+
+
+def latency_figure(view, labels, p50, p90, p99):
+    """Cuantiles de la demora de envío (en segundos) graficados en minutos; NaN = sin envíos."""
+    if np.all(np.isnan(p50)):
+        return TEMPLATES[view]['empty']
+    values = [np.asarray(quantile, dtype=np.float64) / 60 for quantile in (p50, p90, p99)]
+    return fill_template(TEMPLATES[view]['latency'], axis_data(view, labels), values)
+
+
+# Etiquetas del eje de hourly_figure
+HOURS = [f'{hour:02d}:00' for hour in range(24)]
+
+
+def hourly_figure(created, sent):
+    """Creados vs enviados por hora del día (panel en vivo)."""
+    return fill_template(HOURLY_TEMPLATE, {'x': HOURS}, [created, sent])
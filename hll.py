@@ -0,0 +1,96 @@
+import hashlib
+import math
+
+import numpy as np
+
+MIN_PRECISION = 4
+MAX_PRECISION = 18
+
+
+def precision_for_error(error):
+    """Precisión p (2^p registros) para un error estándar relativo dado (~1.04 / sqrt(2^p))."""
+    p = math.ceil(math.log2((1.04 / error) ** 2))
+    return min(max(p, MIN_PRECISION), MAX_PRECISION)
+
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    """
+    Sketch HyperLogLog para contar usuarios distintos de forma aproximada.
+    Los sketches de la misma precisión se pueden unir (merge) sin perder exactitud
+    respecto a haber agregado todos los valores en uno solo.
+    """
+
+    def __init__(self, p=12, registers=None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8) if registers is None else registers
+
+    @classmethod
+    def from_values(cls, values, p=12):
+        sketch = cls(p)
+        sketch.update(values)
+        return sketch
+
+    @classmethod
+    def from_bytes(cls, data):
+        registers = np.frombuffer(data, dtype=np.uint8).copy()
+        return cls(int(registers.size).bit_length() - 1, registers)
+
+    def to_bytes(self):
+        return self.registers.tobytes()
+
+    def add(self, value):
+        x = _hash64(value)
+        bits = 64 - self.p
+        index = x >> bits
+        rank = bits - (x & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        """Une otro sketch en este (in place) y retorna self."""
+        if other.p > self.p:
+            other = other.reduce(self.p)
+        elif other.p < self.p:
+            reduced = self.reduce(other.p)
+            self.p, self.m, self.registers = reduced.p, reduced.m, reduced.registers
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def reduce(self, p):
+        """Copia del sketch con una precisión menor (útil al unir sketches de precisiones distintas)."""
+        if p > self.p:
+            raise ValueError("No se puede aumentar la precisión de un sketch")
+        if p == self.p:
+            return HyperLogLog(p, self.registers.copy())
+        shift = self.p - p
+        indexes = np.arange(self.m)
+        low = indexes & ((1 << shift) - 1)
+        # Los bits del índice que se pierden pasan a ser los primeros bits del resto del hash
+        low_rank = np.where(low > 0, shift - np.floor(np.log2(np.maximum(low, 1))).astype(np.int64), 0)
+        ranks = np.where(self.registers == 0, 0,
+                         np.where(low > 0, low_rank, shift + self.registers.astype(np.int64)))
+        registers = np.zeros(1 << p, dtype=np.uint8)
+        np.maximum.at(registers, indexes >> shift, np.minimum(ranks, 255).astype(np.uint8))
+        return HyperLogLog(p, registers)
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Corrección para cardinalidades chicas (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def __len__(self):
+        return self.count()
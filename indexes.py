@@ -0,0 +1,119 @@
+"""
+Crea los índices que usan las consultas del dashboard y verifica sus planes.
+
+    python indexes.py                  # crea índices y verifica los planes
+    python indexes.py --check          # solo verifica (no crea nada)
+    python indexes.py --start 2024-01-01 --end 2024-12-31
+
+Termina con código 1 si algún pipeline usa COLLSCAN.
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, IndexModel
+from database import get_reminders_collection
+from latency import latency_pipeline
+from metrics import reminders_data_pipeline, reminders_frame_pipeline, reminders_summary_pipeline
+from rollups import rollup_pipeline
+
+REMINDERS_INDEXES = [
+    # Cubre el $match por rango de date_time y los campos que proyectan los pipelines,
+    # así el $project se resuelve desde el índice sin leer los documentos
+    IndexModel([("date_time", ASCENDING), ("user_id", ASCENDING), ("status", ASCENDING), ("sentAt", ASCENDING)],
+               name="date_time_user_id_status_sentAt"),
+    # Watermark de envíos de los rollups (sentAt > último visto)
+    IndexModel([("sentAt", ASCENDING)], name="sentAt"),
+]
+
+
+class QueryPlanError(Exception):
+    """Un pipeline del dashboard no usa índices."""
+
+
+def ensure_indexes(collection):
+    """Crea los índices recomendados (es idempotente). Retorna sus nombres."""
+    return collection.create_indexes(REMINDERS_INDEXES)
+
+
+def dashboard_pipelines(start_date, end_date):
+    """Pipelines que el dashboard corre sobre la colección de recordatorios."""
+    return {
+        "summary": reminders_summary_pipeline(start_date, end_date),
+        "frame": reminders_frame_pipeline(start_date, end_date),
+        "data": reminders_data_pipeline(start_date, end_date),
+        "rollup": rollup_pipeline([(start_date, end_date)]),
+        "latency": latency_pipeline([(start_date, end_date)]),
+    }
+
+
+def explain_pipeline(collection, pipeline):
+    return collection.database.command("aggregate", collection.name, pipeline=pipeline, explain=True)
+
+
+def _winning_plans(explain):
+    """Todos los winningPlan del resultado de explain (hay uno por shard en clusters)."""
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == "winningPlan":
+                yield value
+            else:
+                yield from _winning_plans(value)
+    elif isinstance(explain, list):
+        for value in explain:
+            yield from _winning_plans(value)
+
+
+def _stages(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+
+def plan_stages(explain):
+    """Etapas de los planes ganadores (sin los planes rechazados)."""
+    return [stage for plan in _winning_plans(explain) for stage in _stages(plan)]
+
+
+def verify_query_plans(collection, start_date, end_date):
+    """
+    Corre explain() sobre cada pipeline del dashboard.
+    Retorna {nombre: etapas} y lanza QueryPlanError si alguno hace COLLSCAN.
+    """
+    results = {}
+    for name, pipeline in dashboard_pipelines(start_date, end_date).items():
+        results[name] = plan_stages(explain_pipeline(collection, pipeline))
+    scans = [name for name, stages in results.items() if "COLLSCAN" in stages]
+    if scans:
+        raise QueryPlanError(f"COLLSCAN en los pipelines: {', '.join(scans)}. "
+                             f"Crear los índices con `python indexes.py`.")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="solo verificar los planes, sin crear índices")
+    parser.add_argument("--start", default=(datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'))
+    parser.add_argument("--end", default=datetime.now().strftime('%Y-%m-%d'))
+    args = parser.parse_args()
+
+    collection = get_reminders_collection()
+    if not args.check:
+        for name in ensure_indexes(collection):
+            print(f"Índice listo: {name}")
+    try:
+        results = verify_query_plans(collection, args.start, args.end)
+    except QueryPlanError as error:
+        print(f"ERROR: {error}", file=sys.stderr)
+        sys.exit(1)
+    for name, stages in results.items():
+        covered = "cubierto" if "FETCH" not in stages else "con FETCH"
+        print(f"{name}: {' -> '.join(stages)} ({covered})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+import numpy as np
+
+from config import Config
+from ddsketch import DDSketch
+from dates import TIMESTAMP_FIELD, day_bucket, range_stages, to_date
+
+# Cuantiles de la demora de envío que muestra el dashboard
+QUANTILES = (0.5, 0.9, 0.99)
+QUANTILE_NAMES = tuple(f'p{round(q * 100)}' for q in QUANTILES)
+# Bucket de la columna latency de los frames para los recordatorios sin demora (no enviados);
+# los buckets reales son >= 0 porque las demoras se cuentan desde min_value = 1 segundo
+NO_LATENCY = -1
+
+
+def new_sketch():
+    """Sketch vacío con los parámetros de Config (todos los sketches de demora deben coincidir)."""
+    return DDSketch(Config.LATENCY_SKETCH_ACCURACY)
+
+
+def latency_key():
+    """
+    Expresión de Mongo: bucket del sketch para la demora en segundos entre date_time y
+    sentAt de los recordatorios enviados; null para los demás (requiere date_ts).
+    """
+    sent_at = to_date("$sentAt")
+    delay = {"$divide": [{"$subtract": [sent_at, f"${TIMESTAMP_FIELD}"]}, 1000]}
+    sent = {"$and": [
+        {"$eq": [{"$ifNull": ["$status", "not_sent"]}, "sent"]},
+        # sentAt que falta o no es una fecha
+        {"$ne": [sent_at, None]}
+    ]}
+    return {"$cond": [sent, new_sketch().key_expression(delay), None]}
+
+
+def bucket_stages():
+    """Etapas que cuentan recordatorios por (día, bucket) a partir de day y latency."""
+    return [
+        {"$match": {"latency": {"$ne": None}}},
+        {"$group": {"_id": {"day": "$day", "key": "$latency"}, "count": {"$sum": 1}}}
+    ]
+
+
+def latency_pipeline(spans):
+    """Pipeline de get_latency_sketches para los tramos de días dados: solo viajan los conteos por (día, bucket)."""
+    project_stage = {"$project": {"day": day_bucket(), "latency": latency_key(), "_id": 0}}
+    return range_stages(spans) + [project_stage] + bucket_stages()
+
+
+def sketches_from_buckets(rows):
+    """Filas {_id: {day, key}, count} -> {día: sketch}."""
+    by_day = {}
+    for row in rows:
+        keys, counts = by_day.setdefault(row['_id']['day'], ([], []))
+        keys.append(row['_id']['key'])
+        counts.append(row['count'])
+    accuracy = Config.LATENCY_SKETCH_ACCURACY
+    return {day: DDSketch.from_buckets(keys, counts, accuracy) for day, (keys, counts) in by_day.items()}
+
+
+def sketches_from_columns(days, keys):
+    """
+    Columnas day (días desde 1970-01-01) y latency (bucket o NO_LATENCY) de un frame ->
+    {día: sketch}, contando los pares (día, bucket) sin recorrer las filas en Python.
+    """
+    sent = keys != NO_LATENCY
+    # Día y bucket en un solo int64: np.unique cuenta los pares ordenados por día
+    pairs, counts = np.unique((days[sent].astype(np.int64) << 32) | keys[sent].astype(np.int64), return_counts=True)
+    pair_days, pair_keys = pairs >> 32, pairs & 0xFFFFFFFF
+    unique_days, starts = np.unique(pair_days, return_index=True)
+    bounds = np.append(starts, len(pairs))
+    labels = unique_days.astype('datetime64[D]').astype(str)
+    accuracy = Config.LATENCY_SKETCH_ACCURACY
+    return {str(label): DDSketch.from_buckets(pair_keys[low:high], counts[low:high], accuracy)
+            for label, low, high in zip(labels, bounds[:-1], bounds[1:])}
+
+
+def get_latency_sketches(collection, spans):
+    """Sketch de la demora de envío de cada día de los tramos [(inicio, fin), ...]."""
+    return sketches_from_buckets(collection.aggregate(latency_pipeline(spans), allowDiskUse=True))
+
+
+def latency_series(sketches, axis):
+    """
+    Cuantiles de la demora (segundos) por día y por mes del eje y del rango completo,
+    uniendo los sketches diarios; NaN en los días/meses sin envíos. Los sketches de otra
+    precisión (rollups guardados antes de cambiar LATENCY_SKETCH_ACCURACY y que todavía
+    no se reconstruyeron) no se pueden unir y se ignoran.
+    """
+    daily = np.full((len(QUANTILES), len(axis['days'])), np.nan)
+    monthly_sketches = {}
+    total = new_sketch()
+    positions = {day: i for i, day in enumerate(axis['days'])}
+    for day, sketch in sketches.items():
+        position = positions.get(day)
+        if position is None or not sketch.count() or sketch.relative_accuracy != total.relative_accuracy:
+            continue
+        daily[:, position] = sketch.quantiles(QUANTILES)
+        month = axis['month_of_day'][position]
+        monthly_sketches.setdefault(month, new_sketch()).merge(sketch)
+        total.merge(sketch)
+
+    monthly = np.full((len(QUANTILES), len(axis['months'])), np.nan)
+    for month, sketch in monthly_sketches.items():
+        monthly[:, month] = sketch.quantiles(QUANTILES)
+    overall = total.quantiles(QUANTILES)
+
+    series = {}
+    for i, name in enumerate(QUANTILE_NAMES):
+        series[f'daily_latency_{name}'] = daily[i]
+        series[f'monthly_latency_{name}'] = monthly[i]
+        series[f'latency_{name}'] = float(overall[i])
+    return series
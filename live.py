@@ -0,0 +1,444 @@
+"""
+Contadores en memoria del día de hoy, actualizados por un hilo que sigue los cambios de
+la colección de recordatorios (change stream, o consultas periódicas si el servidor no
+los soporta). El panel "Hoy" del dashboard los lee sin consultar Mongo.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from pymongo.errors import OperationFailure
+
+from config import Config
+from database import get_reminders_collection, get_rollup_state_collection
+from dates import local_datetime, range_stages, today
+from latency import QUANTILE_NAMES, QUANTILES, new_sketch
+from rollups import as_watermarks, inserted_since, latest_values, since_watermarks, watermarks_before
+from telemetry import inc, register_collector
+
+logger = logging.getLogger(__name__)
+
+# Documento de estado (resume token) en la colección de estado de los rollups
+LIVE_STATE_ID = 'live'
+# Códigos de error de Mongo: change streams no soportados (standalone) y token ya fuera del oplog
+CHANGE_STREAMS_UNSUPPORTED = {40573}
+HISTORY_LOST = {280, 286}
+# Espera (segundos) antes de reabrir la fuente después de un error
+RETRY_WAIT = 5
+OPERATIONS = ['insert', 'update', 'replace', 'delete']
+
+
+def today_pipeline(day):
+    """Recordatorios del día (con _id) para sembrar los contadores."""
+    return range_stages([(day, day)]) + [
+        {"$project": {"user_id": 1, "date_time": 1, "status": 1, "sentAt": 1}}
+    ]
+
+
+class TodayCounters:
+    """
+    Creados, enviados, usuarios distintos, conteos por hora y demora de envío de los
+    recordatorios de un día (según date_time en la zona de reporte). Se guarda el aporte
+    de cada documento por _id, así que aplicar dos veces el mismo documento (la siembra
+    y un evento repetido al reanudar) no lo cuenta dos veces.
+    Un envío borrado o revertido no se descuenta del sketch de demora.
+    """
+
+    def __init__(self, day):
+        self.day = day
+        self.created = 0
+        self.sent = 0
+        self.hourly_created = [0] * 24
+        self.hourly_sent = [0] * 24
+        self.latency = new_sketch()
+        self.version = 0
+        self._users = Counter()
+        self._docs = {}  # _id -> (user_id, hora, enviado)
+        self._lock = threading.Lock()
+
+    def upsert(self, doc):
+        """Agrega o reemplaza un documento completo (los de otros días se descartan)."""
+        created_at = local_datetime(doc.get('date_time'))
+        if created_at is None or created_at.strftime('%Y-%m-%d') != self.day:
+            self.remove(doc['_id'])
+            return
+        sent = doc.get('status') == 'sent'
+        entry = (doc.get('user_id'), created_at.hour, sent)
+        with self._lock:
+            previous = self._docs.get(doc['_id'])
+            if previous == entry:
+                return
+            if previous is not None:
+                self._discount(previous)
+            self._docs[doc['_id']] = entry
+            self._count(entry)
+            if sent and not (previous and previous[2]):
+                sent_at = local_datetime(doc.get('sentAt'))
+                if sent_at is not None:
+                    self.latency.add((sent_at - created_at).total_seconds())
+            self.version += 1
+
+    def update_fields(self, doc_id, fields):
+        """Cambio parcial sin el documento completo: solo se sigue el status de los ya conocidos."""
+        if 'status' not in fields:
+            return
+        with self._lock:
+            previous = self._docs.get(doc_id)
+            if previous is None or previous[2] == (fields['status'] == 'sent'):
+                return
+            self._discount(previous)
+            self._docs[doc_id] = entry = previous[:2] + (fields['status'] == 'sent',)
+            self._count(entry)
+            self.version += 1
+
+    def remove(self, doc_id):
+        with self._lock:
+            previous = self._docs.pop(doc_id, None)
+            if previous is not None:
+                self._discount(previous)
+                self.version += 1
+
+    def _count(self, entry, sign=1):
+        user_id, hour, sent = entry
+        self.created += sign
+        self.hourly_created[hour] += sign
+        if sent:
+            self.sent += sign
+            self.hourly_sent[hour] += sign
+        if user_id is not None:
+            self._users[user_id] += sign
+            if not self._users[user_id]:
+                del self._users[user_id]
+
+    def _discount(self, entry):
+        self._count(entry, -1)
+
+    def snapshot(self):
+        """Copia de los contadores para el dashboard."""
+        with self._lock:
+            quantiles = self.latency.quantiles(QUANTILES)
+            return {
+                "day": self.day,
+                "created": self.created,
+                "sent": self.sent,
+                "users": len(self._users),
+                "hourly_created": list(self.hourly_created),
+                "hourly_sent": list(self.hourly_sent),
+                **{f"latency_{name}": float(value) for name, value in zip(QUANTILE_NAMES, quantiles)},
+                "version": self.version
+            }
+
+
+def apply_event(counters, event):
+    """Aplica un evento con la forma de los del change stream (insert/update/replace/delete)."""
+    operation = event.get('operationType')
+    doc_id = (event.get('documentKey') or {}).get('_id')
+    if operation in ('insert', 'update', 'replace'):
+        doc = event.get('fullDocument')
+        if doc is not None:
+            counters.upsert(doc)
+        elif operation == 'update':
+            counters.update_fields(doc_id, event.get('updateDescription', {}).get('updatedFields', {}))
+        else:
+            counters.remove(doc_id)
+    elif operation == 'delete':
+        counters.remove(doc_id)
+    else:
+        return
+    inc('remindme_live_events_total', operation=operation)
+
+
+class ChangeStreamSource:
+    """Change stream de la colección (requiere replica set o cluster con sharding)."""
+    kind = 'change_stream'
+    # try_next ya espera en el servidor hasta max_await_time_ms
+    idle_wait = 0
+
+    def __init__(self, collection, max_await_seconds):
+        self.collection = collection
+        self.max_await_ms = int(max_await_seconds * 1000)
+        self._stream = None
+
+    def open(self, token):
+        self.close()
+        self._stream = self.collection.watch([{"$match": {"operationType": {"$in": OPERATIONS}}}],
+                                             full_document='updateLookup', resume_after=token,
+                                             max_await_time_ms=self.max_await_ms)
+
+    def poll(self):
+        """Retorna (eventos, resume token) de lo que haya llegado."""
+        events = []
+        while len(events) < Config.MONGO_BATCH_SIZE:
+            event = self._stream.try_next()
+            if event is None:
+                break
+            events.append(event)
+        return events, self._stream.resume_token
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+
+class PollingSource:
+    """
+    Para servidores sin change streams: consulta cada idle_wait segundos los recordatorios
+    con _id (ObjectId) o sentAt mayor que los últimos vistos y los entrega como eventos
+    replace con el documento completo. El token son esos watermarks (el de sentAt, por tipo).
+    Como refresh_rollups, también relee la ventana de INSERT_WATERMARK_MARGIN anterior a cada
+    watermark: un documento que llega tarde con un valor menor (otro reloj, un commit más
+    lento) se entrega igual; los de la ventana que ya se entregaron se descartan por _id.
+    No ve borrados ni cambios que no toquen sentAt.
+    """
+    kind = 'poll'
+
+    def __init__(self, collection, interval):
+        self.collection = collection
+        self.idle_wait = interval
+        self._token = None
+        self._seen = {}  # watermark -> _id ya entregados en su ventana
+
+    def open(self, token):
+        if token is None:
+            # Desde ahora: lo anterior ya lo trae la siembra
+            last = self.collection.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+            token = {"_id": last['_id'] if last else None, "sentAt": latest_values(self.collection, 'sentAt')}
+        self._token = dict(token, sentAt=as_watermarks(token['sentAt']))
+        self._seen = {}
+
+    def _find(self, query):
+        return self.collection.find(query, {"user_id": 1, "date_time": 1, "status": 1, "sentAt": 1})
+
+    def _after(self, field, query):
+        """Hasta MONGO_BATCH_SIZE documentos de query, en orden de field."""
+        return list(self._find(query).sort(field, 1).limit(Config.MONGO_BATCH_SIZE))
+
+    def _late(self, name, window, batch):
+        """
+        Documentos de la ventana anterior al watermark name que no se entregaron antes. Se
+        recuerdan los _id de la ventana y del lote nuevo: la próxima ventana sale de ellos.
+        """
+        ids = [doc['_id'] for doc in self.collection.find(window, {"_id": 1})] if window is not None else []
+        seen = self._seen.get(name, set())
+        missing = [doc_id for doc_id in ids if doc_id not in seen]
+        self._seen[name] = set(ids).union(doc['_id'] for doc in batch)
+        return list(self._find({"_id": {"$in": missing}})) if missing else []
+
+    def poll(self):
+        # Cada watermark avanza solo con su consulta: un lote cortado no saltea documentos
+        last_id = self._token['_id']
+        inserted = self._after('_id', {"_id": {"$gt": last_id}} if last_id is not None else {})
+        window = None if last_id is None else {"$and": [inserted_since(last_id), {"_id": {"$lte": last_id}}]}
+        docs = inserted + self._late('_id', window, inserted)
+        if inserted:
+            self._token = dict(self._token, _id=inserted[-1]['_id'])
+        watermarks = dict(self._token['sentAt'])
+        floors = since_watermarks('sentAt', watermarks_before(watermarks))
+        for bson_type, query in since_watermarks('sentAt', watermarks, '$gt').items():
+            batch = self._after('sentAt', query)
+            window = None
+            if watermarks[bson_type] is not None:
+                window = {"$and": [floors[bson_type], {"sentAt": {"$lte": watermarks[bson_type]}}]}
+            docs += batch + self._late(bson_type, window, batch)
+            if batch:
+                watermarks[bson_type] = batch[-1]['sentAt']
+        self._token = dict(self._token, sentAt=watermarks)
+        events = [{"operationType": "replace", "documentKey": {"_id": doc['_id']}, "fullDocument": doc}
+                  for doc in docs]
+        return events, self._token
+
+    def close(self):
+        pass
+
+
+class QueueSource:
+    """Eventos inyectados (por ejemplo desde el proceso que envía los recordatorios, o en pruebas)."""
+    kind = 'queue'
+    idle_wait = 0
+
+    def __init__(self, wait=1.0):
+        self._queue = queue.Queue()
+        self._wait = wait
+
+    def put(self, event):
+        self._queue.put(event)
+
+    def open(self, token):
+        pass
+
+    def poll(self):
+        try:
+            events = [self._queue.get(timeout=self._wait)]
+        except queue.Empty:
+            return [], None
+        while len(events) < Config.MONGO_BATCH_SIZE:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return events, None
+
+    def close(self):
+        pass
+
+
+def create_source(collection, kind=None):
+    """Fuente de eventos de Config.LIVE_SOURCE: 'change_stream', 'poll' o 'auto'."""
+    kind = kind or Config.LIVE_SOURCE
+    if kind == 'poll':
+        return PollingSource(collection, Config.LIVE_POLL_INTERVAL)
+    if kind in ('change_stream', 'auto'):
+        return ChangeStreamSource(collection, Config.LIVE_POLL_INTERVAL)
+    raise ValueError(f"LIVE_SOURCE desconocido: {kind} (opciones: change_stream, poll, auto)")
+
+
+class LiveWatcher:
+    """
+    Hilo de fondo que siembra los contadores de hoy con una consulta y después aplica los
+    eventos de la fuente. La fuente se abre antes de sembrar, así que lo que cambie durante
+    la siembra llega también como evento (y se aplica sin duplicar). El resume token se
+    guarda en state_collection cada token_save_interval segundos: al reiniciar se reanuda
+    desde ahí (y se vuelve a sembrar, porque los contadores viven en memoria). A medianoche
+    se siembra el día nuevo.
+    """
+
+    def __init__(self, collection, source, state_collection=None, token_save_interval=10, fallback=None):
+        self.collection = collection
+        self.source = source
+        self.state_collection = state_collection
+        self.token_save_interval = token_save_interval
+        # Fuente para cuando el servidor no soporta change streams (LIVE_SOURCE=auto)
+        self.fallback = fallback
+        self.counters = None
+        self._token = None
+        self._saved_token = None
+        self._saved_at = 0.0
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+
+    def snapshot(self):
+        """Contadores de hoy, o None mientras no terminó la primera siembra."""
+        counters = self.counters
+        if counters is None:
+            return None
+        if counters.day != today():
+            # El hilo todavía no sembró el día nuevo
+            return TodayCounters(today()).snapshot()
+        return counters.snapshot()
+
+    def _load_token(self):
+        if self.state_collection is None:
+            return None
+        state = self.state_collection.find_one({"_id": LIVE_STATE_ID})
+        # Un token de otra fuente no sirve (por ejemplo si cambió LIVE_SOURCE)
+        if state is None or state.get('source') != self.source.kind:
+            return None
+        return state.get('token')
+
+    def _save_token(self, force=False):
+        if self.state_collection is None or self._token is None or self._token == self._saved_token:
+            return
+        if not force and time.monotonic() - self._saved_at < self.token_save_interval:
+            return
+        self.state_collection.replace_one(
+            {"_id": LIVE_STATE_ID},
+            {"_id": LIVE_STATE_ID, "source": self.source.kind, "token": self._token, "updated_at": datetime.utcnow()},
+            upsert=True
+        )
+        self._saved_token = self._token
+        self._saved_at = time.monotonic()
+
+    def seed(self, day=None):
+        """Reemplaza los contadores por los del día, leídos de la colección."""
+        counters = TodayCounters(day or today())
+        for doc in self.collection.aggregate(today_pipeline(counters.day)):
+            counters.upsert(doc)
+        self.counters = counters
+        logger.info("Contadores en vivo de %s: %d recordatorios", counters.day, counters.created)
+
+    def _open(self):
+        try:
+            self.source.open(self._token)
+        except (OperationFailure, NotImplementedError) as error:
+            unsupported = isinstance(error, NotImplementedError) or error.code in CHANGE_STREAMS_UNSUPPORTED
+            if not unsupported or self.fallback is None:
+                raise
+            logger.info("El servidor no soporta change streams; en vivo con consultas periódicas")
+            self.source, self.fallback = self.fallback, None
+            self._token = self._load_token()
+            self.source.open(self._token)
+
+    def run_once(self):
+        """Aplica lo que haya llegado a la fuente; retorna la cantidad de eventos."""
+        if self.counters is None or self.counters.day != today():
+            self.seed()
+        events, token = self.source.poll()
+        for event in events:
+            apply_event(self.counters, event)
+        if token is not None:
+            self._token = token
+        self._save_token()
+        return len(events)
+
+    def _run(self):
+        self._token = self._load_token()
+        while not self._stop.is_set():
+            try:
+                self._open()
+                self.seed()
+                while not self._stop.is_set():
+                    if not self.run_once() and self.source.idle_wait:
+                        self._stop.wait(self.source.idle_wait)
+            except OperationFailure as error:
+                if error.code in HISTORY_LOST:
+                    # El token ya salió del oplog: se empieza de nuevo desde ahora (la siembra cubre el día)
+                    logger.warning("Resume token vencido; se reinicia el seguimiento en vivo")
+                    self._token = None
+                    continue
+                logger.exception("Seguimiento en vivo falló; se reintenta en %ds", RETRY_WAIT)
+                self._stop.wait(RETRY_WAIT)
+            except Exception:
+                # Mongo caído u otro error: se reabre la fuente desde el último token
+                logger.exception("Seguimiento en vivo falló; se reintenta en %ds", RETRY_WAIT)
+                self._stop.wait(RETRY_WAIT)
+        self.source.close()
+        self._save_token(force=True)
+
+    def start(self):
+        """Arranca el hilo (uno por proceso: después de un fork hay que volver a llamarlo)."""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._stop.clear()
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='live-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def start_live_watcher(collection=None, source=None):
+    """
+    LiveWatcher ya arrancado sobre la colección de recordatorios (None si LIVE_ENABLED
+    está desactivado). Sin source usa la de Config.LIVE_SOURCE. Cada worker sigue los
+    cambios por su cuenta.
+    """
+    if not Config.LIVE_ENABLED:
+        return None
+    collection = collection if collection is not None else get_reminders_collection()
+    fallback = PollingSource(collection, Config.LIVE_POLL_INTERVAL) if Config.LIVE_SOURCE == 'auto' else None
+    watcher = LiveWatcher(collection, source or create_source(collection), get_rollup_state_collection(),
+                          Config.LIVE_TOKEN_SAVE_INTERVAL, fallback)
+    watcher.start()
+    os.register_at_fork(after_in_child=watcher.start)
+    register_collector(lambda: [('remindme_live_documents', 'gauge', {},
+                                 watcher.counters.created if watcher.counters else 0)])
+    return watcher
@@ -1,12 +1,50 @@
-from datetime import datetime, timedelta
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from itertools import chain, islice
+import numpy as np
 import pandas as pd
 from config import Config
-from pymongo import MongoClient
+from cache import SingleFlight, TTLCache
+from dates import chunk_spans, day_bucket, local_date, month_bucket, range_stages, shift_day, to_date, today
+from cohorts import (empty_cohort_metrics, get_cohort_metrics, pending_cohort_metrics, refresh_user_index,
+                     user_index_ready)
+from latency import (NO_LATENCY, bucket_stages, latency_key, latency_series, sketches_from_buckets,
+                     sketches_from_columns)
+from rollups import compute_range_rollups, get_rollup_summary, refresh_rollups, rollups_ready, summarize_rollups
+from database import (get_cohorts_collection, get_reminders_collection, get_rollup_collection,
+                      get_rollup_state_collection, get_users_collection)
+from snapshot import SnapshotReader, combine_frames
+from telemetry import annotate, inc, record, register_cache, register_collector, set_gauge, span
 
-# Inicializar MongoDB client
-client = MongoClient(Config.MONGO_URI)
-db = client['RemindMe-test']
-collection = db['reminders']
+# Cache de resultados por (start_date, end_date)
+metrics_cache = TTLCache(
+    ttl=Config.METRICS_CACHE_TTL,
+    max_entries=Config.METRICS_CACHE_MAX_ENTRIES,
+    max_bytes=Config.METRICS_CACHE_MAX_BYTES
+)
+# Pedidos concurrentes del mismo rango comparten una sola consulta
+metrics_flight = SingleFlight()
+# Hilos para calculate_metrics_async
+_fetch_executor = ThreadPoolExecutor(max_workers=Config.FETCH_WORKERS, thread_name_prefix='metrics-fetch')
+_pending_fetches = {}
+_pending_lock = threading.Lock()
+# Tramos de rollups por día de get_chunked_summary; solo se guardan los anteriores a hoy
+chunk_cache = TTLCache(
+    ttl=Config.METRICS_CACHE_HISTORICAL_TTL,
+    max_entries=Config.FETCH_CHUNK_CACHE_ENTRIES,
+    max_bytes=Config.METRICS_CACHE_MAX_BYTES
+)
+_chunk_executor = ThreadPoolExecutor(max_workers=Config.FETCH_CONCURRENCY, thread_name_prefix='metrics-chunk')
+
+register_cache('metrics', metrics_cache)
+register_cache('chunks', chunk_cache)
+register_collector(lambda: [
+    ('remindme_metrics_computations_total', 'counter', {}, metrics_flight.executions),
+    ('remindme_metrics_coalesced_total', 'counter', {}, metrics_flight.shared)
+])
 
 
 # Helper function to convert timestamp to string
@@ -17,6 +55,21 @@ def timestamp_to_string(ts):
     return ts
 
 
+def reminders_data_pipeline(start_date, end_date):
+    """Pipeline de get_reminders_data: documentos del rango con los campos recortados."""
+    # Un solo proyecto que incluya todos los campos necesarios; las fechas son días
+    # en la zona de reporte
+    project_stage = {
+        "$project": {
+            "user_id": 1,
+            "date_time": day_bucket(),
+            "sentAt": local_date(to_date("$sentAt")),
+            "status": { "$ifNull": ["$status", "not_sent"] },
+            "_id": 0
+        }
+    }
+    return range_stages([(start_date, end_date)]) + [project_stage]
+
 # Fetch data from MongoDB and return DataFrame
 def get_reminders_data(collection, start_date, end_date):
     """
@@ -28,142 +81,381 @@ def get_reminders_data(collection, start_date, end_date):
     sentAt (str de la forma yyyy-mm-dd): fecha de envío del recordatorio, si no se envió None
     status (str): sent si el recordatorio se envió, not_sent si no se envió
     """
-    start = datetime.strptime(start_date, '%Y-%m-%d')
-    end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+    pipeline = reminders_data_pipeline(start_date, end_date)
+
+    data = list(collection.aggregate(pipeline))
+    return pd.DataFrame(data)
 
-    match_stage = {"$match": {"date_time": 
-                            {"$gte": start.strftime('%Y-%m-%dT00:00:00.000-04:00'),
-                            "$lt": end.strftime('%Y-%m-%dT00:00:00.000-04:00')}}}
-    
-    # Un solo proyecto que incluya todos los campos necesarios
+# Los días se representan como int32: días desde 1970-01-01
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def reminders_frame_pipeline(start_date, end_date):
+    """Pipeline de load_reminders_frame: solo usuario, día, si se envió y el bucket de su demora."""
     project_stage = {
         "$project": {
             "user_id": 1,
-            "date_time": { "$substr": ["$date_time", 0, 10] },
-            "sentAt": { "$ifNull": [{ "$substr": ["$sentAt", 0, 10] }, None] },
-            "status": { "$ifNull": ["$status", "not_sent"] },
+            "day": day_bucket(),
+            "sent": {"$eq": [{"$ifNull": ["$status", "not_sent"]}, "sent"]},
+            "latency": latency_key(),
             "_id": 0
         }
     }
-    pipeline = [match_stage, project_stage]
+    return range_stages([(start_date, end_date)]) + [project_stage]
 
-    data = list(collection.aggregate(pipeline))
-    return pd.DataFrame(data)
 
-# Metric functions
-def get_daily_users(df):
-    """Users creating reminders per day."""
-    if df.empty:
-        return pd.DataFrame({"date_time": [], "count": []})
-    daily_users = df.groupby('date_time')['user_id'].nunique().reset_index(name='count')
-    return daily_users
-
-def get_monthly_users(df):
-    """Users creating reminders per month."""
-    if df.empty:
-        return pd.DataFrame({"mes": [], "count": []})
-    df['mes'] = pd.to_datetime(df['date_time']).dt.to_period('M').astype(str)
-    df_month = df.groupby('mes')['user_id'].nunique().reset_index(name="count")
-    return df_month
-
-def get_daily_reminds_created(df):
-    """Reminders created per day."""
-    if df.empty:
-        return pd.DataFrame({"date_time": [], "count": []})
-    # Group by date_created and count
-    daily_counts = df.groupby('date_time').size().reset_index(name='count')
-    return daily_counts.sort_values('date_time').reset_index(drop=True)
-
-def get_monthly_reminds_created(df):
-    """Reminders created per month."""
-    if df.empty:
-        return pd.DataFrame({"month": [], "count": []})
-    # Convert date_time to datetime and extract month
-    df['month'] = pd.to_datetime(df['date_time'], errors='coerce').dt.strftime('%Y-%m')
-    # Group by month and count
-    monthly_counts = df.groupby('month').size().reset_index(name='count')
-    return monthly_counts.sort_values('month').reset_index(drop=True)
-
-def get_daily_reminds_sent(df):
-    if df.empty:
-        return pd.DataFrame({"date_time": [], "count": []})
-    sent_date = df[df['status'] == "sent"]
-    daily_sent = sent_date.groupby('date_time').size().reset_index(name='count')
-    return daily_sent
-
-def get_monthly_reminds_sent(df):
-    """Return DataFrame with month and count of status == 'sent' per month."""
-    if df.empty:
-        return pd.DataFrame({"month": [], "count": []})
-    # Filter for status == 'sent'
-    sent_date = df[df['status'] == 'sent']
-    # Convert date_time to datetime and extract month
-    sent_date['month'] = pd.to_datetime(sent_date['date_time'], errors='coerce').dt.strftime('%Y-%m')
-    # Group by month and count
-    monthly_sent = sent_date.groupby('month').size().reset_index(name='count')
-    return monthly_sent
+def load_reminders_frame(collection, start_date, end_date, batch_size=None):
+    """
+    Como get_reminders_data, pero lee el cursor por lotes directo a columnas tipadas,
+    sin armar la lista completa de documentos.
+    El dataframe de salida tiene las columnas
+    user_id (category): nro de teléfono del usuario
+    day (int32): día de creación del recordatorio, en días desde 1970-01-01
+    month (int32): mes de creación del recordatorio, en meses desde 1970-01
+    is_sent (bool): True si el recordatorio se envió
+    latency (int32): bucket del sketch de la demora de envío (latency.NO_LATENCY si no se envió)
+    Las fechas se convierten una sola vez acá; las funciones de métricas usan estas columnas.
+    """
+    batch_size = batch_size or Config.MONGO_BATCH_SIZE
+    started = time.perf_counter()
+    cursor = collection.aggregate(reminders_frame_pipeline(start_date, end_date), batchSize=batch_size)
+    # Esperando a Mongo (mongo_aggregate) vs. armando columnas (frame_build)
+    fetch_seconds = time.perf_counter() - started
 
-def calculate_metrics(start_date, end_date):
-    """Calcula todas las métricas para el rango de fechas dado."""
-    data = get_reminders_data(collection, start_date, end_date)
-    
-    if data.empty:
-        return {
-            "total_users": 0,
-            "total_reminds_created": 0,
-            "total_reminds_sent": 0,
-            "average_daily_users": 0,
-            "average_monthly_users": 0,
-            "per_user_reminds_created": 0,
-            "per_user_reminds_sent": 0,
-            "daily_users": pd.DataFrame({"date_time": [], "count": []}),
-            "monthly_users": pd.DataFrame({"mes": [], "count": []}),
-            "daily_reminds_created": pd.DataFrame({"date_time": [], "count": []}),
-            "monthly_reminds_created": pd.DataFrame({"month": [], "count": []}),
-            "daily_reminds_sent": pd.DataFrame({"date_time": [], "count": []}),
-            "monthly_reminds_sent": pd.DataFrame({"month": [], "count": []}),
-            "average_daily_reminds_created": 0,
-            "average_daily_reminds_sent": 0,
-            "average_per_user_daily_reminds_created": 0,
-            "average_per_user_daily_reminds_sent": 0,
-            "average_monthly_reminds_created": 0,
-            "average_monthly_reminds_sent": 0,
-            "average_per_user_monthly_reminds_created": 0,
-            "average_per_user_monthly_reminds_sent": 0
+    user_codes = {}
+    day_numbers = {}
+    user_chunks, day_chunks, sent_chunks, latency_chunks = [], [], [], []
+    while True:
+        fetch_started = time.perf_counter()
+        batch = list(islice(cursor, batch_size))
+        fetch_seconds += time.perf_counter() - fetch_started
+        if not batch:
+            break
+        users = np.empty(len(batch), dtype=np.int32)
+        days = np.empty(len(batch), dtype=np.int32)
+        sent = np.empty(len(batch), dtype=np.bool_)
+        latency = np.empty(len(batch), dtype=np.int32)
+        for i, doc in enumerate(batch):
+            user_id = doc.get('user_id')
+            users[i] = -1 if user_id is None else user_codes.setdefault(user_id, len(user_codes))
+            day = doc['day']
+            number = day_numbers.get(day)
+            if number is None:
+                number = day_numbers[day] = date.fromisoformat(day).toordinal() - EPOCH_ORDINAL
+            days[i] = number
+            sent[i] = doc['sent']
+            key = doc.get('latency')
+            latency[i] = NO_LATENCY if key is None else key
+        user_chunks.append(users)
+        day_chunks.append(days)
+        sent_chunks.append(sent)
+        latency_chunks.append(latency)
+
+    def concat(chunks, dtype):
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+
+    days = concat(day_chunks, np.int32)
+    columns = {
+        "day": days,
+        "month": day_to_month(days),
+        "is_sent": concat(sent_chunks, np.bool_),
+        "latency": concat(latency_chunks, np.int32)
+    }
+    # El frame se comparte (cache) y no debe modificarse: sin copia y de solo lectura
+    for values in columns.values():
+        values.flags.writeable = False
+    user_ids = pd.Categorical.from_codes(concat(user_chunks, np.int32), categories=list(user_codes))
+    frame = pd.DataFrame({"user_id": user_ids, **columns}, copy=False)
+    record('mongo_aggregate', fetch_seconds)
+    record('frame_build', time.perf_counter() - started - fetch_seconds)
+    return frame
+
+
+def day_to_month(days):
+    """Días desde 1970-01-01 -> meses desde 1970-01."""
+    return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int32)
+
+
+def day_labels(days):
+    """Días desde 1970-01-01 -> strings yyyy-mm-dd."""
+    return np.asarray(days, dtype=np.int64).astype('datetime64[D]').astype(str)
+
+
+def month_labels(months):
+    """Meses desde 1970-01 -> strings yyyy-mm."""
+    return np.asarray(months, dtype=np.int64).astype('datetime64[M]').astype(str)
+
+
+def _count_group(key):
+    """Sub-pipeline del $facet: cuenta recordatorios y usuarios distintos por clave."""
+    return [
+        # Primero (clave, usuario) para que los usuarios distintos salgan como conteo;
+        # los recordatorios sin user_id (null o faltante) no cuentan como usuario
+        {"$group": {"_id": {"key": key, "user_id": "$user_id"},
+                    "created": {"$sum": 1},
+                    "sent": {"$sum": "$sent"}}},
+        {"$group": {"_id": "$_id.key",
+                    "users": {"$sum": {"$cond": [{"$eq": [{"$ifNull": ["$_id.user_id", None]}, None]}, 0, 1]}},
+                    "created": {"$sum": "$created"},
+                    "sent": {"$sum": "$sent"}}},
+        {"$sort": {"_id": 1}}
+    ]
+
+
+def reminders_summary_pipeline(start_date, end_date):
+    """
+    Pipeline de get_reminders_summary: conteos diarios, mensuales y totales y los
+    buckets de la demora de envío por día en un $facet.
+    """
+    project_stage = {
+        "$project": {
+            "user_id": 1,
+            "day": day_bucket(),
+            "month": month_bucket(),
+            "sent": {"$cond": [{"$eq": [{"$ifNull": ["$status", "not_sent"]}, "sent"]}, 1, 0]},
+            "latency": latency_key(),
+            "_id": 0
+        }
+    }
+    facet_stage = {
+        "$facet": {
+            "daily": _count_group("$day"),
+            "monthly": _count_group("$month"),
+            "totals": _count_group(None),
+            "latency": bucket_stages()
         }
-    
-    # Calcular métricas
-    daily_users = get_daily_users(data)
-    monthly_users = get_monthly_users(data)
-    daily_reminds_created = get_daily_reminds_created(data)
-    monthly_reminds_created = get_monthly_reminds_created(data)
-    daily_reminds_sent = get_daily_reminds_sent(data)
-    monthly_reminds_sent = get_monthly_reminds_sent(data)
+    }
+    return range_stages([(start_date, end_date)]) + [project_stage, facet_stage]
+
+
+def get_reminders_summary(collection, start_date, end_date):
+    """
+    Agrega en Mongo los conteos que necesita calculate_metrics para el rango dado,
+    sin traer los documentos individuales.
+    Retorna un dict con:
+    daily: lista de {_id: yyyy-mm-dd, users, created, sent}
+    monthly: lista de {_id: yyyy-mm, users, created, sent}
+    totals: {users, created, sent} (vacío si no hay datos)
+    latency: {yyyy-mm-dd: DDSketch de la demora de envío en segundos}
+    """
+    pipeline = reminders_summary_pipeline(start_date, end_date)
+
+    result = next(collection.aggregate(pipeline, allowDiskUse=True), {})
+    totals = result.get("totals") or [{}]
+    return {
+        "daily": result.get("daily", []),
+        "monthly": result.get("monthly", []),
+        "totals": totals[0],
+        "latency": sketches_from_buckets(result.get("latency", []))
+    }
+
+def _fetch_chunk(collection, start_date, end_date):
+    key = (start_date, end_date)
+    rows = chunk_cache.get(key) if Config.METRICS_CACHE_ENABLED else None
+    if rows is None:
+        rows = compute_range_rollups(collection, start_date, end_date, sketches=False)
+        if Config.METRICS_CACHE_ENABLED and end_date < today():
+            chunk_cache.set(key, rows)
+    return rows
+
+def get_chunked_summary(collection, start_date, end_date):
+    """
+    Como get_reminders_summary, pero consulta el rango en tramos de FETCH_CHUNK_DAYS días,
+    hasta FETCH_CONCURRENCY a la vez. Cada tramo trae rollups por día (con la lista de
+    usuarios, para que los distintos por mes y del total sean exactos) que se van
+    combinando en orden a medida que llegan.
+    """
+    spans = chunk_spans(start_date, end_date, Config.FETCH_CHUNK_DAYS)
+    parts = _chunk_executor.map(lambda span: _fetch_chunk(collection, *span), spans)
+    return summarize_rollups(chain.from_iterable(parts))
+
+def date_axis(start_date, end_date):
+    """
+    Eje completo de días y meses del rango [start_date, end_date], compartido por
+    todas las series (incluye los días sin datos).
+    days/months: etiquetas yyyy-mm-dd / yyyy-mm
+    first_day: primer día en días desde 1970-01-01
+    month_of_day: posición en months de cada día de days
+    """
+    first_day = date.fromisoformat(start_date).toordinal() - EPOCH_ORDINAL
+    last_day = date.fromisoformat(end_date).toordinal() - EPOCH_ORDINAL
+    day_numbers = np.arange(first_day, max(last_day + 1, first_day), dtype=np.int32)
+    day_months = day_to_month(day_numbers)
+    first_month = int(day_months[0]) if len(day_months) else 0
+    last_month = int(day_months[-1]) if len(day_months) else first_month - 1
+    return {
+        "first_day": first_day,
+        "days": day_labels(day_numbers),
+        "months": month_labels(np.arange(first_month, last_month + 1)),
+        "month_of_day": day_months - first_month
+    }
+
+
+# Metric functions
+# Reciben el dataframe normalizado de load_reminders_frame y devuelven arreglos densos
+# sobre el eje de date_axis (con 0 en los días/meses sin datos)
+CHUNK_ROWS = 1 << 19
+
+def _by_month(axis, daily):
+    """Suma una serie diaria por mes del eje."""
+    n_months = len(axis['months'])
+    return np.bincount(axis['month_of_day'], weights=daily, minlength=n_months).astype(np.int64)
+
+def compute_series(df, axis):
+    """
+    Calcula todas las series diarias/mensuales y los totales en una sola pasada
+    sobre las claves enteras del dataframe normalizado.
+    Los conteos mensuales se derivan de los diarios; los usuarios distintos por mes
+    se derivan de los pares (día, usuario) ya deduplicados.
+    No modifica df ni copia sus columnas: los arreglos temporales se reservan por tramos.
+    """
+    days = df['day'].to_numpy()
+    users = df['user_id'].array.codes
+    is_sent = df['is_sent'].to_numpy()
+
+    first_day = axis['first_day']
+    n_days = len(axis['days'])
+    n_users = len(df['user_id'].cat.categories)
+
+    # Se recorre por tramos para que los arreglos temporales no dependan del tamaño del frame
+    created_by_day = np.zeros(n_days, dtype=np.int64)
+    sent_by_day = np.zeros(n_days, dtype=np.int64)
+    day_user = np.empty(0, dtype=np.int64)
+    pending, pending_size = [], 0
+    for start in range(0, len(days), CHUNK_ROWS):
+        day_index = days[start:start + CHUNK_ROWS] - first_day
+        chunk_users = users[start:start + CHUNK_ROWS]
+        chunk_sent = is_sent[start:start + CHUNK_ROWS]
+        if len(day_index) and (day_index.min() < 0 or day_index.max() >= n_days):
+            # Filas fuera del rango pedido (no debería pasar con el $match por rango)
+            inside = (day_index >= 0) & (day_index < n_days)
+            day_index, chunk_users, chunk_sent = day_index[inside], chunk_users[inside], chunk_sent[inside]
+        created_by_day += np.bincount(day_index, minlength=n_days)
+        sent_by_day += np.bincount(day_index[chunk_sent], minlength=n_days)
+
+        # Pares (día, usuario) distintos; los user_id nulos (código -1) no cuentan como usuario
+        if len(chunk_users) and chunk_users.min() < 0:
+            known = chunk_users >= 0
+            day_index, chunk_users = day_index[known], chunk_users[known]
+        pair_keys = day_index.astype(np.int64)
+        pair_keys *= n_users
+        pair_keys += chunk_users
+        # (pd.unique usa hashing, sin ordenar); los pares de cada tramo se unen a los
+        # acumulados cuando ya suman tanto como ellos, para no re-deduplicar en cada tramo
+        chunk_pairs = pd.unique(pair_keys)
+        pending.append(chunk_pairs)
+        pending_size += len(chunk_pairs)
+        if pending_size >= max(len(day_user), CHUNK_ROWS):
+            day_user = pd.unique(np.concatenate([day_user] + pending))
+            pending, pending_size = [], 0
+    if pending:
+        day_user = pd.unique(np.concatenate([day_user] + pending))
+    pair_days = day_user // n_users
+    pair_users = day_user % n_users
+
+    month_of_day = axis['month_of_day']
+    month_user = pd.unique(month_of_day[pair_days].astype(np.int64) * n_users + pair_users)
+    return {
+        "daily_users": np.bincount(pair_days, minlength=n_days),
+        "monthly_users": np.bincount(month_user // n_users, minlength=len(axis['months'])),
+        "daily_reminds_created": created_by_day,
+        "monthly_reminds_created": _by_month(axis, created_by_day),
+        "daily_reminds_sent": sent_by_day,
+        "monthly_reminds_sent": _by_month(axis, sent_by_day),
+        "total_users": int(np.count_nonzero(np.bincount(pair_users, minlength=n_users))),
+        "total_reminds_created": int(created_by_day.sum()),
+        "total_reminds_sent": int(sent_by_day.sum())
+    }
+
+def _dense(labels, rows, field):
+    """Valores field de rows ({_id: etiqueta, ...}) ubicados sobre las etiquetas del eje."""
+    values = np.zeros(len(labels), dtype=np.int64)
+    if not rows or not len(labels):
+        return values
+    keys = np.array([row['_id'] for row in rows])
+    positions = np.minimum(np.searchsorted(labels, keys), len(labels) - 1)
+    inside = labels[positions] == keys
+    values[positions[inside]] = np.array([row[field] for row in rows], dtype=np.int64)[inside]
+    return values
+
+def _series_from_summary(summary, axis):
+    """Series y totales con la misma forma que compute_series, a partir de get_reminders_summary."""
+    daily = summary['daily']
+    monthly = summary['monthly']
+    totals = summary['totals']
+    return {
+        "daily_users": _dense(axis['days'], daily, 'users'),
+        "monthly_users": _dense(axis['months'], monthly, 'users'),
+        "daily_reminds_created": _dense(axis['days'], daily, 'created'),
+        "monthly_reminds_created": _dense(axis['months'], monthly, 'created'),
+        "daily_reminds_sent": _dense(axis['days'], daily, 'sent'),
+        "monthly_reminds_sent": _dense(axis['months'], monthly, 'sent'),
+        "total_users": totals.get('users', 0),
+        "total_reminds_created": totals.get('created', 0),
+        "total_reminds_sent": totals.get('sent', 0)
+    }
+
+def empty_metrics(axis):
+    """Métricas para un rango sin datos: todas las series en 0."""
+    n_days, n_months = len(axis['days']), len(axis['months'])
+    return build_metrics({
+        "daily_users": np.zeros(n_days, dtype=np.int64),
+        "monthly_users": np.zeros(n_months, dtype=np.int64),
+        "daily_reminds_created": np.zeros(n_days, dtype=np.int64),
+        "monthly_reminds_created": np.zeros(n_months, dtype=np.int64),
+        "daily_reminds_sent": np.zeros(n_days, dtype=np.int64),
+        "monthly_reminds_sent": np.zeros(n_months, dtype=np.int64),
+        "total_users": 0,
+        "total_reminds_created": 0,
+        "total_reminds_sent": 0
+    }, axis)
+
+def _with_latency(metrics, sketches, axis):
+    """Agrega a las métricas los cuantiles de la demora de envío (ver latency.latency_series)."""
+    metrics.update(latency_series(sketches, axis))
+    return metrics
+
+def _mean(values):
+    return float(values.mean()) if len(values) else 0
+
+def build_metrics(series, axis):
+    """
+    Calcula totales y promedios a partir de las series diarias/mensuales.
+    Los promedios son sobre todos los días/meses del rango, incluidos los que no tienen datos.
+    """
+    daily_users = series['daily_users']
+    monthly_users = series['monthly_users']
+    daily_reminds_created = series['daily_reminds_created']
+    monthly_reminds_created = series['monthly_reminds_created']
+    daily_reminds_sent = series['daily_reminds_sent']
+    monthly_reminds_sent = series['monthly_reminds_sent']
 
     # Totales
-    total_users = data['user_id'].nunique()
-    total_reminds_created = len(data)
-    total_reminds_sent = data[data['status'] == 'sent'].shape[0]
+    total_users = series['total_users']
+    total_reminds_created = series['total_reminds_created']
+    total_reminds_sent = series['total_reminds_sent']
 
     # Estadísticas de usuarios
-    average_daily_users = daily_users['count'].mean() if not daily_users.empty else 0
-    average_monthly_users = monthly_users['count'].mean() if not monthly_users.empty else 0
+    average_daily_users = _mean(daily_users)
+    average_monthly_users = _mean(monthly_users)
     per_user_reminds_created = total_reminds_created / total_users if total_users > 0 else 0
     per_user_reminds_sent = total_reminds_sent / total_users if total_users > 0 else 0
 
     # Estadísticas diarias
-    average_daily_reminds_created = daily_reminds_created['count'].mean() if not daily_reminds_created.empty else 0
-    average_daily_reminds_sent = daily_reminds_sent['count'].mean() if not daily_reminds_sent.empty else 0
+    average_daily_reminds_created = _mean(daily_reminds_created)
+    average_daily_reminds_sent = _mean(daily_reminds_sent)
     average_per_user_daily_reminds_created = average_daily_reminds_created / total_users if total_users > 0 else 0
     average_per_user_daily_reminds_sent = average_daily_reminds_sent / total_users if total_users > 0 else 0
 
     # Estadísticas mensuales
-    average_monthly_reminds_created = monthly_reminds_created['count'].mean() if not monthly_reminds_created.empty else 0
-    average_monthly_reminds_sent = monthly_reminds_sent['count'].mean() if not monthly_reminds_sent.empty else 0
+    average_monthly_reminds_created = _mean(monthly_reminds_created)
+    average_monthly_reminds_sent = _mean(monthly_reminds_sent)
     average_per_user_monthly_reminds_created = average_monthly_reminds_created / total_users if total_users > 0 else 0
     average_per_user_monthly_reminds_sent = average_monthly_reminds_sent / total_users if total_users > 0 else 0
 
     return {
+        "days": axis['days'],
+        "months": axis['months'],
         "total_users": total_users,
         "total_reminds_created": total_reminds_created,
         "total_reminds_sent": total_reminds_sent,
@@ -186,3 +478,189 @@ def calculate_metrics(start_date, end_date):
         "average_per_user_monthly_reminds_created": average_per_user_monthly_reminds_created,
         "average_per_user_monthly_reminds_sent": average_per_user_monthly_reminds_sent
     }
+
+_last_rollup_refresh = 0.0
+_rollup_lock = threading.Lock()
+
+def refresh_rollups_if_due():
+    """
+    Actualiza los rollups (en modo rollup) si pasaron más de ROLLUP_REFRESH_INTERVAL segundos.
+    Lo llama el warmer en segundo plano, como refresh_user_index_if_due: los requests solo
+    leen los rollups y, si otro hilo ya los está actualizando, retorna sin esperar.
+    """
+    global _last_rollup_refresh
+    if Config.METRICS_AGGREGATION != 'rollup' or not Config.ROLLUP_REFRESH_INTERVAL:
+        return
+    if not _rollup_lock.acquire(blocking=False):
+        return
+    try:
+        now = time.monotonic()
+        if now - _last_rollup_refresh >= Config.ROLLUP_REFRESH_INTERVAL:
+            refresh_rollups(get_reminders_collection(), get_rollup_collection(), get_rollup_state_collection())
+            _last_rollup_refresh = now
+    finally:
+        _rollup_lock.release()
+
+_last_user_index_refresh = 0.0
+_user_index_lock = threading.Lock()
+
+def refresh_user_index_if_due():
+    """
+    Actualiza el índice de usuarios y las cohortes si pasaron más de COHORTS_REFRESH_INTERVAL
+    segundos. Lo llama el warmer en segundo plano (los requests solo leen las cohortes);
+    si otro hilo ya lo está actualizando, retorna sin esperar.
+    """
+    global _last_user_index_refresh
+    if not Config.COHORTS_ENABLED or not Config.COHORTS_REFRESH_INTERVAL:
+        return
+    if not _user_index_lock.acquire(blocking=False):
+        return
+    try:
+        now = time.monotonic()
+        if now - _last_user_index_refresh >= Config.COHORTS_REFRESH_INTERVAL:
+            refresh_user_index(get_reminders_collection(), get_users_collection(), get_cohorts_collection(),
+                               get_rollup_state_collection())
+            _last_user_index_refresh = now
+    finally:
+        _user_index_lock.release()
+
+def is_cacheable(metrics):
+    """Si el resultado se puede cachear: no mientras le faltan las cohortes (pending_cohort_metrics)."""
+    return metrics['new_users'] is not None
+
+def cache_ttl(end_date):
+    """TTL de un rango: los que terminan antes de hoy son inmutables."""
+    if end_date < today():
+        return Config.METRICS_CACHE_HISTORICAL_TTL
+    return Config.METRICS_CACHE_TTL
+
+def calculate_metrics(start_date, end_date):
+    """
+    Calcula todas las métricas para el rango de fechas dado.
+    El resultado se cachea por rango y es compartido: no debe modificarse.
+    """
+    key = (start_date, end_date)
+    if not Config.METRICS_CACHE_ENABLED:
+        annotate(cache='off')
+        return metrics_flight.do(key, lambda: _compute_metrics(start_date, end_date))
+
+    metrics = metrics_cache.get(key)
+    annotate(cache='miss' if metrics is None else 'hit')
+    if metrics is None:
+        metrics = metrics_flight.do(key, lambda: _compute_and_cache(start_date, end_date))
+    return metrics
+
+def refresh_metrics(start_date, end_date):
+    """Recalcula el rango aunque esté en cache y reemplaza la entrada (lo usa el warm-up)."""
+    def compute():
+        metrics = _compute_metrics(start_date, end_date)
+        if Config.METRICS_CACHE_ENABLED and is_cacheable(metrics):
+            metrics_cache.set((start_date, end_date), metrics, ttl=cache_ttl(end_date))
+        return metrics
+    return metrics_flight.do((start_date, end_date), compute)
+
+def _compute_and_cache(start_date, end_date):
+    key = (start_date, end_date)
+    # Otro pedido pudo haberlo calculado mientras esperábamos turno (ya contado como miss)
+    metrics = metrics_cache.peek(key)
+    if metrics is None:
+        metrics = _compute_metrics(start_date, end_date)
+        if is_cacheable(metrics):
+            metrics_cache.set(key, metrics, ttl=cache_ttl(end_date))
+    return metrics
+
+async def calculate_metrics_async(start_date, end_date):
+    """
+    Versión para código asyncio: la consulta corre en un hilo del pool de FETCH_WORKERS
+    y el event loop queda libre mientras tanto.
+    """
+    key = (start_date, end_date)
+    with _pending_lock:
+        future = _pending_fetches.get(key)
+        if future is None:
+            # Los pedidos que esperan turno en el pool también se coalescen, no solo los que ya corren
+            future = _pending_fetches[key] = _fetch_executor.submit(calculate_metrics, start_date, end_date)
+            future.add_done_callback(lambda _: _forget_fetch(key, future))
+    return await asyncio.wrap_future(future)
+
+def _forget_fetch(key, future):
+    with _pending_lock:
+        if _pending_fetches.get(key) is future:
+            del _pending_fetches[key]
+
+_snapshot_reader = None
+
+def load_snapshot_frame(collection, start_date, end_date):
+    """
+    Frame del rango leyendo del snapshot columnar los días hasta su watermark y de Mongo
+    solo los posteriores (todo de Mongo si todavía no hay snapshot).
+    """
+    global _snapshot_reader
+    if _snapshot_reader is None:
+        _snapshot_reader = SnapshotReader(Config.SNAPSHOT_PATH)
+    with span('snapshot_read'):
+        frame, through = _snapshot_reader.read(start_date, end_date)
+    if frame is None:
+        return load_reminders_frame(collection, start_date, end_date)
+    live_start = max(start_date, shift_day(through, 1))
+    if live_start > end_date:
+        return frame
+    return combine_frames(frame, load_reminders_frame(collection, live_start, end_date))
+
+def _record_documents(count):
+    """Recordatorios leídos por el último cálculo (gauge) y acumulados (counter)."""
+    set_gauge('remindme_last_query_documents', count, aggregation=Config.METRICS_AGGREGATION)
+    inc('remindme_documents_total', count, aggregation=Config.METRICS_AGGREGATION)
+    annotate(documents=count)
+
+def _compute_metrics(start_date, end_date):
+    """Calcula las métricas consultando Mongo, sin pasar por el cache."""
+    metrics = _compute_range_metrics(start_date, end_date)
+    if not Config.COHORTS_ENABLED:
+        metrics.update(empty_cohort_metrics())
+        return metrics
+    if not user_index_ready(get_rollup_state_collection()):
+        # Hasta que el warmer (o python cohorts.py) arme el índice; el resultado no se cachea
+        metrics.update(pending_cohort_metrics())
+        return metrics
+    with span('cohorts'):
+        metrics.update(get_cohort_metrics(get_cohorts_collection(), start_date, end_date, metrics['total_users']))
+    return metrics
+
+def _compute_range_metrics(start_date, end_date):
+    """Series, totales y promedios del rango según METRICS_AGGREGATION."""
+    collection = get_reminders_collection()
+    # Eje de días/meses del rango, compartido por todas las series y los promedios
+    axis = date_axis(start_date, end_date)
+    if Config.METRICS_AGGREGATION in ('pandas', 'snapshot'):
+        # load_reminders_frame registra mongo_aggregate y frame_build por separado
+        if Config.METRICS_AGGREGATION == 'snapshot':
+            data = load_snapshot_frame(collection, start_date, end_date)
+        else:
+            data = load_reminders_frame(collection, start_date, end_date)
+        _record_documents(len(data))
+        if data.empty:
+            return _with_latency(empty_metrics(axis), {}, axis)
+        with span('metrics'):
+            # La demora sale de la columna latency del frame, sin otra consulta
+            latency = sketches_from_columns(data['day'].to_numpy(), data['latency'].to_numpy())
+            return _with_latency(build_metrics(compute_series(data, axis), axis), latency, axis)
+
+    if Config.METRICS_AGGREGATION == 'rollup' and rollups_ready(get_rollup_state_collection()):
+        with span('mongo_aggregate'):
+            summary = get_rollup_summary(collection, get_rollup_collection(), start_date, end_date,
+                                         approximate=Config.UNIQUE_USERS_MODE == 'approx')
+    else:
+        # Por defecto la agregación se hace en Mongo y solo viajan los conteos (también en modo
+        # rollup mientras el warmer no terminó de armar los rollups)
+        with span('mongo_aggregate'):
+            if Config.FETCH_PARALLEL_MIN_DAYS and len(axis['days']) >= Config.FETCH_PARALLEL_MIN_DAYS:
+                summary = get_chunked_summary(collection, start_date, end_date)
+            else:
+                summary = get_reminders_summary(collection, start_date, end_date)
+
+    _record_documents(summary['totals'].get('created', 0))
+    if not summary['totals']:
+        return _with_latency(empty_metrics(axis), {}, axis)
+    with span('metrics'):
+        return _with_latency(build_metrics(_series_from_summary(summary, axis), axis), summary['latency'], axis)
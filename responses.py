@@ -0,0 +1,129 @@
+import hashlib
+import logging
+
+import plotly.io as pio
+
+from cache import TTLCache
+from config import Config
+from telemetry import annotate, inc, register_cache
+
+try:
+    import orjson
+except ImportError:  # Sin orjson plotly (y Dash) serializan con json
+    orjson = None
+
+try:
+    from flask_compress import Compress
+except ImportError:  # Solo se necesita con COMPRESS_ENABLED
+    Compress = None
+
+logger = logging.getLogger(__name__)
+
+# Respuestas a las que se les calcula ETag (las de Dash: layout, dependencias y callbacks)
+ETAG_MIMETYPES = ('application/json',)
+# Segundos que se guarda un cuerpo comprimido
+COMPRESSED_TTL = 24 * 60 * 60
+
+
+def configure_json():
+    """
+    Motor JSON de plotly según Config.JSON_ENGINE. Dash serializa las respuestas de los
+    callbacks con plotly, así que aplica también a las figuras. Retorna el motor usado.
+    """
+    engine = Config.JSON_ENGINE
+    if engine == 'orjson' and orjson is None:
+        raise ImportError("JSON_ENGINE=orjson requiere el paquete orjson (pip install orjson)")
+    pio.json.config.default_engine = engine
+    return engine if engine != 'auto' else ('orjson' if orjson is not None else 'json')
+
+
+def body_etag(body):
+    """ETag débil del contenido: es el mismo con o sin compresión."""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def _etag_matches(etag, header):
+    """Comparación débil contra If-None-Match (lista de ETags o *)."""
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.removeprefix('W/').strip('"') == etag:
+            return True
+    return False
+
+
+def install(server):
+    """
+    Respuestas más livianas para la app Flask de Dash:
+    - motor JSON rápido (orjson) para serializar figuras,
+    - ETag por contenido en las respuestas JSON y 304 si el cliente ya las tiene (solo GET/HEAD)
+      (el mismo rango y vista producen la misma respuesta),
+    - compresión br/gzip (Flask-Compress), con los cuerpos comprimidos guardados por ETag.
+    Debe llamarse después de telemetry.install, para que el log vea los bytes enviados.
+    """
+    from flask import request
+
+    engine = configure_json()
+
+    if Config.COMPRESS_ENABLED:
+        if Compress is None:
+            raise ImportError("COMPRESS_ENABLED requiere el paquete Flask-Compress (pip install Flask-Compress)")
+        # La clave es el hash del contenido: las entradas no quedan obsoletas, solo se acota la memoria
+        compressed = TTLCache(COMPRESSED_TTL, Config.COMPRESS_CACHE_ENTRIES, Config.COMPRESS_CACHE_MAX_BYTES)
+        register_cache('compressed_responses', compressed)
+        server.config.update(
+            COMPRESS_ALGORITHM=Config.COMPRESS_ALGORITHMS,
+            COMPRESS_LEVEL=Config.COMPRESS_GZIP_LEVEL,
+            COMPRESS_BR_LEVEL=Config.COMPRESS_BR_LEVEL,
+            COMPRESS_MIN_SIZE=Config.COMPRESS_MIN_SIZE,
+            # Solo se guardan las respuestas con ETag: misma clave, mismo contenido
+            COMPRESS_CACHE_KEY=lambda request: request.environ.get('responses.etag') or None,
+            COMPRESS_CACHE_BACKEND=lambda: _EtagCache(compressed)
+        )
+        Compress(server)
+
+    # Se registra después de Compress: Flask ejecuta los after_request en orden inverso,
+    # así el ETag se calcula (y el 304 se decide) antes de comprimir
+    @server.after_request
+    def conditional_response(response):
+        if response.status_code != 200 or response.direct_passthrough or response.is_streamed:
+            return response
+        etag, _ = response.get_etag()
+        if response.mimetype in ETAG_MIMETYPES:
+            body = response.get_data()
+            annotate(json_bytes=len(body))
+            if not etag:
+                etag = body_etag(body)
+                response.set_etag(etag, weak=True)
+            # En los callbacks (POST) el ETag es solo informativo: 304 solo vale para GET/HEAD
+            # (RFC 9110) y los navegadores no revalidan POST
+            if request.method in ('GET', 'HEAD'):
+                # Layout y dependencias: el navegador revalida en cada carga
+                response.headers.setdefault('Cache-Control', 'no-cache')
+                if _etag_matches(etag, request.headers.get('If-None-Match', '')):
+                    inc('remindme_not_modified_total')
+                    annotate(etag='match')
+                    response.status_code = 304
+                    response.set_data(b'')
+                    return response
+        # Clave del cuerpo comprimido (JSON y respuestas que ya traen ETag; sin ETag no se guarda)
+        request.environ['responses.etag'] = etag
+        return response
+
+    logger.info("Respuestas: JSON con %s, compresión %s", engine,
+                ','.join(Config.COMPRESS_ALGORITHMS) if Config.COMPRESS_ENABLED else 'desactivada')
+
+
+class _EtagCache:
+    """Backend de cache de Flask-Compress sobre TTLCache; no guarda respuestas sin ETag."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def get(self, key):
+        if key.endswith(';None'):
+            return None
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        if not key.endswith(';None'):
+            self.cache.set(key, value)
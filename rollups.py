@@ -0,0 +1,315 @@
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReplaceOne, DeleteOne
+from config import Config
+from database import get_reminders_collection, get_rollup_collection, get_rollup_state_collection
+from dates import day_bucket, day_spans, range_stages, shift_day, timestamp_stage, today
+from ddsketch import DDSketch
+from hll import HyperLogLog, precision_for_error
+from latency import get_latency_sketches, new_sketch
+
+# Documento de estado (watermarks) en la colección de estado
+ROLLUP_STATE_ID = 'daily'
+# Formato de los documentos de rollup; si el estado guardado es de otro, se reconstruyen todos
+ROLLUP_VERSION = 4
+# Los ObjectId de clientes distintos no se generan en orden estricto: el watermark de
+# inserciones se vuelve a leer con este margen (recalcular un día de más no cambia nada)
+INSERT_WATERMARK_MARGIN = timedelta(minutes=5)
+# sentAt puede estar guardado como string ISO o como fecha BSON, y Mongo solo compara
+# valores del mismo tipo: cada tipo lleva su propio watermark
+WATERMARK_TYPES = ('string', 'date')
+# Rango de los strings que cuentan para el watermark: los que empiezan con un dígito (fechas
+# ISO). Un valor mal formado ('pendiente', ...) ordena después y taparía a todos los demás
+ISO_STRING_BOUNDS = {"$gte": "0", "$lt": ":"}
+
+
+def rollup_pipeline(spans):
+    """
+    Agrega por día de date_time (en la zona de reporte) los tramos de días dados:
+    recordatorios creados, enviados y usuarios distintos. La demora de envío se cuenta
+    aparte, por (día, bucket), en get_latency_sketches.
+    """
+    return range_stages(spans) + [
+        {"$project": {
+            "user_id": 1,
+            "day": day_bucket(),
+            "sent": {"$cond": [{"$eq": [{"$ifNull": ["$status", "not_sent"]}, "sent"]}, 1, 0]},
+            "_id": 0
+        }},
+        {"$group": {
+            "_id": "$day",
+            "created": {"$sum": 1},
+            "sent": {"$sum": "$sent"},
+            "users": {"$addToSet": "$user_id"}
+        }},
+        # Sin user_id (null o faltante) no es un usuario
+        {"$addFields": {"users": {"$filter": {"input": "$users", "cond": {"$ne": ["$$this", None]}}}}},
+        {"$sort": {"_id": 1}}
+    ]
+
+
+def _with_sketch(rollup):
+    """Agrega al rollup el sketch HyperLogLog de sus usuarios."""
+    sketch = HyperLogLog.from_values(rollup['users'], precision_for_error(Config.HLL_ERROR))
+    rollup['users_hll'] = sketch.to_bytes()
+    return rollup
+
+
+def _compute_rollups(collection, spans, sketches=True):
+    """Rollups por día de los tramos dados, con el sketch serializado de la demora de cada uno."""
+    rows = collection.aggregate(rollup_pipeline(spans), allowDiskUse=True)
+    rollups = [_with_sketch(doc) if sketches else doc for doc in rows]
+    latency = get_latency_sketches(collection, spans) if rollups else {}
+    for rollup in rollups:
+        rollup['latency'] = latency.get(rollup['_id'], new_sketch()).to_bytes()
+    return rollups
+
+
+def compute_daily_rollups(collection, days):
+    """Recalcula desde la colección cruda los rollups de los días dados (yyyy-mm-dd)."""
+    if not days:
+        return []
+    return _compute_rollups(collection, day_spans(days))
+
+
+def compute_range_rollups(collection, start_date, end_date, sketches=True):
+    """Rollups por día calculados en vivo para el rango dado (sin users_hll si sketches=False)."""
+    return _compute_rollups(collection, [(start_date, end_date)], sketches)
+
+
+def latest_value(collection, field, bson_type='string'):
+    """Mayor valor de un campo entre los de tipo BSON bson_type, o None."""
+    query = dict(ISO_STRING_BOUNDS) if bson_type == 'string' else {"$type": bson_type}
+    doc = collection.find_one({field: query}, {field: 1, "_id": 0}, sort=[(field, -1)])
+    return doc[field] if doc else None
+
+
+def latest_values(collection, field):
+    """Watermarks de un campo: su mayor valor de cada tipo de WATERMARK_TYPES (None si no hay)."""
+    return {bson_type: latest_value(collection, field, bson_type) for bson_type in WATERMARK_TYPES}
+
+
+def as_watermarks(value):
+    """Watermarks por tipo guardados; un valor suelto (formato anterior, solo strings) es el de 'string'."""
+    if isinstance(value, dict):
+        return {bson_type: value.get(bson_type) for bson_type in WATERMARK_TYPES}
+    return {'string': value, 'date': None}
+
+
+def since_watermarks(field, watermarks, operator='$gte'):
+    """
+    Filtro por tipo {tipo: filtro} de los documentos con field posterior al watermark de
+    su tipo. De un tipo sin watermark (no había ninguno) entran todos.
+    """
+    filters = {}
+    for bson_type, value in as_watermarks(watermarks).items():
+        if bson_type == 'string':
+            query = dict(ISO_STRING_BOUNDS)
+            if value is not None:
+                # El watermark ya es una fecha ISO: reemplaza la cota de abajo
+                del query["$gte"]
+                query[operator] = value
+        else:
+            query = {"$type": bson_type} if value is None else {operator: value}
+        filters[bson_type] = {field: query}
+    return filters
+
+
+def watermarks_before(watermarks, margin=INSERT_WATERMARK_MARGIN):
+    """
+    Watermarks por tipo retrocedidos margin. Un string ISO se retrocede como fecha (y queda
+    con la misma zona); uno que no se puede leer como fecha se deja igual.
+    """
+    floors = {}
+    for bson_type, value in as_watermarks(watermarks).items():
+        if value is not None and bson_type == 'string':
+            try:
+                value = (datetime.fromisoformat(value) - margin).isoformat(timespec='milliseconds')
+            except ValueError:
+                pass
+        elif value is not None:
+            value = value - margin
+        floors[bson_type] = value
+    return floors
+
+
+def latest_id(collection):
+    """Mayor _id de la colección (el último insertado, si son ObjectId), o None."""
+    doc = collection.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+    return doc['_id'] if doc else None
+
+
+def inserted_since(last_id):
+    """
+    Filtro de los recordatorios insertados desde el watermark last_id. date_time es la hora
+    programada, no la de creación: un recordatorio nuevo puede tener un date_time viejo,
+    así que las inserciones se siguen por _id.
+    """
+    if isinstance(last_id, ObjectId):
+        return {"_id": {"$gte": ObjectId.from_datetime(last_id.generation_time - INSERT_WATERMARK_MARGIN)}}
+    return {"_id": {"$gt": last_id}}
+
+
+def changed_days(collection, state):
+    """
+    Días con recordatorios insertados o enviados después de los watermarks guardados
+    (state con last_id y los watermarks de sentAt por tipo, o None para todos los días).
+    """
+    if state is None or state.get('last_id') is None:
+        # Primera corrida: se reconstruyen todos los días
+        match = {}
+    else:
+        clauses = [inserted_since(state['last_id'])]
+        clauses += since_watermarks('sentAt', state.get('sentAt')).values()
+        match = {"$or": clauses}
+    pipeline = [
+        {"$match": match},
+        timestamp_stage(),
+        {"$group": {"_id": day_bucket()}}
+    ]
+    # Sin día: date_time que no es una fecha (no entra en ningún rango)
+    return [doc['_id'] for doc in collection.aggregate(pipeline) if doc['_id'] is not None]
+
+
+def _is_current(state):
+    """
+    Si el estado es de rollups ya armados con el formato actual. Los guardados con otro
+    formato (por ejemplo sin latency), o con sketches de demora de otra precisión, no se
+    pueden unir con los nuevos.
+    """
+    return (state is not None and state.get('version') == ROLLUP_VERSION
+            and state.get('latency_accuracy') == Config.LATENCY_SKETCH_ACCURACY)
+
+
+def rollups_ready(state_collection):
+    """Si ya hay rollups que se pueden leer (los arma refresh_rollups)."""
+    return _is_current(state_collection.find_one({"_id": ROLLUP_STATE_ID}, {"version": 1, "latency_accuracy": 1}))
+
+
+def refresh_rollups(collection, rollup_collection, state_collection):
+    """
+    Actualiza la colección de rollups diarios recalculando solo los días que cambiaron
+    desde la última corrida, según los watermarks de _id (inserciones) y sentAt (envíos).
+    Retorna la lista de días recalculados.
+    """
+    state = state_collection.find_one({"_id": ROLLUP_STATE_ID})
+    if not _is_current(state):
+        state = None
+
+    # Los watermarks se leen antes de recalcular: lo que llegue mientras tanto
+    # queda por encima de ellos y se recalcula en la próxima corrida
+    last_id = latest_id(collection)
+    latest_sent_at = latest_values(collection, 'sentAt')
+    if last_id is None:
+        return []
+
+    days = sorted(changed_days(collection, state))
+    rollups = compute_daily_rollups(collection, days)
+
+    requests = [ReplaceOne({"_id": doc['_id']}, doc, upsert=True) for doc in rollups]
+    # Días que quedaron sin recordatorios
+    found = {doc['_id'] for doc in rollups}
+    requests += [DeleteOne({"_id": day}) for day in days if day not in found]
+    if requests:
+        rollup_collection.bulk_write(requests, ordered=False)
+
+    state_collection.replace_one(
+        {"_id": ROLLUP_STATE_ID},
+        {"_id": ROLLUP_STATE_ID,
+         "version": ROLLUP_VERSION,
+         "latency_accuracy": Config.LATENCY_SKETCH_ACCURACY,
+         "last_id": last_id,
+         "sentAt": latest_sent_at,
+         "updated_at": datetime.utcnow()},
+        upsert=True
+    )
+    return days
+
+
+def get_rollup_summary(collection, rollup_collection, start_date, end_date, approximate=False):
+    """
+    Arma el resumen del rango (misma forma que metrics.get_reminders_summary) a partir
+    de los rollups guardados para los días anteriores a hoy y una consulta en vivo
+    desde hoy hasta end_date.
+    Con approximate=True los usuarios distintos salen de los sketches HyperLogLog
+    y no se leen las listas de usuarios.
+    """
+    current_day = today()
+    projection = {"users": 0} if approximate else {"users_hll": 0}
+    rows = []
+    if start_date < current_day:
+        last_stored_day = min(end_date, shift_day(current_day, -1))
+        query = {"_id": {"$gte": start_date, "$lte": last_stored_day}}
+        rows += list(rollup_collection.find(query, projection).sort("_id", 1))
+    if end_date >= current_day:
+        rows += compute_range_rollups(collection, max(start_date, current_day), end_date)
+    if approximate:
+        return summarize_sketches(rows)
+    return summarize_rollups(rows)
+
+
+def summarize_sketches(rows):
+    """Como summarize_rollups, pero uniendo los sketches HyperLogLog de cada día."""
+    daily = []
+    latency = {}
+    monthly = {}
+    total_sketch = None
+    created = sent = 0
+    for row in rows:
+        sketch = HyperLogLog.from_bytes(row['users_hll'])
+        daily.append({"_id": row['_id'], "users": sketch.count(), "created": row['created'], "sent": row['sent']})
+        month = monthly.get(row['_id'][:7])
+        if month is None:
+            month = monthly[row['_id'][:7]] = {"users": HyperLogLog(sketch.p), "created": 0, "sent": 0}
+        month['users'].merge(sketch)
+        month['created'] += row['created']
+        month['sent'] += row['sent']
+        total_sketch = HyperLogLog(sketch.p).merge(sketch) if total_sketch is None else total_sketch.merge(sketch)
+        latency[row['_id']] = DDSketch.from_bytes(row['latency'])
+        created += row['created']
+        sent += row['sent']
+
+    return {
+        "daily": daily,
+        "monthly": [{"_id": key, "users": month['users'].count(), "created": month['created'], "sent": month['sent']}
+                    for key, month in sorted(monthly.items())],
+        "totals": {"users": total_sketch.count(), "created": created, "sent": sent} if daily else {},
+        "latency": latency
+    }
+
+
+def summarize_rollups(rows):
+    """
+    Combina rollups diarios (ordenados por día) en series diarias, mensuales y totales,
+    y el sketch de la demora de envío de cada día en latency.
+    """
+    daily = []
+    latency = {}
+    monthly = {}
+    all_users = set()
+    created = sent = 0
+    for row in rows:
+        users = set(row['users'])
+        daily.append({"_id": row['_id'], "users": len(users), "created": row['created'], "sent": row['sent']})
+        month = monthly.setdefault(row['_id'][:7], {"users": set(), "created": 0, "sent": 0})
+        month['users'] |= users
+        month['created'] += row['created']
+        month['sent'] += row['sent']
+        all_users |= users
+        latency[row['_id']] = DDSketch.from_bytes(row['latency'])
+        created += row['created']
+        sent += row['sent']
+
+    return {
+        "daily": daily,
+        "monthly": [{"_id": key, "users": len(month['users']), "created": month['created'], "sent": month['sent']}
+                    for key, month in sorted(monthly.items())],
+        "totals": {"users": len(all_users), "created": created, "sent": sent} if daily else {},
+        "latency": latency
+    }
+
+
+if __name__ == '__main__':
+    # Pensado para correr periódicamente (cron / scheduler)
+    refreshed = refresh_rollups(get_reminders_collection(), get_rollup_collection(), get_rollup_state_collection())
+    print(f"Rollups actualizados: {len(refreshed)} días")
@@ -0,0 +1,289 @@
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from bson import json_util
+
+from config import Config
+from database import get_reminders_collection
+from dates import shift_day, today
+from latency import NO_LATENCY
+from rollups import changed_days, latest_id, latest_values
+
+try:
+    import pyarrow as pa
+except ImportError:  # Solo se necesita con METRICS_AGGREGATION=snapshot o para exportar
+    pa = None
+
+MANIFEST = 'manifest.json'
+USERS_FILE = 'users.arrow'
+
+# Esquema de cada partición mensual: mismas columnas que load_reminders_frame, con user_id
+# como código en users.arrow e is_sent como uint8 para poder leerlos sin copiar
+PARTITION_COLUMNS = ('user', 'day', 'month', 'is_sent', 'latency')
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Los snapshots requieren el paquete pyarrow (pip install pyarrow)")
+
+
+def _partition_file(month):
+    return f'reminders-{month}.arrow'
+
+
+def _month_span(month, through):
+    """Primer y último día (yyyy-mm-dd) del mes yyyy-mm, sin pasar de through."""
+    start = f'{month}-01'
+    next_month = (np.datetime64(month, 'M') + 1).astype('datetime64[D]')
+    end = str(next_month - 1)
+    return start, min(end, through)
+
+
+def _months_between(start_date, end_date):
+    months = np.arange(np.datetime64(start_date[:7], 'M'), np.datetime64(end_date[:7], 'M') + 1)
+    return [str(month) for month in months]
+
+
+def _write_atomic(path, write):
+    """Escribe con write(tmp) y reemplaza path; los lectores con el archivo mapeado no se ven afectados."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def _write_table(path, table):
+    def write(tmp):
+        with pa.OSFile(tmp, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            # Un solo record batch por archivo: cada columna se lee como un único arreglo
+            writer.write_table(table, max_chunksize=max(table.num_rows, 1))
+    _write_atomic(path, write)
+
+
+def read_manifest(path):
+    # JSON extendido de BSON: el watermark last_id es un ObjectId
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            return json_util.loads(f.read())
+    except FileNotFoundError:
+        return None
+
+
+def _read_users(path):
+    users_path = os.path.join(path, USERS_FILE)
+    if not os.path.exists(users_path):
+        return []
+    with pa.memory_map(users_path) as source:
+        return pa.ipc.open_file(source).read_all().column('user_id').to_pylist()
+
+
+def _write_users(path, user_codes):
+    users = sorted(user_codes, key=user_codes.get)
+    _write_table(os.path.join(path, USERS_FILE), pa.table({'user_id': pa.array(users, type=pa.string())}))
+
+
+def export_snapshot(collection, path):
+    """
+    Exporta (o actualiza) el snapshot columnar en path: una partición Arrow IPC por mes con
+    los días anteriores a hoy. Solo se reescriben los meses con recordatorios creados o
+    enviados después de los watermarks de la corrida anterior (igual que refresh_rollups),
+    además de los días que pasaron a estar completos desde entonces.
+    Retorna la lista de meses reescritos.
+    """
+    # Import acá: metrics importa este módulo para leer el snapshot
+    from metrics import load_reminders_frame
+
+    _require_pyarrow()
+    os.makedirs(path, exist_ok=True)
+    manifest = read_manifest(path)
+    last_id = latest_id(collection)
+    latest_sent_at = latest_values(collection, 'sentAt')
+    if last_id is None:
+        return []
+
+    # Los días anteriores a hoy se consideran completos; desde hoy se consulta en vivo
+    through = shift_day(today(), -1)
+    if manifest is None:
+        days = changed_days(collection, None)
+        first_day = min(days) if days else through
+    else:
+        # Un manifest sin last_id o sin latency_accuracy (formato anterior), o con buckets de
+        # demora de otra precisión, reescribe todos los meses
+        state = {"last_id": manifest.get('last_id'), "sentAt": manifest['sentAt']}
+        if manifest.get('latency_accuracy') != Config.LATENCY_SKETCH_ACCURACY:
+            state = None
+        days = changed_days(collection, state)
+        first_day = shift_day(manifest['through'], 1)
+    months = {day[:7] for day in days if day <= through}
+    if first_day <= through:
+        months.update(_months_between(first_day, through))
+
+    users = _read_users(path)
+    user_codes = {user_id: code for code, user_id in enumerate(users)}
+    partitions = dict(manifest['partitions']) if manifest else {}
+    # users.arrow solo crece (los códigos no cambian) y se escribe antes que las particiones
+    # que lo usan: un lector que abre una partición y después users.arrow tiene todos sus usuarios
+    for month in sorted(months):
+        start_date, end_date = _month_span(month, through)
+        frame = load_reminders_frame(collection, start_date, end_date)
+        # Filas ordenadas por día: al leer, los días de un rango son un tramo contiguo
+        order = np.argsort(frame['day'].to_numpy(), kind='stable')
+        categories = frame['user_id'].cat.categories
+        # Códigos globales (estables entre corridas): los usuarios nuevos van al final.
+        # users.arrow es de strings: un user_id numérico se guarda como su str
+        known = len(user_codes)
+        mapping = np.array([user_codes.setdefault(str(user_id), len(user_codes)) for user_id in categories]
+                           + [-1], dtype=np.int32)
+        if len(user_codes) > known:
+            _write_users(path, user_codes)
+        table = pa.table({
+            'user': mapping[frame['user_id'].array.codes[order]],
+            'day': frame['day'].to_numpy()[order],
+            'month': frame['month'].to_numpy()[order],
+            'is_sent': frame['is_sent'].to_numpy().view(np.uint8)[order],
+            'latency': frame['latency'].to_numpy()[order]
+        })
+        _write_table(os.path.join(path, _partition_file(month)), table)
+        partitions[month] = _partition_file(month)
+
+    # El manifest se escribe al final: un lector nunca ve un watermark sin sus particiones
+    manifest = {
+        "through": through,
+        "last_id": last_id,
+        "sentAt": latest_sent_at,
+        "latency_accuracy": Config.LATENCY_SKETCH_ACCURACY,
+        "partitions": partitions,
+        "users": len(user_codes),
+        "updated_at": datetime.utcnow().isoformat()
+    }
+    def write_manifest(tmp):
+        with open(tmp, 'w') as f:
+            f.write(json_util.dumps(manifest, indent=2))
+    _write_atomic(os.path.join(path, MANIFEST), write_manifest)
+    return sorted(months)
+
+
+class SnapshotReader:
+    """
+    Lee el snapshot memory-mapped. Todas las particiones y la lista de usuarios se abren
+    (memory-mapped, sin leerlas) y se validan juntas al cargar cada versión del manifest;
+    los arreglos de una sola partición no se copian.
+    """
+
+    def __init__(self, path):
+        _require_pyarrow()
+        self.path = path
+        self._lock = threading.Lock()
+        self._version = None
+        self._manifest = None
+        self._categories = None
+        self._partitions = {}
+
+    def _refresh(self):
+        try:
+            version = os.stat(os.path.join(self.path, MANIFEST)).st_mtime_ns
+        except FileNotFoundError:
+            version = None
+        if version == self._version:
+            return
+        manifest = read_manifest(self.path)
+        partitions, categories = {}, None
+        if manifest is not None:
+            partitions = {month: self._open(file) for month, file in manifest['partitions'].items()}
+            # users.arrow después de las particiones: la exportación lo escribe antes que ellas
+            categories = pd.Index(_read_users(self.path), dtype=object)
+            for month, table in partitions.items():
+                if table.num_rows and table.column('user').chunk(0).to_numpy().max() >= len(categories):
+                    raise ValueError(f"Snapshot inconsistente en {self.path}: la partición {month} "
+                                     f"tiene usuarios que no están en {USERS_FILE}")
+        self._manifest, self._categories, self._partitions = manifest, categories, partitions
+        self._version = version
+
+    def manifest(self):
+        with self._lock:
+            self._refresh()
+            return self._manifest
+
+    def _open(self, file):
+        return pa.ipc.open_file(pa.memory_map(os.path.join(self.path, file))).read_all()
+
+    def read(self, start_date, end_date):
+        """
+        Frame (mismo esquema que load_reminders_frame) con los días del rango que cubre el
+        snapshot; solo se leen las particiones de los meses del rango.
+        Retorna (frame, through) o (None, None) si no hay snapshot.
+        """
+        with self._lock:
+            self._refresh()
+            if self._manifest is None:
+                return None, None
+            through = self._manifest['through']
+            last_day = min(end_date, through)
+            months = [month for month in _months_between(start_date, last_day)
+                      if month in self._manifest['partitions']] if start_date <= last_day else []
+            tables = [self._partitions[month] for month in months]
+            categories = self._categories
+            # Hasta que se vuelva a exportar, un snapshot con buckets de otra precisión no tiene demora
+            latency = self._manifest.get('latency_accuracy') == Config.LATENCY_SKETCH_ACCURACY
+
+        # Rango en días desde 1970-01-01, para recortar los meses de los bordes
+        low = (np.datetime64(start_date, 'D') - np.datetime64(0, 'D')).astype(np.int64)
+        high = (np.datetime64(last_day, 'D') - np.datetime64(0, 'D')).astype(np.int64)
+        parts = []
+        for table in tables:
+            if not table.num_rows:
+                continue
+            arrays = {name: table.column(name).chunk(0).to_numpy() for name in PARTITION_COLUMNS
+                      if name != 'latency' or latency}
+            if not latency:
+                arrays['latency'] = np.full(table.num_rows, NO_LATENCY, dtype=np.int32)
+            # Filas ordenadas por día: el recorte es un slice, sin copia
+            first, last = np.searchsorted(arrays['day'], [low, high + 1])
+            if last > first:
+                parts.append({name: values[first:last] for name, values in arrays.items()})
+
+        columns = {}
+        for name in PARTITION_COLUMNS:
+            if len(parts) == 1:
+                columns[name] = parts[0][name]
+            else:
+                dtype = np.uint8 if name == 'is_sent' else np.int32
+                columns[name] = np.concatenate([part[name] for part in parts]) if parts else np.empty(0, dtype=dtype)
+            columns[name].flags.writeable = False
+        user_ids = pd.Categorical.from_codes(columns.pop('user'), dtype=pd.CategoricalDtype(categories),
+                                             validate=False)
+        columns['is_sent'] = columns['is_sent'].view(np.bool_)
+        return pd.DataFrame({"user_id": user_ids, **columns}, copy=False), through
+
+
+def combine_frames(snapshot_frame, live_frame):
+    """Une el frame del snapshot con uno leído en vivo, con los códigos de usuario del snapshot."""
+    if live_frame.empty:
+        return snapshot_frame
+    categories = snapshot_frame['user_id'].cat.categories
+    # El snapshot guarda los user_id como str
+    live_categories = live_frame['user_id'].cat.categories.astype(str)
+    positions = categories.get_indexer(live_categories)
+    new_users = live_categories[positions < 0]
+    # Usuarios que todavía no están en el snapshot: códigos nuevos al final
+    positions[positions < 0] = np.arange(len(categories), len(categories) + len(new_users))
+    mapping = np.append(positions, -1).astype(np.int32)
+    codes = np.concatenate([snapshot_frame['user_id'].array.codes, mapping[live_frame['user_id'].array.codes]])
+    user_ids = pd.Categorical.from_codes(codes, categories=categories.append(new_users), validate=False)
+    columns = {name: np.concatenate([snapshot_frame[name].to_numpy(), live_frame[name].to_numpy()])
+               for name in ('day', 'month', 'is_sent', 'latency')}
+    return pd.DataFrame({"user_id": user_ids, **columns}, copy=False)
+
+
+if __name__ == '__main__':
+    # Pensado para correr periódicamente (cron / scheduler), igual que rollups.py
+    exported = export_snapshot(get_reminders_collection(), Config.SNAPSHOT_PATH)
+    print(f"Snapshot actualizado en {Config.SNAPSHOT_PATH}: {len(exported)} meses reescritos")
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+
+from cache import TTLCache
+from config import Config
+
+try:
+    import redis
+except ImportError:  # Solo se necesita con RESULT_STORE=redis
+    redis = None
+
+
+def result_key(start_date, end_date):
+    """Clave corta con la que los callbacks se pasan un resultado (es lo único que viaja al navegador)."""
+    return f"metrics:{start_date}:{end_date}"
+
+
+def parse_result_key(key):
+    """Rango (start_date, end_date) de una clave de result_key."""
+    _, start_date, end_date = key.split(':')
+    return start_date, end_date
+
+
+class MemoryStore:
+    """Resultados en memoria del proceso."""
+
+    def __init__(self, ttl, max_entries=64):
+        self._cache = TTLCache(ttl=ttl, max_entries=max_entries, max_bytes=0)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value, ttl=None):
+        self._cache.set(key, value, ttl=ttl)
+
+
+class FileStore:
+    """
+    Resultados serializados en un directorio compartido por los workers de la máquina.
+    Cada archivo lleva su vencimiento como fecha de modificación: set borra los vencidos
+    (de cualquier clave) y, como MemoryStore, deja a lo más max_entries.
+    """
+
+    def __init__(self, path, ttl, max_entries=64):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, hashlib.sha1(key.encode()).hexdigest() + '.pkl')
+
+    def get(self, key):
+        filename = self._file(key)
+        try:
+            with open(filename, 'rb') as f:
+                expires_at, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires_at <= time.time():
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+            return None
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        # Escritura atómica: otro worker nunca lee un archivo a medio escribir
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((expires_at, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.utime(tmp, (expires_at, expires_at))
+            os.replace(tmp, self._file(key))
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self._sweep()
+
+    def _sweep(self):
+        """Borra los archivos vencidos y, si siguen sobrando, los que vencen primero."""
+        now = time.time()
+        entries = []
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if not entry.name.endswith('.pkl'):
+                    continue
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:  # Otro worker lo borró
+                    pass
+        entries.sort()
+        expired = sum(1 for expires_at, _ in entries if expires_at <= now)
+        for _, filename in entries[:max(expired, len(entries) - self.max_entries)]:
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+
+
+class RedisStore:
+    """Resultados en Redis (o cualquier servidor compatible) compartidos entre máquinas."""
+
+    def __init__(self, url=None, ttl=300, client=None, prefix='remindme-dash:'):
+        if client is None:
+            if redis is None:
+                raise ImportError("RESULT_STORE=redis requiere el paquete redis (pip install redis)")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        data = self.client.get(self.prefix + key)
+        return pickle.loads(data) if data is not None else None
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self.client.set(self.prefix + key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=max(int(ttl), 1))
+
+
+def create_result_store():
+    """Store configurado en Config.RESULT_STORE: 'memory', 'file' o 'redis'."""
+    backend = Config.RESULT_STORE
+    if backend == 'file':
+        return FileStore(Config.RESULT_STORE_PATH, Config.RESULT_STORE_TTL)
+    if backend == 'redis':
+        return RedisStore(Config.RESULT_STORE_URL, Config.RESULT_STORE_TTL)
+    return MemoryStore(Config.RESULT_STORE_TTL)
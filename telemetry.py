@@ -0,0 +1,197 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+from contextlib import nullcontext
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Límites (segundos) de los buckets del histograma de etapas
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_histograms = {}  # etapa -> [conteo por bucket..., +Inf, suma]
+_counters = {}  # (nombre, labels) -> valor
+_gauges = {}  # (nombre, labels) -> valor
+_collectors = []  # funciones que retornan muestras (nombre, tipo, labels, valor) al exportar
+
+# Etapas y campos del request en curso (para la línea de log por request)
+_request = contextvars.ContextVar('telemetry_request', default=None)
+
+_NOOP = nullcontext()
+
+
+class _Span:
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+def span(stage):
+    """Mide el bloque como una etapa: `with span('mongo_aggregate'): ...`."""
+    if not Config.TELEMETRY_ENABLED:
+        return _NOOP
+    return _Span(stage)
+
+
+def record(stage, seconds):
+    """Agrega una duración ya medida a la etapa (histograma global y request en curso)."""
+    if not Config.TELEMETRY_ENABLED:
+        return
+    with _lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for i, limit in enumerate(BUCKETS):
+            if seconds <= limit:
+                histogram[i] += 1
+        histogram[len(BUCKETS)] += 1
+        histogram[-1] += seconds
+    current = _request.get()
+    if current is not None:
+        stages = current['stages']
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+def inc(name, value=1, **labels):
+    if not Config.TELEMETRY_ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    if not Config.TELEMETRY_ENABLED:
+        return
+    with _lock:
+        _gauges[(name, tuple(sorted(labels.items())))] = value
+
+
+def annotate(**fields):
+    """Campos extra para la línea de log del request en curso (por ejemplo cache=hit)."""
+    current = _request.get()
+    if current is not None:
+        current['fields'].update(fields)
+
+
+def register_collector(collector):
+    """collector() se llama al exportar y retorna muestras (nombre, tipo, labels, valor)."""
+    _collectors.append(collector)
+    return collector
+
+
+def register_cache(name, cache):
+    """Exporta hits/misses/desalojos/entradas/bytes de un TTLCache."""
+    def collect():
+        stats = cache.stats()
+        labels = {'cache': name}
+        return [
+            ('remindme_cache_hits_total', 'counter', labels, stats['hits']),
+            ('remindme_cache_misses_total', 'counter', labels, stats['misses']),
+            ('remindme_cache_evictions_total', 'counter', labels, stats['evictions']),
+            ('remindme_cache_entries', 'gauge', labels, stats['entries']),
+            ('remindme_cache_bytes', 'gauge', labels, stats['bytes'])
+        ]
+    return register_collector(collect)
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{key}="{str(value)}"' for key, value in labels)
+    return '{' + pairs + '}'
+
+
+def render():
+    """Todas las métricas en formato de texto de Prometheus."""
+    with _lock:
+        histograms = {stage: list(values) for stage, values in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    lines = []
+    if histograms:
+        lines += ['# HELP remindme_stage_seconds Duración de cada etapa del cálculo del dashboard',
+                  '# TYPE remindme_stage_seconds histogram']
+        for stage, values in sorted(histograms.items()):
+            for limit, count in zip(BUCKETS, values):
+                lines.append(f'remindme_stage_seconds_bucket{{stage="{stage}",le="{limit}"}} {count}')
+            lines.append(f'remindme_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {values[len(BUCKETS)]}')
+            lines.append(f'remindme_stage_seconds_count{{stage="{stage}"}} {values[len(BUCKETS)]}')
+            lines.append(f'remindme_stage_seconds_sum{{stage="{stage}"}} {values[-1]:.6f}')
+
+    samples = [(name, 'counter', labels, value) for (name, labels), value in counters.items()]
+    samples += [(name, 'gauge', labels, value) for (name, labels), value in gauges.items()]
+    for collector in _collectors:
+        samples += [(name, kind, tuple(sorted(labels.items())), value) for name, kind, labels, value in collector()]
+
+    declared = set()
+    for name, kind, labels, value in sorted(samples, key=lambda sample: (sample[0], sample[2])):
+        if name not in declared:
+            lines.append(f'# TYPE {name} {kind}')
+            declared.add(name)
+        lines.append(f'{name}{_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def install(server):
+    """
+    Monta el endpoint Config.TELEMETRY_PATH en la app Flask y registra una línea de log
+    JSON por callback de Dash con el desglose de etapas. No hace nada si TELEMETRY_ENABLED
+    está desactivado.
+    """
+    if not Config.TELEMETRY_ENABLED:
+        return
+    from flask import Response, request
+
+    @server.route(Config.TELEMETRY_PATH)
+    def prometheus_metrics():
+        return Response(render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+    @server.before_request
+    def start_request():
+        request.environ['telemetry.token'] = _request.set({'stages': {}, 'fields': {}})
+        request.environ['telemetry.started'] = time.perf_counter()
+
+    @server.after_request
+    def log_request(response):
+        token = request.environ.pop('telemetry.token', None)
+        if token is None:
+            return response
+        current = _request.get()
+        _request.reset(token)
+        elapsed = time.perf_counter() - request.environ['telemetry.started']
+        if request.path.endswith('_dash-update-component'):
+            record('request', elapsed)
+            inc('remindme_response_bytes_total', response.content_length or 0,
+                encoding=response.headers.get('Content-Encoding', 'identity'))
+            stages = current['stages']
+            # El primer output identifica al callback
+            output = ((request.get_json(silent=True) or {}).get('output') or '').strip('.').split('...')[0]
+            logger.info(json.dumps({
+                'event': 'callback',
+                'output': output,
+                'status': response.status_code,
+                'duration_ms': round(elapsed * 1000, 2),
+                'stages_ms': {stage: round(seconds * 1000, 2) for stage, seconds in stages.items()},
+                # Lo que no cae en ninguna etapa: serialización de Dash, espera de otro pedido igual, etc.
+                'other_ms': round(max(elapsed - sum(stages.values()), 0) * 1000, 2),
+                # Bytes enviados (ya comprimidos, ver responses.py)
+                'bytes': response.content_length,
+                'encoding': response.headers.get('Content-Encoding', 'identity'),
+                **current['fields']
+            }, ensure_ascii=False))
+        return response
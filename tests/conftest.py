@@ -0,0 +1,46 @@
+"""
+Fixtures de las pruebas: un Mongo en memoria (mongomock, con los operadores que le agrega
+benchmarks/mongomock_compat.py) y la configuración de cada prueba aislada.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+mongomock = pytest.importorskip('mongomock')
+
+import mongomock_compat  # noqa: E402,F401
+import database  # noqa: E402
+import metrics  # noqa: E402
+from config import Config  # noqa: E402
+from synthetic import load_reminders  # noqa: E402
+
+
+def use_client(patch, client):
+    """Deja client como cliente de Mongo, sin cache de métricas ni estado de otras pruebas."""
+    database.set_client(client)
+    patch.setattr(Config, 'METRICS_CACHE_ENABLED', False)
+    # Los rollups y el índice de usuarios se actualizan explícitamente en cada prueba
+    patch.setattr(Config, 'ROLLUP_REFRESH_INTERVAL', 0)
+    patch.setattr(Config, 'COHORTS_REFRESH_INTERVAL', 0)
+    patch.setattr(metrics, '_snapshot_reader', None)
+    return client
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Cliente mongomock vacío."""
+    yield use_client(monkeypatch, mongomock.MongoClient())
+    database.set_client(None)
+
+
+@pytest.fixture
+def reminders(client):
+    """Colección de recordatorios con los datos sintéticos de los benchmarks (enero-febrero 2024)."""
+    collection = database.get_reminders_collection()
+    load_reminders(collection, 1500, users=120, days=45, seed=7)
+    return collection
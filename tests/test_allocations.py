@@ -0,0 +1,44 @@
+"""Memoria extra del cálculo en modo pandas sobre un frame grande (ver benchmarks/allocations.py)."""
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+from allocations import synthetic_frame
+from latency import sketches_from_columns
+from metrics import build_metrics, compute_series, date_axis, day_labels, load_reminders_frame
+
+ROWS = 1_000_000
+
+
+@pytest.fixture(scope='module')
+def frame():
+    return synthetic_frame(ROWS, users=50_000, days=365, seed=42)
+
+
+def test_peak_allocation_below_twice_the_frame(frame):
+    frame_bytes = int(frame.memory_usage(deep=False).sum())
+    checksum = pd.util.hash_pandas_object(frame, index=False).sum()
+    days = frame['day'].to_numpy()
+    axis = date_axis(day_labels([days.min()])[0], day_labels([days.max()])[0])
+
+    tracemalloc.start()
+    try:
+        build_metrics(compute_series(frame, axis), axis)
+        sketches_from_columns(days, frame['latency'].to_numpy())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # Con una copia del frame por métrica serían seis veces o más
+    assert peak < 2 * frame_bytes, f"pico {peak / 2**20:.1f} MiB con un frame de {frame_bytes / 2**20:.1f} MiB"
+    assert pd.util.hash_pandas_object(frame, index=False).sum() == checksum
+
+
+def test_loaded_frame_is_read_only(reminders):
+    # El frame se comparte entre pedidos (cache): escribir en él tiene que fallar
+    loaded = load_reminders_frame(reminders, '2024-01-01', '2024-02-14')
+    assert len(loaded)
+    for name in ('day', 'month', 'is_sent', 'latency'):
+        with pytest.raises(ValueError):
+            loaded[name].to_numpy()[0] = 0
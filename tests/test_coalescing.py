@@ -0,0 +1,68 @@
+"""N pedidos concurrentes del mismo rango hacen una sola consulta (ver benchmarks/coalescing.py)."""
+import asyncio
+
+import pytest
+
+import database
+import metrics
+from coalescing import CountingClient, CountingCollection, run_async, run_threads
+from cohorts import refresh_user_index
+from config import Config
+
+VIEWERS = 10
+RANGE = ("2024-01-01", "2024-02-14")
+
+
+@pytest.fixture
+def counting(reminders, client):
+    # Con el índice de usuarios armado, como en producción: sin él el resultado no se cachea
+    refresh_user_index(reminders, database.get_users_collection(), database.get_cohorts_collection(),
+                       database.get_rollup_state_collection())
+    # Latencia suficiente para que todos los pedidos se superpongan con el primero
+    collection = CountingCollection(reminders, latency=0.3)
+    database.set_client(CountingClient(client, collection))
+    return collection
+
+
+@pytest.mark.parametrize('mode', ['server', 'pandas'])
+@pytest.mark.parametrize('cache', [True, False])
+def test_concurrent_requests_share_one_aggregate(counting, monkeypatch, mode, cache):
+    monkeypatch.setattr(Config, 'METRICS_AGGREGATION', mode)
+    monkeypatch.setattr(Config, 'METRICS_CACHE_ENABLED', cache)
+    monkeypatch.setattr(metrics, 'metrics_cache', metrics.TTLCache(ttl=60, max_entries=8))
+
+    _, results = run_threads(VIEWERS, lambda: metrics.calculate_metrics(*RANGE))
+
+    assert counting.aggregates == 1
+    assert len(results) == VIEWERS
+    assert all(result is results[0] for result in results)
+    if cache:
+        # Un acierto o un fallo por pedido, aunque el que calcula vuelva a mirar el cache
+        stats = metrics.metrics_cache.stats()
+        assert stats['hits'] + stats['misses'] == VIEWERS
+        assert stats['misses'] >= 1
+
+
+def test_cache_counts_one_miss_per_cold_request(counting, monkeypatch):
+    monkeypatch.setattr(Config, 'METRICS_AGGREGATION', 'server')
+    monkeypatch.setattr(Config, 'METRICS_CACHE_ENABLED', True)
+    monkeypatch.setattr(metrics, 'metrics_cache', metrics.TTLCache(ttl=60, max_entries=8))
+    first = metrics.calculate_metrics(*RANGE)
+    assert metrics.metrics_cache.stats()['misses'] == 1
+    assert metrics.calculate_metrics(*RANGE) is first
+    stats = metrics.metrics_cache.stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+
+def test_async_requests_share_one_aggregate(counting, monkeypatch):
+    monkeypatch.setattr(Config, 'METRICS_AGGREGATION', 'server')
+    _, results = asyncio.run(run_async(VIEWERS, *RANGE))
+    assert counting.aggregates == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_uncoalesced_baseline_counts_every_request(counting, monkeypatch):
+    # Sin calculate_metrics, cada pedido consulta: confirma que el conteo ve todas las consultas
+    monkeypatch.setattr(Config, 'METRICS_AGGREGATION', 'server')
+    run_threads(VIEWERS, lambda: metrics._compute_metrics(*RANGE))
+    assert counting.aggregates == VIEWERS
@@ -0,0 +1,76 @@
+"""
+Días en la zona de reporte alrededor de los cambios de horario, con date_time guardado
+en formatos mezclados, contra el mismo cálculo hecho con pandas (tz_convert).
+"""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import database
+import metrics
+from config import Config
+from dates import day_start, shift_day
+
+# Mismo instante escrito de distintas formas en la colección
+FORMATS = [
+    lambda instant: instant.astimezone(timezone.utc).isoformat(),
+    lambda instant: instant.astimezone(timezone(timedelta(hours=-5))).isoformat(),
+    lambda instant: instant.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+    # Fecha BSON (pymongo usa UTC naive)
+    lambda instant: instant.astimezone(timezone.utc).replace(tzinfo=None),
+]
+
+TRANSITIONS = [
+    # Adelanto a las 02:00 (el día tiene 23 h) y atraso a las 02:00 (25 h)
+    ('America/New_York', '2024-03-10'),
+    ('America/New_York', '2024-11-03'),
+    # Cambios a medianoche: el 8 de septiembre no tiene 00:00 y el 6 de abril repite las 23:00
+    ('America/Santiago', '2024-09-08'),
+    ('America/Santiago', '2024-04-06'),
+]
+
+
+def instants(start, end, step=timedelta(minutes=17)):
+    """Instantes UTC cada step entre start y end (datetime con tz)."""
+    current = start
+    while current < end:
+        yield current
+        current += step
+
+
+@pytest.mark.parametrize('mode', ['server', 'pandas'])
+@pytest.mark.parametrize('zone, day', TRANSITIONS)
+def test_days_around_dst_transitions(client, monkeypatch, zone, day, mode):
+    monkeypatch.setattr(Config, 'REPORT_TIMEZONE', zone)
+    monkeypatch.setattr(Config, 'METRICS_AGGREGATION', mode)
+    # Dos días de margen a cada lado, para que el rango consultado también tenga vecinos afuera
+    start = datetime.fromisoformat(shift_day(day, -2)).replace(tzinfo=timezone.utc)
+    points = list(instants(start, start + timedelta(days=5)))
+    collection = database.get_reminders_collection()
+    collection.insert_many([{"user_id": f"+569{i % 7}", "date_time": FORMATS[i % len(FORMATS)](instant),
+                             "status": "sent" if i % 3 else "not_sent"}
+                            for i, instant in enumerate(points)])
+
+    start_date, end_date = shift_day(day, -1), shift_day(day, 1)
+    result = metrics.calculate_metrics(start_date, end_date)
+
+    local_days = pd.DatetimeIndex(points).tz_convert(zone).strftime('%Y-%m-%d')
+    expected = pd.Series(local_days).value_counts().reindex(result['days'], fill_value=0)
+    np.testing.assert_array_equal(result['daily_reminds_created'], expected.to_numpy())
+    assert result['total_reminds_created'] == int(expected.sum())
+
+
+@pytest.mark.parametrize('zone, day, hours', [
+    ('America/New_York', '2024-03-10', 23),
+    ('America/New_York', '2024-11-03', 25),
+    ('America/Santiago', '2024-09-08', 23),
+    ('America/Santiago', '2024-04-06', 25),
+])
+def test_day_start_length(monkeypatch, zone, day, hours):
+    monkeypatch.setattr(Config, 'REPORT_TIMEZONE', zone)
+    assert day_start(shift_day(day, 1)) - day_start(day) == timedelta(hours=hours)
+    # El primer instante del día es la medianoche local, o la 01:00 si la medianoche no existe
+    expected = pd.Timestamp(day).tz_localize(zone, nonexistent='shift_forward').tz_convert('UTC')
+    assert day_start(day) == expected.tz_localize(None).to_pydatetime()
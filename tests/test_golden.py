@@ -0,0 +1,109 @@
+"""
+Salida de calculate_metrics sobre un conjunto fijo y chico de recordatorios, con los
+valores esperados calculados a mano (zona de reporte -04:00, la de Config por defecto).
+"""
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import database
+import metrics
+from cohorts import refresh_user_index
+from config import Config
+from rollups import refresh_rollups
+
+REMINDERS = [
+    # 30 de enero: dos enviados (30 s y 2 min) y uno a las 02:00Z, que en -04:00 sigue siendo el 30
+    {"user_id": "+56911111111", "date_time": "2024-01-30T09:00:00.000-04:00", "status": "sent",
+     "sentAt": "2024-01-30T09:00:30.000-04:00"},
+    {"user_id": "+56911111111", "date_time": "2024-01-30T22:30:00.000-04:00", "status": "sent",
+     "sentAt": "2024-01-30T22:32:00.000-04:00"},
+    {"user_id": "+56922222222", "date_time": "2024-01-31T02:00:00.000Z", "status": "not_sent"},
+    # 31 de enero: uno enviado al día siguiente (20 min, cuenta el día de creación) y uno sin status
+    # a las 03:30Z del 1 de febrero
+    {"user_id": "+56922222222", "date_time": "2024-01-31T23:50:00.000-04:00", "status": "sent",
+     "sentAt": "2024-02-01T00:10:00.000-04:00"},
+    {"user_id": "+56933333333", "date_time": "2024-02-01T03:30:00.000Z"},
+    # 2 de febrero: fechas BSON (1 h de demora) y un sentAt mal formado, que cuenta como enviado sin demora
+    {"user_id": "+56911111111", "date_time": datetime(2024, 2, 2, 12, 0), "status": "sent",
+     "sentAt": datetime(2024, 2, 2, 13, 0)},
+    {"user_id": "+56933333333", "date_time": "2024-02-02T08:00:00.000-04:00", "status": "sent",
+     "sentAt": "not a date"},
+    # Fuera del rango
+    {"user_id": "+56944444444", "date_time": "2024-02-03T10:00:00.000-04:00", "status": "sent"},
+]
+
+EXPECTED = {
+    "days": ['2024-01-30', '2024-01-31', '2024-02-01', '2024-02-02'],
+    "months": ['2024-01', '2024-02'],
+    "total_users": 3,
+    "total_reminds_created": 7,
+    "total_reminds_sent": 5,
+    "daily_users": [2, 2, 0, 2],
+    "daily_reminds_created": [3, 2, 0, 2],
+    "daily_reminds_sent": [2, 1, 0, 2],
+    "monthly_users": [3, 2],
+    "monthly_reminds_created": [5, 2],
+    "monthly_reminds_sent": [3, 2],
+    # Los promedios diarios y mensuales cuentan también los días sin recordatorios
+    "average_daily_users": 6 / 4,
+    "average_monthly_users": 5 / 2,
+    "per_user_reminds_created": 7 / 3,
+    "per_user_reminds_sent": 5 / 3,
+    "average_daily_reminds_created": 7 / 4,
+    "average_daily_reminds_sent": 5 / 4,
+    "average_per_user_daily_reminds_created": 7 / 4 / 3,
+    "average_per_user_daily_reminds_sent": 5 / 4 / 3,
+    "average_monthly_reminds_created": 7 / 2,
+    "average_monthly_reminds_sent": 5 / 2,
+    "average_per_user_monthly_reminds_created": 7 / 2 / 3,
+    "average_per_user_monthly_reminds_sent": 5 / 2 / 3,
+    # Usuarios vistos por primera vez: +569111 y +569222 el 30, +569333 el 31; +569444 el 3 de febrero
+    "new_users": 3,
+    "returning_users": 0,
+    "cohort_months": ['2024-01', '2024-02'],
+    "cohort_sizes": [3, 1],
+    # De la cohorte de enero, +569111 y +569333 se siguen viendo en febrero
+    "cohort_retention": [[1.0, 2 / 3], [1.0, np.nan]],
+}
+
+# Demoras en segundos (exactas): los cuantiles del sketch tienen error relativo <= 1%
+EXPECTED_LATENCY = {
+    "daily_latency_p50": [30, 1200, np.nan, 3600],
+    "daily_latency_p99": [30, 1200, np.nan, 3600],
+    # Enero: 30, 120 y 1200 s
+    "monthly_latency_p50": [120, 3600],
+    "monthly_latency_p90": [120, 3600],
+    "latency_p50": 120,
+    # Rango completo: 30, 120, 1200 y 3600 s; el cuantil es el valor de rango q * (n - 1) hacia abajo
+    "latency_p90": 1200,
+    "latency_p99": 1200,
+}
+
+
+@pytest.fixture
+def golden(client, monkeypatch):
+    monkeypatch.setattr(Config, 'REPORT_TIMEZONE', '-04:00')
+    collection = database.get_reminders_collection()
+    collection.insert_many([dict(doc) for doc in REMINDERS])
+    refresh_user_index(collection, database.get_users_collection(), database.get_cohorts_collection(),
+                       database.get_rollup_state_collection())
+    refresh_rollups(collection, database.get_rollup_collection(), database.get_rollup_state_collection())
+    return collection
+
+
+@pytest.mark.parametrize('mode', ['server', 'pandas', 'rollup'])
+def test_golden_metrics(golden, monkeypatch, mode):
+    monkeypatch.setattr(Config, 'METRICS_AGGREGATION', mode)
+    result = metrics.calculate_metrics('2024-01-30', '2024-02-02')
+
+    for key, expected in EXPECTED.items():
+        if key == 'cohort_retention':
+            np.testing.assert_allclose(result[key], expected, err_msg=key)
+        elif isinstance(expected, list):
+            np.testing.assert_array_equal(result[key], expected, err_msg=key)
+        else:
+            assert result[key] == pytest.approx(expected), key
+    for key, expected in EXPECTED_LATENCY.items():
+        np.testing.assert_allclose(result[key], expected, rtol=0.01, err_msg=key)
@@ -0,0 +1,76 @@
+"""verify_query_plans sobre salidas de explain armadas a mano (mongomock no implementa explain)."""
+import pytest
+
+import database
+from indexes import QueryPlanError, dashboard_pipelines, ensure_indexes, plan_stages, verify_query_plans
+
+RANGE = ("2024-01-01", "2024-01-31")
+
+# Plan cubierto por el índice compuesto, con el formato de explain de una agregación
+COVERED = {"stages": [{"$cursor": {"queryPlanner": {
+    "winningPlan": {"stage": "PROJECTION_COVERED",
+                    "inputStage": {"stage": "IXSCAN", "indexName": "date_time_user_id_status_sentAt"}},
+    "rejectedPlans": [{"stage": "COLLSCAN"}]
+}}}, {"$project": {}}]}
+
+COLLSCAN = {"queryPlanner": {"winningPlan": {"stage": "PROJECTION_SIMPLE", "inputStage": {"stage": "COLLSCAN"}}}}
+
+# Motor SBE (Mongo 7+): el árbol de etapas va dentro de queryPlan
+SBE_FETCH = {"queryPlanner": {"winningPlan": {
+    "queryPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}},
+    "slotBasedPlan": {"slots": "", "stages": "[1] cfilter"}
+}}}
+
+# Cluster: un plan por shard
+SHARDED_COLLSCAN = {"queryPlanner": {"winningPlan": {"stage": "SHARD_MERGE", "shards": [
+    {"shardName": "s0", "winningPlan": {"stage": "IXSCAN"}},
+    {"shardName": "s1", "winningPlan": {"stage": "COLLSCAN"}}
+]}}}
+
+
+class ExplainCollection:
+    """Colección falsa: explain de cada pipeline del dashboard según su nombre."""
+
+    name = 'reminders'
+
+    def __init__(self, explains):
+        self.pipelines = dashboard_pipelines(*RANGE)
+        self.explains = explains
+        self.database = self
+
+    def command(self, command, collection, pipeline, explain):
+        assert (command, collection, explain) == ("aggregate", self.name, True)
+        name = next(name for name, known in self.pipelines.items() if known == pipeline)
+        return self.explains.get(name, COVERED)
+
+
+def test_ensure_indexes_is_idempotent(client):
+    collection = database.get_reminders_collection()
+    names = ensure_indexes(collection)
+    assert ensure_indexes(collection) == names
+    assert set(names) <= set(collection.index_information())
+
+
+def test_plan_stages_ignores_rejected_plans():
+    assert plan_stages(COVERED) == ["PROJECTION_COVERED", "IXSCAN"]
+
+
+def test_plan_stages_reads_sbe_and_sharded_plans():
+    assert plan_stages(SBE_FETCH) == ["FETCH", "IXSCAN"]
+    assert "COLLSCAN" in plan_stages(SHARDED_COLLSCAN)
+
+
+def test_indexed_plans_pass():
+    results = verify_query_plans(ExplainCollection({"data": SBE_FETCH}), *RANGE)
+    assert set(results) == set(dashboard_pipelines(*RANGE))
+    assert results["data"] == ["FETCH", "IXSCAN"]
+    assert "COLLSCAN" not in results["summary"]
+
+
+@pytest.mark.parametrize('explains, names', [
+    ({"frame": COLLSCAN}, "frame"),
+    ({"rollup": SHARDED_COLLSCAN, "summary": COLLSCAN}, "summary, rollup"),
+])
+def test_collscan_raises(explains, names):
+    with pytest.raises(QueryPlanError, match=f"COLLSCAN en los pipelines: {names}\\."):
+        verify_query_plans(ExplainCollection(explains), *RANGE)
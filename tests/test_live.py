@@ -0,0 +1,129 @@
+"""Contadores en vivo de hoy alimentados con eventos inyectados en QueueSource, y las consultas de PollingSource."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+import database
+from config import Config
+from dates import shift_day, today
+from live import LiveWatcher, PollingSource, QueueSource
+
+
+def reminder(hour, user_id, status=None, day=None, sent_minutes=5):
+    doc = {"_id": ObjectId(), "user_id": user_id, "date_time": f"{day or today()}T{hour:02d}:15:00.000-04:00"}
+    if status:
+        doc["status"] = status
+    if status == 'sent':
+        doc["sentAt"] = f"{day or today()}T{hour:02d}:{15 + sent_minutes:02d}:00.000-04:00"
+    return doc
+
+
+def insert(doc):
+    return {"operationType": "insert", "documentKey": {"_id": doc['_id']}, "fullDocument": doc}
+
+
+def hourly(pairs):
+    counts = [0] * 24
+    for hour, count in pairs.items():
+        counts[hour] = count
+    return counts
+
+
+@pytest.fixture
+def watcher(client, monkeypatch):
+    monkeypatch.setattr(Config, 'REPORT_TIMEZONE', '-04:00')
+    collection = database.get_reminders_collection()
+    # Lo que ya estaba antes de arrancar lo trae la siembra
+    collection.insert_many([reminder(8, "+5691", "sent"), reminder(8, "+5692", "not_sent"),
+                            reminder(9, "+5691", "sent", day=shift_day(today(), -1))])
+    source = QueueSource(wait=0)
+    watcher = LiveWatcher(collection, source)
+    watcher.run_once()
+    return watcher, source
+
+
+def test_seed_counts_today_only(watcher):
+    counters = watcher[0].snapshot()
+    assert (counters['created'], counters['sent'], counters['users']) == (2, 1, 2)
+    assert counters['hourly_created'] == hourly({8: 2})
+    assert counters['hourly_sent'] == hourly({8: 1})
+
+
+def test_insert_update_delete_events(watcher):
+    watcher, source = watcher
+    first, second, third = reminder(10, "+5693"), reminder(10, "+5691", "not_sent"), reminder(23, "+5694", "sent")
+    for doc in (first, second, third):
+        source.put(insert(doc))
+    # Evento repetido (por ejemplo al reanudar desde un token): no cuenta dos veces
+    source.put(insert(third))
+    # De otro día: se ignora
+    source.put(insert(reminder(10, "+5695", day=shift_day(today(), 1))))
+    assert watcher.run_once() == 5
+    counters = watcher.snapshot()
+    assert (counters['created'], counters['sent'], counters['users']) == (5, 2, 4)
+    assert counters['hourly_created'] == hourly({8: 2, 10: 2, 23: 1})
+    assert counters['hourly_sent'] == hourly({8: 1, 23: 1})
+
+    # Update con el documento completo (updateLookup) y parcial, solo con los campos cambiados
+    sent_first = dict(first, status="sent", sentAt=f"{today()}T10:45:00.000-04:00")
+    source.put({"operationType": "update", "documentKey": {"_id": first['_id']}, "fullDocument": sent_first})
+    source.put({"operationType": "update", "documentKey": {"_id": second['_id']},
+                "updateDescription": {"updatedFields": {"status": "sent"}}})
+    watcher.run_once()
+    counters = watcher.snapshot()
+    assert (counters['created'], counters['sent'], counters['users']) == (5, 4, 4)
+    assert counters['hourly_sent'] == hourly({8: 1, 10: 2, 23: 1})
+    # Demoras de los enviados con sentAt: 5 min (siembra), 5 min y 30 min
+    assert 300 * 0.99 <= counters['latency_p50'] <= 300 * 1.01
+
+    # Borrado: el usuario +5694 ya no tiene recordatorios hoy
+    source.put({"operationType": "delete", "documentKey": {"_id": third['_id']}})
+    # Un replace que mueve un recordatorio a otro día lo saca de los contadores (+5691 sigue por la siembra)
+    moved = dict(second, date_time=f"{shift_day(today(), 1)}T10:15:00.000-04:00")
+    source.put({"operationType": "replace", "documentKey": {"_id": second['_id']}, "fullDocument": moved})
+    assert watcher.run_once() == 2
+    counters = watcher.snapshot()
+    assert (counters['created'], counters['sent'], counters['users']) == (3, 2, 3)
+    assert counters['hourly_created'] == hourly({8: 2, 10: 1})
+    assert counters['hourly_sent'] == hourly({8: 1, 10: 1})
+
+
+def test_no_events(watcher):
+    watcher, _ = watcher
+    version = watcher.counters.version
+    assert watcher.run_once() == 0
+    assert watcher.counters.version == version
+
+
+def polled_ids(source):
+    events, _ = source.poll()
+    return [event['documentKey']['_id'] for event in events]
+
+
+def test_polling_source_delivers_late_documents_once(client):
+    collection = database.get_reminders_collection()
+    started = datetime.now(timezone.utc)
+    old_id = ObjectId.from_datetime(started - timedelta(hours=1))
+    collection.insert_many([
+        {"_id": old_id, "user_id": "+5691", "date_time": "2024-01-30T09:00:00.000-04:00", "status": "pending"},
+        {"_id": ObjectId(), "user_id": "+5692", "date_time": "2024-01-30T09:00:00.000-04:00", "status": "sent",
+         "sentAt": "2024-01-30T10:00:00.000-04:00"},
+    ])
+    source = PollingSource(collection, interval=0)
+    source.open(None)
+    source.poll()
+    assert polled_ids(source) == []
+
+    # Insertado después, pero con un _id menor que el watermark (otro reloj): dentro del margen entra
+    late = collection.insert_one({"_id": ObjectId.from_datetime(started - timedelta(minutes=1)),
+                                  "user_id": "+5693", "date_time": "2024-01-30T09:30:00.000-04:00"}).inserted_id
+    new = collection.insert_one({"user_id": "+5694", "date_time": "2024-01-30T09:45:00.000-04:00"}).inserted_id
+    assert sorted(polled_ids(source)) == sorted([new, late])
+    assert polled_ids(source) == []
+
+    # Enviado con el mismo sentAt que el watermark, o uno apenas anterior: también
+    collection.update_one({"_id": old_id}, {"$set": {"status": "sent", "sentAt": "2024-01-30T09:58:00.000-04:00"}})
+    collection.update_one({"_id": late}, {"$set": {"status": "sent", "sentAt": "2024-01-30T10:00:00.000-04:00"}})
+    assert sorted(polled_ids(source)) == sorted([old_id, late])
+    assert polled_ids(source) == []
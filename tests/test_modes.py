@@ -0,0 +1,158 @@
+import mongomock
+import numpy as np
+import pytest
+
+import database
+import metrics
+from cohorts import refresh_user_index
+from config import Config
+from conftest import use_client
+from dates import now, shift_day, today
+from rollups import refresh_rollups
+from snapshot import export_snapshot
+from synthetic import load_reminders
+
+RANGES = [
+    ("2024-01-01", "2024-02-14"),
+    ("2024-01-10", "2024-01-25"),
+    # Cruza meses y llega hasta hoy: rollups y snapshot completan con una consulta en vivo
+    ("2024-01-31", None),
+]
+
+
+def assert_same_metrics(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        if isinstance(value, np.ndarray) and value.dtype.kind == 'f':
+            np.testing.assert_allclose(actual[key], value, rtol=1e-12, err_msg=key)
+        elif isinstance(value, np.ndarray):
+            np.testing.assert_array_equal(actual[key], value, err_msg=key)
+        elif isinstance(value, float):
+            assert actual[key] == pytest.approx(value, rel=1e-12, nan_ok=True), key
+        else:
+            assert actual[key] == value, key
+
+
+@pytest.fixture(scope='module')
+def prepared_client(tmp_path_factory):
+    """
+    Recordatorios (también de hoy) con rollups, índice de usuarios y snapshot al día,
+    preparados una sola vez para todas las pruebas del módulo.
+    """
+    pytest.importorskip('pyarrow')
+    with pytest.MonkeyPatch.context() as patch:
+        client = use_client(patch, mongomock.MongoClient())
+        reminders = database.get_reminders_collection()
+        load_reminders(reminders, 1500, users=120, days=45, seed=7)
+        snapshot_path = str(tmp_path_factory.mktemp('snapshot'))
+        _prepare(reminders, snapshot_path)
+        yield client, snapshot_path
+    database.set_client(None)
+
+
+def _prepare(reminders, snapshot_path):
+    local_now = now().replace(microsecond=0)
+    reminders.insert_many([
+        {"user_id": f"+56900000{i:03d}", "date_time": local_now.isoformat(), "status": "sent",
+         "sentAt": local_now.isoformat()}
+        for i in range(5)
+    ])
+    refresh_rollups(reminders, database.get_rollup_collection(), database.get_rollup_state_collection())
+    refresh_user_index(reminders, database.get_users_collection(), database.get_cohorts_collection(),
+                       database.get_rollup_state_collection())
+    export_snapshot(reminders, snapshot_path)
+
+
+@pytest.fixture
+def prepared(prepared_client, monkeypatch):
+    """La colección de prepared_client, con la configuración aislada de cada prueba."""
+    client, snapshot_path = prepared_client
+    use_client(monkeypatch, client)
+    monkeypatch.setattr(Config, 'SNAPSHOT_PATH', snapshot_path)
+    return database.get_reminders_collection()
+
+
+@pytest.mark.parametrize('mode', ['pandas', 'rollup', 'snapshot'])
+@pytest.mark.parametrize('start_date, end_date', RANGES)
+def test_modes_match_server(prepared, monkeypatch, mode, start_date, end_date):
+    end_date = end_date or today()
+    monkeypatch.setattr(Config, 'METRICS_AGGREGATION', 'server')
+    expected = metrics.calculate_metrics(start_date, end_date)
+    monkeypatch.setattr(Config, 'METRICS_AGGREGATION', mode)
+    actual = metrics.calculate_metrics(start_date, end_date)
+    assert expected['total_reminds_created'] > 0
+    assert_same_metrics(actual, expected)
+
+
+def test_chunked_fetch_matches_server(prepared, monkeypatch):
+    start_date, end_date = "2024-01-01", shift_day("2024-01-01", 44)
+    monkeypatch.setattr(Config, 'METRICS_AGGREGATION', 'server')
+    expected = metrics.calculate_metrics(start_date, end_date)
+    monkeypatch.setattr(Config, 'FETCH_PARALLEL_MIN_DAYS', 1)
+    monkeypatch.setattr(Config, 'FETCH_CHUNK_DAYS', 7)
+    assert_same_metrics(metrics.calculate_metrics(start_date, end_date), expected)
+
+
+@pytest.mark.parametrize('mode', ['server', 'pandas', 'rollup', 'snapshot'])
+def test_missing_user_id_is_not_a_user(client, monkeypatch, tmp_path, mode):
+    pytest.importorskip('pyarrow')
+    reminders = database.get_reminders_collection()
+    reminders.insert_many([
+        {"user_id": "+56911111111", "date_time": "2024-01-30T09:00:00.000-04:00", "status": "sent"},
+        {"user_id": None, "date_time": "2024-01-30T10:00:00.000-04:00", "status": "sent"},
+        {"date_time": "2024-01-30T11:00:00.000-04:00"},
+        {"date_time": "2024-01-31T11:00:00.000-04:00"},
+    ])
+    refresh_rollups(reminders, database.get_rollup_collection(), database.get_rollup_state_collection())
+    export_snapshot(reminders, str(tmp_path))
+    monkeypatch.setattr(Config, 'SNAPSHOT_PATH', str(tmp_path))
+    monkeypatch.setattr(Config, 'METRICS_AGGREGATION', mode)
+    result = metrics.calculate_metrics("2024-01-30", "2024-01-31")
+    assert result['total_reminds_created'] == 4
+    assert result['total_users'] == 1
+    np.testing.assert_array_equal(result['daily_users'], [1, 0])
+    np.testing.assert_array_equal(result['monthly_users'], [1])
+
+
+def test_rollup_mode_reads_live_until_the_warmer_builds_rollups(reminders, monkeypatch):
+    start_date, end_date = RANGES[0]
+    monkeypatch.setattr(Config, 'METRICS_AGGREGATION', 'server')
+    expected = metrics.calculate_metrics(start_date, end_date)
+    monkeypatch.setattr(Config, 'METRICS_AGGREGATION', 'rollup')
+    monkeypatch.setattr(Config, 'ROLLUP_REFRESH_INTERVAL', 300)
+    monkeypatch.setattr(metrics, '_last_rollup_refresh', float('-inf'))
+    rollups = database.get_rollup_collection()
+
+    # El request solo lee: sin rollups armados consulta en vivo
+    assert_same_metrics(metrics.calculate_metrics(start_date, end_date), expected)
+    assert rollups.count_documents({}) == 0
+
+    # Con otro hilo actualizando, la tarea del warmer retorna sin esperar
+    with metrics._rollup_lock:
+        metrics.refresh_rollups_if_due()
+    assert rollups.count_documents({}) == 0
+
+    metrics.refresh_rollups_if_due()
+    assert rollups.count_documents({}) > 0
+    assert_same_metrics(metrics.calculate_metrics(start_date, end_date), expected)
+
+
+def test_cohorts_are_pending_until_the_user_index_exists(reminders, monkeypatch):
+    start_date, end_date = RANGES[0]
+    monkeypatch.setattr(Config, 'COHORTS_ENABLED', True)
+    monkeypatch.setattr(Config, 'METRICS_CACHE_ENABLED', True)
+    metrics.metrics_cache.invalidate()
+
+    # Sin índice de usuarios no hay nuevos ni recurrentes (no todos recurrentes), y no se cachea
+    result = metrics.calculate_metrics(start_date, end_date)
+    assert result['new_users'] is None and result['returning_users'] is None
+    assert not metrics.is_cacheable(result)
+    assert len(metrics.metrics_cache) == 0
+
+    refresh_user_index(reminders, database.get_users_collection(), database.get_cohorts_collection(),
+                       database.get_rollup_state_collection())
+    result = metrics.calculate_metrics(start_date, end_date)
+    assert result['new_users'] == result['total_users'] > 0
+    assert result['returning_users'] == 0
+    assert len(metrics.metrics_cache) == 1
+    metrics.metrics_cache.invalidate()
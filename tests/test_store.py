@@ -0,0 +1,28 @@
+"""FileStore no acumula resultados vencidos ni más de max_entries archivos."""
+import os
+import time
+
+from store import FileStore
+
+
+def stored_files(path):
+    return sorted(name for name in os.listdir(path) if name.endswith('.pkl'))
+
+
+def test_set_sweeps_expired_files_of_other_keys(tmp_path):
+    store = FileStore(str(tmp_path), ttl=300)
+    store.set('metrics:2024-01-01:2024-01-31', 'enero', ttl=0.01)
+    time.sleep(0.05)
+    store.set('metrics:2024-02-01:2024-02-29', 'febrero')
+    assert stored_files(tmp_path) == [os.path.basename(store._file('metrics:2024-02-01:2024-02-29'))]
+    assert store.get('metrics:2024-02-01:2024-02-29') == 'febrero'
+
+
+def test_set_keeps_at_most_max_entries(tmp_path):
+    store = FileStore(str(tmp_path), ttl=300, max_entries=3)
+    for day in range(1, 6):
+        store.set(f'metrics:2024-01-{day:02d}:2024-01-31', day, ttl=100 + day)
+    assert len(stored_files(tmp_path)) == 3
+    # Se van los que vencen primero
+    assert store.get('metrics:2024-01-01:2024-01-31') is None
+    assert store.get('metrics:2024-01-05:2024-01-31') == 5
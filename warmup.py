@@ -0,0 +1,124 @@
+import logging
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+from config import Config
+from dates import now as report_now
+
+logger = logging.getLogger(__name__)
+
+
+def _last_30_days(now):
+    # Igual que los selectores de fecha y parse_date_range de app.py
+    return (now - timedelta(days=30)).date(), now.date()
+
+
+def _this_month(now):
+    return now.date().replace(day=1), now.date()
+
+
+def _last_month(now):
+    end = now.date().replace(day=1) - timedelta(days=1)
+    return end.replace(day=1), end
+
+
+def _year_to_date(now):
+    return date(now.year, 1, 1), now.date()
+
+
+# Rangos que se pueden precalcular (WARMUP_RANGES)
+COMMON_RANGES = {
+    'last_30_days': _last_30_days,
+    'this_month': _this_month,
+    'last_month': _last_month,
+    'ytd': _year_to_date
+}
+
+
+def warmup_ranges(names, now=None):
+    """Rangos (start_date, end_date) yyyy-mm-dd de los nombres dados, calculados para now."""
+    now = now or report_now()
+    ranges = []
+    for name in names:
+        if name not in COMMON_RANGES:
+            raise ValueError(f"Rango de warm-up desconocido: {name} (opciones: {', '.join(COMMON_RANGES)})")
+        start, end = COMMON_RANGES[name](now)
+        span = (start.isoformat(), end.isoformat())
+        if span not in ranges:
+            ranges.append(span)
+    return ranges
+
+
+class Warmer:
+    """
+    Hilo de fondo que precalcula los rangos comunes al arrancar el worker y los vuelve
+    a calcular cada interval segundos, para que nadie se encuentre con el cache frío.
+    warm(start_date, end_date) hace el cálculo y deja el resultado donde lo leen los callbacks;
+    tasks son tareas de mantenimiento (sin argumentos) que corren antes, en el mismo hilo.
+    """
+
+    def __init__(self, warm, names, interval, tasks=()):
+        self.warm = warm
+        self.names = names
+        self.interval = interval
+        self.tasks = list(tasks)
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+
+    def run_once(self):
+        """Precalcula todos los rangos una vez; retorna {rango: segundos} de los que se calcularon."""
+        timings = {}
+        started = time.perf_counter()
+        # Primero el mantenimiento, para que los rangos precalculados ya lo vean
+        for task in self.tasks:
+            try:
+                task()
+            except Exception:
+                logger.exception("Tarea de mantenimiento %s falló", getattr(task, '__name__', task))
+        for start_date, end_date in warmup_ranges(self.names):
+            range_started = time.perf_counter()
+            try:
+                self.warm(start_date, end_date)
+            except Exception:
+                # Un rango que falla (por ejemplo Mongo caído) no frena a los demás
+                logger.exception("Warm-up de %s a %s falló", start_date, end_date)
+                continue
+            timings[(start_date, end_date)] = elapsed = time.perf_counter() - range_started
+            logger.info("Warm-up de %s a %s en %.2fs", start_date, end_date, elapsed)
+        logger.info("Warm-up completo: %d rangos en %.2fs", len(timings), time.perf_counter() - started)
+        return timings
+
+    def _run(self):
+        while True:
+            self.run_once()
+            if not self.interval or self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        """Arranca el hilo (uno por proceso: después de un fork hay que volver a llamarlo)."""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._stop.clear()
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='metrics-warmup', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def start_warmer(warm, tasks=()):
+    """
+    Warmer de Config.WARMUP_RANGES (y de las tareas de mantenimiento tasks) cada
+    Config.WARMUP_INTERVAL segundos, ya arrancado (None si WARMUP_ENABLED está desactivado).
+    Los workers creados con fork (gunicorn --preload) arrancan su propio hilo.
+    """
+    if not Config.WARMUP_ENABLED:
+        return None
+    warmer = Warmer(warm, Config.WARMUP_RANGES, Config.WARMUP_INTERVAL, tasks)
+    warmer.start()
+    os.register_at_fork(after_in_child=warmer.start)
+    return warmer